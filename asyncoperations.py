@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+import Queue
+import sys
+import threading
+
+import tiebreaks
+
+
+class StorageFuture:
+    ''' Result of a storage operation submitted to AsyncOperations, set once the operation is done '''
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.excInfo = None
+
+    def setResult(self, value):
+        self.value = value
+        self.event.set()
+
+    def setException(self, excInfo):
+        self.excInfo = excInfo
+        self.event.set()
+
+    def done(self):
+        return self.event.is_set()
+
+    # Waits for the operation and returns its result, or raises its exception
+    def result(self, timeout=None):
+        if not self.event.wait(timeout):
+            raise RuntimeError("The storage operation did not finish within {0} seconds".format(timeout))
+        if self.excInfo is not None:
+            raise self.excInfo[0], self.excInfo[1], self.excInfo[2]
+        return self.value
+
+
+class AsyncOperations:
+    ''' Asynchronous counterpart of a tournament storage backend (see storage.py): operations are submitted to
+        worker threads and return a StorageFuture instead of blocking. Operations with the same key (a
+        tournament id) run in the order they were submitted, on the same worker, so a tournament's writes
+        are pipelined behind its simulation while independent tournaments' run concurrently. At most
+        maxInFlight operations are in flight; submitting another blocks until one is done. The backend is
+        shared by the workers, so a PostgreSQL backend should be given a ConnectionPool with a connection for
+        each worker. '''
+
+    def __init__(self, dbo, workerCount=4, maxInFlight=64):
+        self.dbo = dbo
+        self.inFlight = threading.BoundedSemaphore(maxInFlight)
+        self.queues = [Queue.Queue() for workerIndex in range(workerCount)]
+        self.workers = [threading.Thread(target=self.runWorker, args=(queue,)) for queue in self.queues]
+        for worker in self.workers:
+            worker.daemon = True
+            worker.start()
+
+    def runWorker(self, queue):
+        while True:
+            operation = queue.get()
+            if operation is None:
+                return
+            future, function, args = operation
+            try:
+                future.setResult(function(*args))
+            except:
+                future.setException(sys.exc_info())
+            finally:
+                self.inFlight.release()
+
+    # Submits the backend's methodName(*args), ordered with the other operations with the same key
+    def submit(self, key, methodName, *args):
+        function = getattr(self.dbo, methodName)
+        self.inFlight.acquire()
+        future = StorageFuture()
+        self.queues[hash(key) % len(self.queues)].put((future, function, args))
+        return future
+
+    def registerTournamentRoundResults(self, tournamentId, roundNbr, matchResults, roundByePlayer=None, historicalStandings=None, finalRound=False):
+        return self.submit(tournamentId, "registerTournamentRoundResults", tournamentId, roundNbr, matchResults, roundByePlayer, historicalStandings, finalRound)
+
+    def tournamentCurrentStandings(self, tournamentId):
+        return self.submit(tournamentId, "tournamentCurrentStandings", tournamentId)
+
+    def tournamentHistoricalStandings(self, tournamentId, tiebreakOrder=tiebreaks.DEFAULT_TIEBREAK_ORDER):
+        return self.submit(tournamentId, "tournamentHistoricalStandings", tournamentId, tiebreakOrder)
+
+    def tournamentStandingsAsOfRound(self, tournamentId, roundNbr, tiebreakOrder=tiebreaks.DEFAULT_TIEBREAK_ORDER):
+        return self.submit(tournamentId, "tournamentStandingsAsOfRound", tournamentId, roundNbr, tiebreakOrder)
+
+    # Waits for the operations already submitted, then stops the workers. The backend is not closed.
+    def close(self):
+        for queue in self.queues:
+            queue.put(None)
+        for worker in self.workers:
+            worker.join()
+
+
+# Simulates the tournaments concurrently (see Tournament.simulateAsync), at most maxConcurrentTournaments at
+# a time, and raises the first error of any of them once they are all done
+def simulateTournaments(tournaments, asyncOperations, maxConcurrentTournaments=16):
+    running = threading.BoundedSemaphore(maxConcurrentTournaments)
+    errors = []
+
+    def simulateTournament(t):
+        try:
+            t.simulateAsync(asyncOperations)
+        except:
+            errors.append(sys.exc_info())
+        finally:
+            running.release()
+
+    threads = []
+    for t in tournaments:
+        running.acquire()
+        thread = threading.Thread(target=simulateTournament, args=(t,))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0][0], errors[0][1], errors[0][2]
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+#
+# Benchmarks for the tournament simulator: pairing, per-round persistence, current standings query latency,
+# end to end simulation and exhaustive pairing memory. Results are written as JSON, and can be compared
+# against a stored baseline to flag regressions, e.g.
+#
+#     python benchmark.py --output baseline.json
+#     python benchmark.py --compare baseline.json
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+import storage
+import tournament
+import round
+import pairing
+import playedpairs
+
+BENCHMARK_GROUPS = ("pairing", "persistence", "standings", "simulation", "memory")
+
+PAIRING_FIELD_SIZES = (8, 16, 64, 256, 1024)
+PERSISTENCE_FIELD_SIZES = (16, 256, 1024)
+STANDINGS_MATCH_COUNTS = (10000, 100000, 1000000, 10000000)
+SIMULATION_FIELD_SIZES = (8, 16, 64)
+MEMORY_FIELD_SIZES = (8, 10, 12, 14)
+
+# Backends whose current standings are queried from the matches. The in-memory backend keeps them up to date
+# as results are registered, so reading them costs the same at every match count and is not benchmarked.
+STANDINGS_BACKENDS = (storage.POSTGRES, storage.SQLITE)
+
+# Largest field each pairing method is benchmarked with. The exhaustive pairing method enumerates every
+# possible player match combination, and branch-and-bound searches for seconds a round beyond 256 players.
+PAIRING_METHOD_MAX_FIELD_SIZES = ((pairing.BLOSSOM, 1024), (pairing.SCORE_GROUP, 1024), (pairing.BRANCH_AND_BOUND, 256), (pairing.EXHAUSTIVE, 8))
+
+# Metrics compared against a baseline; for all of them, lower is better
+COMPARED_METRICS = ("seconds", "roundPeakMemoryKb")
+
+
+# Runs function in a forked child process and returns the child's peak resident set size in kilobytes. The
+# child must not use the database connection, which belongs to the parent.
+def measurePeakMemory(function):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            function()
+        finally:
+            os._exit(0)
+    pid, status, rusage = os.wait4(pid, 0)
+    return rusage.ru_maxrss
+
+
+# Median wall time in seconds of repeat calls of function
+def measureSeconds(function, repeat=1):
+    seconds = []
+    for i in range(repeat):
+        start = timeit.default_timer()
+        function()
+        seconds.append(timeit.default_timer() - start)
+    return sorted(seconds)[len(seconds) // 2]
+
+
+# Peak memory of pairing round two with the exhaustive pairing method, i.e. the memory used on top of the
+# tournament's possible player match combinations
+def benchmarkRoundMemory(dbo, playerCount):
+    t = tournament.Tournament("Benchmark", dbo, pairingMethod=pairing.EXHAUSTIVE)
+    t.players = [(playerId, "Player {0}".format(playerId)) for playerId in range(1, playerCount + 1)]
+    t.totalPlayerCount = t.calculateTotalPlayerCount()
+    t.totalPlayerCountOdd = t.determineTotalPlayerCountOdd()
+    t.possiblePlayerMatchCombinations = t.determineInitialPossiblePlayerMatchCombinations()
+
+    playerIds = [player[0] for player in t.players]
+    random.shuffle(playerIds)
+    standings = [(rank, rank, playerId, None) for rank, playerId in enumerate(playerIds, 1)]
+    t.getPlayerRegistry().updateStandings(standings)
+    t.previousRoundsPlayedMatches = playedpairs.PlayedPairs(t.possiblePlayerMatchCombinations[0])
+
+    # The forked child inherits the tournament already set up, so a child which does nothing peaks at the
+    # tournament's memory, which is subtracted from the round's peak
+    def measureForkBaseline():
+        pass
+
+    def simulateRoundPairing():
+        rnd = round.Round(dbo, t.id, 2)
+        rnd.setTournamentPreviousRoundsPlayedMatches(t.previousRoundsPlayedMatches)
+        t.filterOutPossiblePlayerMatchCombinationsWithPreviousRoundsPlayedMatches()
+        rnd.setInitialRoundPossiblePlayerMatchCombinations(t.possiblePlayerMatchCombinations)
+        rnd.setTournamentPreviousRoundStandings(standings)
+        rnd.setPlayerRegistry(t.playerRegistry)
+        rnd.determineRoundPossiblePlayerMatchCombinationQuality()
+        bestRoundPossiblePlayerMatchCombination = rnd.determineBestRoundPossiblePlayerMatchCombination()
+        rnd.sortBestRoundPlayerMatchCombinationByTournamentCurrentPlayerRanks(bestRoundPossiblePlayerMatchCombination)
+
+    tournamentPeakMemory = measurePeakMemory(measureForkBaseline)
+    roundPeakMemory = measurePeakMemory(simulateRoundPairing) - tournamentPeakMemory
+    t.deleteTournament()
+
+    return len(t.possiblePlayerMatchCombinations), roundPeakMemory
+
+
+# Quiet, seeded tournament of playerCount registered players, ready to simulate its rounds one by one
+def createBenchmarkTournament(dbo, playerCount, pairingMethod=pairing.BLOSSOM, seed=0):
+    t = tournament.Tournament("Benchmark", dbo, pairingMethod=pairingMethod, quiet=True, seed=seed)
+    playerIds = [dbo.registerPlayer("Player {0}".format(playerNbr)) for playerNbr in range(1, playerCount + 1)]
+    t.registerPlayers(playerIds)
+    t.startSimulation()
+    return t, playerIds
+
+
+def deleteBenchmarkTournament(dbo, t, playerIds):
+    t.dbo = dbo
+    t.deleteFullTournamentFromDb()
+    dbo.deleteSpecificPlayers(tuple(playerIds))
+
+
+def pairBenchmarkRound(t, rnd):
+    if t.currentRoundFirstRound():
+        t.simulateFirstRound(rnd)
+    else:
+        t.simulateSecondOrGreaterRound(rnd)
+
+
+def playBenchmarkRound(t, rnd):
+    rnd.setStandingsEngine(t.standingsEngine)
+    rnd.playRound(t.players, t.previousRoundsPlayedMatches)
+
+
+# Pairing time of rounds 2 to roundCount (round one is paired at random)
+def benchmarkPairing(dbo, playerCount, pairingMethod, roundCount):
+    t, playerIds = createBenchmarkTournament(dbo, playerCount, pairingMethod)
+    roundSeconds = []
+    for roundNbr in range(1, roundCount + 1):
+        t.currentRoundNbr = roundNbr
+        rnd = round.Round(dbo, t.id, roundNbr, t.outcomeGenerator)
+        seconds = measureSeconds(lambda: pairBenchmarkRound(t, rnd))
+        if roundNbr > 1:
+            roundSeconds.append(seconds)
+        playBenchmarkRound(t, rnd)
+        rnd.registerRoundResultsInDb()
+        t.addRoundToTournament(rnd)
+        t.currentStandings = t.getCurrentStandings()
+    deleteBenchmarkTournament(dbo, t, playerIds)
+    return {"seconds": sum(roundSeconds), "roundSeconds": roundSeconds}
+
+
+# Time taken to register rounds 1 to roundCount's results (match results, bye player and historical standings)
+def benchmarkPersistence(dbo, playerCount, roundCount):
+    t, playerIds = createBenchmarkTournament(dbo, playerCount)
+    roundSeconds = []
+    for roundNbr in range(1, roundCount + 1):
+        t.currentRoundNbr = roundNbr
+        rnd = round.Round(dbo, t.id, roundNbr, t.outcomeGenerator)
+        pairBenchmarkRound(t, rnd)
+        playBenchmarkRound(t, rnd)
+        roundSeconds.append(measureSeconds(rnd.registerRoundResultsInDb))
+        t.addRoundToTournament(rnd)
+        t.currentStandings = t.getCurrentStandings()
+    deleteBenchmarkTournament(dbo, t, playerIds)
+    return {"seconds": sum(roundSeconds) / len(roundSeconds), "roundSeconds": roundSeconds}
+
+
+class SyntheticMatches:
+    ''' Synthetic tournaments of random matches (without pairing), for benchmarking reads against tables of
+        many matches. Matches are added until the tables hold a given number of them, so one synthetic
+        database grows through each of the benchmarked match counts. '''
+
+    def __init__(self, dbo, playersPerTournament=64, seed=0):
+        self.dbo = dbo
+        self.random = random.Random(seed)
+        self.playerIds = dbo.registerPlayers("Player {0}".format(playerNbr) for playerNbr in range(1, playersPerTournament + 1))
+        self.tournamentIds = []
+        self.matchCount = 0
+
+    # Tournaments of playersPerTournament players play rounds of random matches until there are matchCount
+    # matches, all added in one transaction. Each tournament's players and matches are bulk loaded
+    # (registerTournamentPlayers and registerTournamentMatchResults), and its matches are generated as they
+    # are loaded. Historical standings are not registered.
+    def addMatches(self, matchCount, roundsPerTournament=10):
+        roundMatchCount = len(self.playerIds) // 2
+        with self.dbo.transaction():
+            while self.matchCount < matchCount:
+                roundCount = min(roundsPerTournament, -(-(matchCount - self.matchCount) // roundMatchCount))
+                tournamentId = self.dbo.registerTournament("Synthetic")
+                self.dbo.registerTournamentPlayers(tournamentId, self.playerIds)
+                self.dbo.registerTournamentMatchResults(tournamentId, self.generateMatchResults(roundCount))
+                self.tournamentIds.append(tournamentId)
+                self.matchCount += roundCount * roundMatchCount
+
+    # (roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag) of roundCount rounds of random matches
+    def generateMatchResults(self, roundCount):
+        roundMatchCount = len(self.playerIds) // 2
+        for roundNbr in range(1, roundCount + 1):
+            playerIds = list(self.playerIds)
+            self.random.shuffle(playerIds)
+            for matchNbr in range(1, roundMatchCount + 1):
+                yield (roundNbr, matchNbr, playerIds[2 * matchNbr - 2], playerIds[2 * matchNbr - 1], self.random.random() >= .9)
+
+    def delete(self):
+        with self.dbo.transaction():
+            for tournamentId in self.tournamentIds:
+                self.dbo.deleteAllTournamentMatches(tournamentId)
+                self.dbo.deleteFullTournamentRegister(tournamentId)
+                self.dbo.deleteTournament(tournamentId)
+            self.dbo.deleteSpecificPlayers(tuple(self.playerIds))
+
+
+# Median latency of reading the last synthetic tournament's current standings
+def benchmarkStandingsQuery(syntheticMatches, matchCount, repeat=5):
+    syntheticMatches.addMatches(matchCount)
+    tournamentId = syntheticMatches.tournamentIds[-1]
+    return {"seconds": measureSeconds(lambda: syntheticMatches.dbo.tournamentCurrentStandings(tournamentId), repeat), "matchCount": syntheticMatches.matchCount}
+
+
+# Wall time of Tournament.simulate(), on its own storage since simulate closes it
+def benchmarkSimulation(backend, playerCount, seed=0):
+    dbo = storage.createStorageOperations(backend)
+    t = tournament.Tournament("Benchmark", dbo, quiet=True, seed=seed)
+    playerIds = [dbo.registerPlayer("Player {0}".format(playerNbr)) for playerNbr in range(1, playerCount + 1)]
+    t.registerPlayers(playerIds)
+    seconds = measureSeconds(t.simulate)
+
+    dbo = storage.createStorageOperations(backend)
+    deleteBenchmarkTournament(dbo, t, playerIds)
+    dbo.closeDbConnection()
+    return {"seconds": seconds, "roundCount": t.totalRoundCount}
+
+
+# Runs the groups' benchmarks and returns their results, keyed by benchmark name
+def runBenchmarks(backend=None, groups=BENCHMARK_GROUPS, pairingFieldSizes=PAIRING_FIELD_SIZES, persistenceFieldSizes=PERSISTENCE_FIELD_SIZES, standingsMatchCounts=STANDINGS_MATCH_COUNTS, simulationFieldSizes=SIMULATION_FIELD_SIZES, memoryFieldSizes=MEMORY_FIELD_SIZES, roundCount=4):
+    backend = storage.determineBackend(backend)
+    benchmarks = {}
+    dbo = storage.createStorageOperations(backend)
+
+    if "pairing" in groups:
+        for pairingMethod, maxFieldSize in PAIRING_METHOD_MAX_FIELD_SIZES:
+            for playerCount in pairingFieldSizes:
+                if playerCount <= maxFieldSize:
+                    benchmarks["pairing/{0}/{1}".format(pairingMethod, playerCount)] = benchmarkPairing(dbo, playerCount, pairingMethod, roundCount)
+
+    if "persistence" in groups:
+        for playerCount in persistenceFieldSizes:
+            benchmarks["persistence/{0}".format(playerCount)] = benchmarkPersistence(dbo, playerCount, roundCount)
+
+    if "standings" in groups and backend in STANDINGS_BACKENDS:
+        syntheticMatches = SyntheticMatches(dbo)
+        for matchCount in sorted(standingsMatchCounts):
+            benchmarks["standings/{0}".format(matchCount)] = benchmarkStandingsQuery(syntheticMatches, matchCount)
+        syntheticMatches.delete()
+
+    if "simulation" in groups:
+        for playerCount in simulationFieldSizes:
+            benchmarks["simulation/{0}".format(playerCount)] = benchmarkSimulation(backend, playerCount)
+
+    if "memory" in groups:
+        for playerCount in memoryFieldSizes:
+            combinationCount, roundPeakMemory = benchmarkRoundMemory(dbo, playerCount)
+            benchmarks["memory/{0}".format(playerCount)] = {"roundPeakMemoryKb": roundPeakMemory, "combinationCount": combinationCount}
+
+    dbo.closeDbConnection()
+    return {"backend": backend, "python": sys.version.split()[0], "benchmarks": benchmarks}
+
+
+# (benchmark name, metric, baseline value, value) of every compared metric more than threshold (a fraction)
+# worse than the baseline's. Benchmarks missing from either results are not compared.
+def determineRegressions(results, baselineResults, threshold=0.25):
+    regressions = []
+    for name, benchmark in sorted(results["benchmarks"].items()):
+        baselineBenchmark = baselineResults["benchmarks"].get(name)
+        if baselineBenchmark is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric in benchmark and baselineBenchmark.get(metric):
+                if benchmark[metric] > baselineBenchmark[metric] * (1.0 + threshold):
+                    regressions.append((name, metric, baselineBenchmark[metric], benchmark[metric]))
+    return regressions
+
+
+def outputResults(results):
+    print "Benchmark\tSeconds\tRound Peak Memory (KB)"
+    for name, benchmark in sorted(results["benchmarks"].items()):
+        print "{0}\t{1}\t{2}".format(name, benchmark.get("seconds", ""), benchmark.get("roundPeakMemoryKb", ""))
+
+
+def outputRegressions(regressions, threshold):
+    if not regressions:
+        print "\nNo regressions over {0:.0%}".format(threshold)
+        return
+    print "\nRegressions over {0:.0%}:".format(threshold)
+    for name, metric, baselineValue, value in regressions:
+        print "{0}\t{1}\t{2} -> {3} ({4:+.0%})".format(name, metric, baselineValue, value, float(value) / baselineValue - 1.0)
+
+
+def parseSizes(sizes):
+    return tuple(int(size) for size in sizes.split(",") if size)
+
+
+def parseArguments(arguments):
+    parser = argparse.ArgumentParser(description="Benchmarks the tournament simulator")
+    parser.add_argument("--backend", help="storage backend (postgres, memory or sqlite), by default TOURNAMENT_DB_BACKEND's")
+    parser.add_argument("--groups", default=",".join(BENCHMARK_GROUPS), help="comma separated benchmark groups")
+    parser.add_argument("--pairing-sizes", type=parseSizes, default=PAIRING_FIELD_SIZES)
+    parser.add_argument("--persistence-sizes", type=parseSizes, default=PERSISTENCE_FIELD_SIZES)
+    parser.add_argument("--match-counts", type=parseSizes, default=STANDINGS_MATCH_COUNTS)
+    parser.add_argument("--simulation-sizes", type=parseSizes, default=SIMULATION_FIELD_SIZES)
+    parser.add_argument("--memory-sizes", type=parseSizes, default=MEMORY_FIELD_SIZES)
+    parser.add_argument("--rounds", type=int, default=4, help="rounds simulated by the pairing and persistence benchmarks")
+    parser.add_argument("--output", help="file the JSON results are written to")
+    parser.add_argument("--compare", help="baseline JSON results to flag regressions against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="fraction worse than the baseline that is a regression")
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    arguments = parseArguments(sys.argv[1:])
+    results = runBenchmarks(arguments.backend, arguments.groups.split(","), arguments.pairing_sizes, arguments.persistence_sizes, arguments.match_counts, arguments.simulation_sizes, arguments.memory_sizes, arguments.rounds)
+    outputResults(results)
+    if arguments.output:
+        with open(arguments.output, "w") as outputFile:
+            json.dump(results, outputFile, indent=2, sort_keys=True)
+
+    if arguments.compare:
+        with open(arguments.compare) as baselineFile:
+            baselineResults = json.load(baselineFile)
+        if baselineResults.get("backend") != results["backend"]:
+            print "\nThe baseline was benchmarked with the {0} backend, not {1}".format(baselineResults.get("backend"), results["backend"])
+        regressions = determineRegressions(results, baselineResults, arguments.threshold)
+        outputRegressions(regressions, arguments.threshold)
+        if regressions:
+            sys.exit(1)
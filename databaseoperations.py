@@ -1,113 +1,390 @@
 #!/usr/bin/env python
 
-import psycopg2
-
+import contextlib
+import cStringIO
+import csv
+import os
+import threading
 
-class DatabaseOperations:
-    ''' Includes tournament related PostgreSQL database operations '''
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+
+import instrumentation
+import storage
+
+
+DEFAULT_DSN = "dbname=tournament"
+
+
+# The DSN given, else the TOURNAMENT_DSN environment variable, else the default tournament database
+def determineDsn(dsn=None):
+    if dsn is not None:
+        return dsn
+    return os.environ.get("TOURNAMENT_DSN", DEFAULT_DSN)
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    ''' Cursor which times (and so counts) every query it executes '''
+
+    def execute(self, query, vars=None):
+        with instrumentation.timer("database.query"):
+            return psycopg2.extensions.cursor.execute(self, query, vars)
+
+    def copy_expert(self, sql, file, size=8192):
+        with instrumentation.timer("database.query"):
+            return psycopg2.extensions.cursor.copy_expert(self, sql, file, size)
+
+
+class CopyStream:
+    ''' Read-only file of rows in CSV format, for COPY ... FROM STDIN WITH (FORMAT csv). Rows are formatted as
+        COPY reads them, so they are streamed without building the whole input in memory. Strings are quoted,
+        so empty strings are not read as NULLs (None). '''
+
+    def __init__(self, rows):
+        self.lines = self.generateLines(rows)
+        self.buffer = ""
+
+    def generateLines(self, rows):
+        lineBuffer = cStringIO.StringIO()
+        writer = csv.writer(lineBuffer, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n")
+        for row in rows:
+            writer.writerow([field.encode("utf-8") if isinstance(field, unicode) else field for field in row])
+            yield lineBuffer.getvalue()
+            lineBuffer.seek(0)
+            lineBuffer.truncate()
+
+    def read(self, size=-1):
+        lines = [self.buffer]
+        length = len(self.buffer)
+        while size < 0 or length < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            lines.append(line)
+            length += len(line)
+        data = "".join(lines)
+        if size < 0:
+            self.buffer = ""
+            return data
+        self.buffer = data[size:]
+        return data[:size]
+
+
+class ConnectionPool:
+    ''' Bounded, thread-safe pool of PostgreSQL connections. Checking out a connection blocks while all
+        maxConnections connections are checked out. '''
+
+    def __init__(self, dsn=None, minConnections=1, maxConnections=10):
+        self.dsn = determineDsn(dsn)
+        self.maxConnections = maxConnections
+        self.available = threading.BoundedSemaphore(maxConnections)
+        self.pool = psycopg2.pool.ThreadedConnectionPool(minConnections, maxConnections, self.dsn)
+
+    # Connections closed since they were returned to the pool (e.g. by a server restart) are discarded and
+    # replaced by new ones
+    def getConnection(self):
+        self.available.acquire()
+        try:
+            connection = self.pool.getconn()
+            while connection.closed:
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+            # Text, e.g. player names, is read as unicode, as the other storage backends read it
+            psycopg2.extensions.register_type(psycopg2.extensions.UNICODE, connection)
+            psycopg2.extensions.register_type(psycopg2.extensions.UNICODEARRAY, connection)
+        except:
+            self.available.release()
+            raise
+        return connection
+
+    # Broken connections are closed instead of being returned to the pool for reuse
+    def putConnection(self, connection, broken=False):
+        try:
+            self.pool.putconn(connection, close=broken or bool(connection.closed))
+        finally:
+            self.available.release()
 
-    def __init__(self):
-        self.connectToDb()
+    # Checks out a connection and runs a trivial query on it
+    def healthy(self):
+        try:
+            connection = self.getConnection()
+        except psycopg2.Error:
+            return False
+        broken = False
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            broken = True
+            return False
+        finally:
+            self.putConnection(connection, broken)
+
+    def close(self):
+        if not self.pool.closed:
+            self.pool.closeall()
+
+
+class DatabaseOperations(storage.StorageOperations):
+    ''' Includes tournament related PostgreSQL database operations (the PostgreSQL storage backend, see
+        storage.py). Connections are checked out of a connection pool for each operation (or for the whole of a
+        transaction), so one DatabaseOperations, or one ConnectionPool, can be shared by threads simulating
+        tournaments concurrently. Every operation is timed as database.<operation>, and every query as
+        database.query (see instrumentation.py). '''
+
+    def __init__(self, dsn=None, connectionPool=None):
+        self.dsn = dsn
+        self.connectionPool = connectionPool
+        self.ownsConnectionPool = connectionPool is None
+        self.threadState = threading.local()
+        if self.connectionPool is None:
+            self.connectToDb()
 
     def connectToDb(self):
         try:
-            self.db = psycopg2.connect("dbname=tournament")
-            self.connection = self.db.cursor()
+            self.connectionPool = ConnectionPool(self.dsn, maxConnections=1)
         except psycopg2.Error as e:
             print e
 
+    # Each thread has its own transaction, on the connection it checked out for it
+    def getTransactionDepth(self):
+        return getattr(self.threadState, "transactionDepth", 0)
+
+    def getTransactionConnection(self):
+        return getattr(self.threadState, "transactionConnection", None)
+
+    # Cursor for one operation. Inside a transaction (see transaction) it is a cursor on the transaction's
+    # connection; outside of one, a connection is checked out of the pool for the operation only, and the
+    # operation is committed as soon as it is done.
+    @contextlib.contextmanager
+    def cursor(self):
+        connection = self.getTransactionConnection()
+        if connection is not None:
+            cursor = connection.cursor(cursor_factory=InstrumentedCursor)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+            return
+
+        connection = self.connectionPool.getConnection()
+        broken = False
+        try:
+            cursor = connection.cursor(cursor_factory=InstrumentedCursor)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+            self.commit(connection)
+        except:
+            broken = self.rollback(connection)
+            raise
+        finally:
+            self.connectionPool.putConnection(connection, broken)
+
+    def commit(self, connection):
+        connection.commit()
+
+    # Returns whether the connection is broken, in which case it is not returned to the pool for reuse
+    def rollback(self, connection):
+        try:
+            connection.rollback()
+        except psycopg2.Error:
+            return True
+        return bool(connection.closed)
+
+    # Unit of work: operations inside the with block are committed together when it ends, or rolled back
+    # together if it raises. Nested transactions are savepoints, which roll back only their own operations.
+    # With rollback=True the transaction is always rolled back, e.g. to leave no rows behind in tests.
+    @contextlib.contextmanager
+    def transaction(self, rollback=False):
+        transactionDepth = self.getTransactionDepth()
+        if transactionDepth == 0:
+            self.threadState.transactionConnection = self.connectionPool.getConnection()
+        connection = self.threadState.transactionConnection
+        savepoint = None
+        broken = False
+        try:
+            if transactionDepth > 0:
+                savepoint = "tournament_savepoint_{0}".format(transactionDepth)
+                self.executeTransactionStatement(connection, "SAVEPOINT " + savepoint)
+            self.threadState.transactionDepth = transactionDepth + 1
+            try:
+                yield self
+            except:
+                self.threadState.transactionDepth = transactionDepth
+                broken = self.rollbackTransaction(connection, savepoint)
+                raise
+            self.threadState.transactionDepth = transactionDepth
+            if rollback:
+                broken = self.rollbackTransaction(connection, savepoint)
+            else:
+                self.commitTransaction(connection, savepoint)
+        finally:
+            if transactionDepth == 0:
+                self.threadState.transactionConnection = None
+                self.connectionPool.putConnection(connection, broken)
+
+    def executeTransactionStatement(self, connection, statement):
+        cursor = connection.cursor(cursor_factory=InstrumentedCursor)
+        try:
+            cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    def commitTransaction(self, connection, savepoint):
+        if savepoint is None:
+            self.commit(connection)
+        else:
+            self.executeTransactionStatement(connection, "RELEASE SAVEPOINT " + savepoint)
+
+    def rollbackTransaction(self, connection, savepoint):
+        if savepoint is None:
+            return self.rollback(connection)
+        self.executeTransactionStatement(connection, "ROLLBACK TO SAVEPOINT " + savepoint)
+        return False
+
+    @instrumentation.timed("database")
     def deletePlayers(self):
         query = "DELETE FROM player"
-        self.connection.execute(query)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query)
 
+    @instrumentation.timed("database")
     def deleteSpecificPlayers(self, playerIds):
         query = "DELETE FROM player WHERE id IN %s"
         parameter = (playerIds,)
-        self.connection.execute(query, parameter)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
 
+    @instrumentation.timed("database")
     def deleteTournament(self, tournamentId):
         query = "DELETE FROM tournament WHERE id = %s"
         parameter = (tournamentId,)
-        self.connection.execute(query, parameter)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
 
+    @instrumentation.timed("database")
     def deleteAllTournamentMatches(self, tournamentId):
         query = "DELETE FROM match WHERE tournament_id = %s"
         parameter = (tournamentId,)
-        self.connection.execute(query, parameter)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
 
+    @instrumentation.timed("database")
     def deleteSpecificTournamentRoundsMatches(self, tournamentId, roundNbrs):
         query = "DELETE FROM match WHERE tournament_id = %s AND round_nbr IN %s"
         parameters = (tournamentId, roundNbrs)
-        self.connection.execute(query, parameters)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
 
+    @instrumentation.timed("database")
     def deleteTournamentSpecificRoundMatches(self, tournamentId, roundNbr, matchNbrs):
         query = "DELETE FROM match WHERE tournament_id = %s AND round_nbr = %s AND match_nbr IN %s"
         parameters = (tournamentId, roundNbr, matchNbrs)
-        self.connection.execute(query, parameters)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
 
+    @instrumentation.timed("database")
     def deleteAllTournamentRoundsByePlayers(self, tournamentId):
         query = "DELETE FROM tournament_round_bye_player WHERE tournament_id = %s"
         parameter = (tournamentId,)
-        self.connection.execute(query, parameter)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
 
-    def deleteSpecficTournamentRoundsByePlayers(self, tournamentId, roundNbrs):
+    @instrumentation.timed("database")
+    def deleteSpecificTournamentRoundsByePlayers(self, tournamentId, roundNbrs):
         query = "DELETE FROM tournament_round_bye_player WHERE tournament_id = %s AND round_nbr IN %s"
         parameters = (tournamentId, roundNbrs)
-        self.connection.execute(query, parameters)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
 
+    @instrumentation.timed("database")
     def deleteAllTournamentRoundsHistoricalStandings(self, tournamentId):
         query = "DELETE FROM historical_standing WHERE tournament_id = %s"
         parameter = (tournamentId,)
-        self.connection.execute(query, parameter)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
 
-    def deleteSpecficTournamentRoundsHistoricalStandings(self, tournamentId, roundNbrs):
+    @instrumentation.timed("database")
+    def deleteSpecificTournamentRoundsHistoricalStandings(self, tournamentId, roundNbrs):
         query = "DELETE FROM historical_standing WHERE tournament_id = %s AND round_nbr IN %s"
         parameters = (tournamentId, roundNbrs)
-        self.connection.execute(query, parameters)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
 
+    @instrumentation.timed("database")
     def deleteFullTournamentRegister(self, tournamentId):
         query = "DELETE FROM tournament_register WHERE tournament_id = %s"
         parameter = (tournamentId,)
-        self.connection.execute(query, parameter)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
 
+    @instrumentation.timed("database")
     def deleteSpecificTournamentRegisteredPlayers(self, tournamentId, playerIds):
         query = "DELETE FROM tournament_register WHERE tournament_id = %s AND player_id IN %s"
         parameters = (tournamentId, playerIds)
-        self.connection.execute(query, parameters)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
 
+    @instrumentation.timed("database")
     def registerTournament(self, tournamentName):
         query = "INSERT INTO tournament (name) VALUES (%s) RETURNING id"
         parameter = (tournamentName,)
-        self.connection.execute(query, parameter)
-        self.db.commit()
-        return self.connection.fetchone()[0]
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchone()[0]
 
+    @instrumentation.timed("database")
     def registerPlayer(self, playerName):
         query = "INSERT INTO player (name) VALUES (%s) RETURNING id"
         parameter = (playerName,)
-        self.connection.execute(query, parameter)
-        self.db.commit()
-        return self.connection.fetchone()[0]
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchone()[0]
 
+    @instrumentation.timed("database")
     def registerTournamentPlayer(self, tournamentId, playerId):
         query = "INSERT INTO tournament_register (tournament_id, player_id) VALUES (%s, %s)"
         parameters = (tournamentId, playerId)
-        self.connection.execute(query, parameters)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    # The players' ids are allocated from player's id sequence up front, in one query, and the players are
+    # then streamed into player with COPY
+    @instrumentation.timed("database")
+    def registerPlayers(self, playerNames):
+        playerNames = list(playerNames)
+        query = "SELECT nextval(pg_get_serial_sequence('player', 'id')) FROM generate_series(1, %s)"
+        parameter = (len(playerNames),)
+        with self.transaction():
+            with self.cursor() as cursor:
+                cursor.execute(query, parameter)
+                playerIds = sorted(row[0] for row in cursor.fetchall())
+                cursor.copy_expert("COPY player (id, name) FROM STDIN WITH (FORMAT csv)", CopyStream(zip(playerIds, playerNames)))
+        return playerIds
+
+    @instrumentation.timed("database")
+    def registerTournamentPlayers(self, tournamentId, playerIds):
+        with self.cursor() as cursor:
+            cursor.copy_expert("COPY tournament_register (tournament_id, player_id) FROM STDIN WITH (FORMAT csv)", CopyStream((tournamentId, playerId) for playerId in playerIds))
+
+    # Snapshots the round's historical standings, if it is a keyframe round (see storage.py). Standings already
+    # calculated outside of the database (see standings.py), in the form of current_standings rows, are written
+    # as they are; otherwise the snapshot is taken from the current_standings view.
+    @instrumentation.timed("database")
+    def registerTournamentHistoricalStandings(self, tournamentId, roundNbr, historicalStandings=None, finalRound=False):
+        if not self.determineKeyframeRound(roundNbr, finalRound):
+            return
+        if historicalStandings is not None:
+            self.registerTournamentCalculatedHistoricalStandings(tournamentId, roundNbr, historicalStandings)
+            return
 
-    def registerTournamentHistoricalStandings(self, tournamentId, roundNbr):
         query = '''
             INSERT INTO historical_standing(tournament_id, round_nbr, player_rank, actual_player_rank, player_id,
                 wins, losses, ties, points, opponent_points)
@@ -128,9 +405,22 @@ class DatabaseOperations:
                 tournament_id = %s
             '''
         parameters = (roundNbr, tournamentId)
-        self.connection.execute(query, parameters)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
 
+    @instrumentation.timed("database")
+    def registerTournamentCalculatedHistoricalStandings(self, tournamentId, roundNbr, historicalStandings):
+        query = '''
+            INSERT INTO historical_standing(tournament_id, round_nbr, player_rank, actual_player_rank, player_id,
+                wins, losses, ties, points, opponent_points)
+            VALUES %s
+            '''
+        template = "({0}, {1}, %s, %s, %s, %s, %s, %s, %s, %s)".format(int(tournamentId), int(roundNbr))
+        rows = [historicalStanding[1:] for historicalStanding in storage.determineHistoricalStandings(roundNbr, historicalStandings)]
+        with self.cursor() as cursor:
+            psycopg2.extras.execute_values(cursor, query, rows, template)
+
+    @instrumentation.timed("database")
     def tournamentInfo(self, tournamentId):
         query = '''
             SELECT
@@ -142,9 +432,11 @@ class DatabaseOperations:
                 id = %s
             '''
         parameter = (tournamentId,)
-        self.connection.execute(query, parameter)
-        return self.connection.fetchone()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchone()
 
+    @instrumentation.timed("database")
     def tournamentPlayerInfo(self, tournamentId):
         query = '''
             SELECT
@@ -156,9 +448,11 @@ class DatabaseOperations:
                 tournament_id = %s
             '''
         parameter = (tournamentId,)
-        self.connection.execute(query, parameter)
-        return self.connection.fetchall()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchall()
 
+    @instrumentation.timed("database")
     def tournamentPreviousRoundPlayerMatches(self, tournamentId):
         query = '''
             SELECT
@@ -170,9 +464,80 @@ class DatabaseOperations:
                 tournament_id = %s
             '''
         parameter = (tournamentId,)
-        self.connection.execute(query, parameter)
-        return self.connection.fetchall()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchall()
 
+    # The keyframe round is found with the historical_standing_round_idx index
+    @instrumentation.timed("database")
+    def tournamentHistoricalStandingsKeyframe(self, tournamentId, roundNbr):
+        query = '''
+            SELECT
+                round_nbr,
+                player_rank,
+                actual_player_rank,
+                player_id,
+                wins,
+                losses,
+                ties,
+                points,
+                opponent_points
+            FROM
+                historical_standing
+            WHERE
+                tournament_id = %(tournamentId)s AND
+                round_nbr = (SELECT max(round_nbr) FROM historical_standing WHERE tournament_id = %(tournamentId)s AND round_nbr <= %(roundNbr)s)
+            ORDER BY
+                player_rank
+            '''
+        parameters = {"tournamentId": tournamentId, "roundNbr": roundNbr}
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+            return cursor.fetchall()
+
+    @instrumentation.timed("database")
+    def tournamentMatchResultsThroughRound(self, tournamentId, roundNbr=None):
+        query = '''
+            SELECT
+                round_nbr,
+                match_nbr,
+                winner_player_id,
+                loser_player_id,
+                tie_flag
+            FROM
+                match
+            WHERE
+                tournament_id = %(tournamentId)s AND
+                (%(roundNbr)s IS NULL OR round_nbr <= %(roundNbr)s)
+            ORDER BY
+                round_nbr,
+                match_nbr
+            '''
+        parameters = {"tournamentId": tournamentId, "roundNbr": roundNbr}
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+            return cursor.fetchall()
+
+    @instrumentation.timed("database")
+    def tournamentRoundByePlayersThroughRound(self, tournamentId, roundNbr=None):
+        query = '''
+            SELECT
+                round_nbr,
+                player_id
+            FROM
+                tournament_round_bye_player
+            WHERE
+                tournament_id = %(tournamentId)s AND
+                (%(roundNbr)s IS NULL OR round_nbr <= %(roundNbr)s)
+            ORDER BY
+                round_nbr
+            '''
+        parameters = {"tournamentId": tournamentId, "roundNbr": roundNbr}
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+            return cursor.fetchall()
+
+    @instrumentation.timed("database")
     def tournamentTotalPlayerCount(self, tournamentId):
         query = '''
             SELECT
@@ -186,9 +551,11 @@ class DatabaseOperations:
                 ,0)
             '''
         parameter = (tournamentId,)
-        self.connection.execute(query, parameter)
-        return self.connection.fetchone()[0]
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchone()[0]
 
+    @instrumentation.timed("database")
     def tournamentTotalRoundCount(self, tournamentId):
         query = '''
             SELECT
@@ -199,9 +566,11 @@ class DatabaseOperations:
                 tournament_id = %s
             '''
         parameter = (tournamentId,)
-        self.connection.execute(query, parameter)
-        return self.connection.fetchone()[0]
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchone()[0]
 
+    @instrumentation.timed("database")
     def tournamentCurrentStandings(self, tournamentId):
         query = '''
             SELECT
@@ -222,15 +591,26 @@ class DatabaseOperations:
                 player_rank
             '''
         parameter = (tournamentId,)
-        self.connection.execute(query, parameter)
-        return self.connection.fetchall()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchall()
 
+    @instrumentation.timed("database")
     def registerTournamentMatchResult(self, tournamentId, roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag=False):
         query = "INSERT INTO match (tournament_id, round_nbr, match_nbr, winner_player_id, loser_player_id, tie_flag) VALUES (%s, %s, %s, %s, %s, %s)"
         parameters = (tournamentId, roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag)
-        self.connection.execute(query, parameters)
-        self.db.commit()
-
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    # Matches are copied in, streamed as they are generated
+    @instrumentation.timed("database")
+    def registerTournamentMatchResults(self, tournamentId, matchResults):
+        query = "COPY match (tournament_id, round_nbr, match_nbr, winner_player_id, loser_player_id, tie_flag) FROM STDIN WITH (FORMAT csv)"
+        with self.transaction():
+            with self.cursor() as cursor:
+                cursor.copy_expert(query, CopyStream((tournamentId,) + tuple(matchResult) for matchResult in matchResults))
+
+    @instrumentation.timed("database")
     def tournamentRoundMatchResults(self, tournamentId, roundNbr):
         query = '''
             SELECT
@@ -247,15 +627,34 @@ class DatabaseOperations:
                 AND round_nbr = %s
             '''
         parameters = (tournamentId, roundNbr)
-        self.connection.execute(query, parameters)
-        return self.connection.fetchall()
-
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+            return cursor.fetchall()
+
+    # Registers all of a round's results in one transaction: the match results (matchNbr, winnerPlayerId,
+    # loserPlayerId, tieFlag) as a single multi-row insert, the round's bye player (playerRank, playerId), if
+    # any, and the round's historical standings snapshot (see registerTournamentHistoricalStandings). The
+    # insert's page size is the round's match count, so execute_values does not split it into pages of 100.
+    @instrumentation.timed("database")
+    def registerTournamentRoundResults(self, tournamentId, roundNbr, matchResults, roundByePlayer=None, historicalStandings=None, finalRound=False):
+        query = "INSERT INTO match (tournament_id, round_nbr, match_nbr, winner_player_id, loser_player_id, tie_flag) VALUES %s"
+        template = "({0}, {1}, %s, %s, %s, %s)".format(int(tournamentId), int(roundNbr))
+        matchResults = list(matchResults)
+        with self.transaction():
+            with self.cursor() as cursor:
+                psycopg2.extras.execute_values(cursor, query, matchResults, template, page_size=max(len(matchResults), 1))
+            if roundByePlayer is not None:
+                self.registerTournamentRoundByePlayer(tournamentId, roundNbr, roundByePlayer[0], roundByePlayer[1])
+            self.registerTournamentHistoricalStandings(tournamentId, roundNbr, historicalStandings, finalRound)
+
+    @instrumentation.timed("database")
     def registerTournamentRoundByePlayer(self, tournamentId, roundNbr, playerRank, playerId):
         query = "INSERT INTO tournament_round_bye_player (tournament_id, round_nbr, player_rank, player_id) VALUES (%s, %s, %s, %s)"
         parameters = (tournamentId, roundNbr, playerRank, playerId)
-        self.connection.execute(query, parameters)
-        self.db.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
 
+    @instrumentation.timed("database")
     def tournamentTopPlayerWithNoByeRound(self, tournamentId):
         query = '''
             SELECT
@@ -268,12 +667,15 @@ class DatabaseOperations:
                 tournament_id = %s
             '''
         parameter = (tournamentId, )
-        self.connection.execute(query, parameter)
-        return self.connection.fetchone()
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchone()
 
+    # Closes the connection pool, unless it was given to DatabaseOperations, in which case it is shared and is
+    # closed by its owner once everything sharing it is done
     def closeDbConnection(self):
-        if self.connection is not None and not self.connection.closed:
+        if self.ownsConnectionPool and self.connectionPool is not None:
             try:
-                self.connection.close()
+                self.connectionPool.close()
             except psycopg2.Error as e:
                 print e
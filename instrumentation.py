@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+#
+# Hot path instrumentation: phase timers and counters reported to a pluggable sink, and a cProfile wrapper for
+# one tournament run. Nothing is kept with the default sink (NullSink); set another one with setSink, e.g.
+#
+#     registry = instrumentation.RegistrySink()
+#     instrumentation.setSink(registry)
+#     t.simulate()
+#     registry.scrape()
+
+import contextlib
+import cProfile
+import functools
+import json
+import logging
+import threading
+import timeit
+
+
+class NullSink:
+    ''' Sink which discards all timings and counters, so instrumentation costs next to nothing by default '''
+
+    def recordTiming(self, name, seconds):
+        pass
+
+    def incrementCounter(self, name, count=1):
+        pass
+
+
+class LogSink:
+    ''' Sink which logs every timing and counter increment as a JSON object, e.g.
+        {"type": "timing", "name": "round.playMatches", "seconds": 0.0001} '''
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger
+        if self.logger is None:
+            self.logger = logging.getLogger("tournament.instrumentation")
+        self.level = level
+
+    def recordTiming(self, name, seconds):
+        self.logger.log(self.level, json.dumps({"type": "timing", "name": name, "seconds": seconds}, sort_keys=True))
+
+    def incrementCounter(self, name, count=1):
+        self.logger.log(self.level, json.dumps({"type": "counter", "name": name, "count": count}, sort_keys=True))
+
+
+class RegistrySink:
+    ''' Sink which aggregates timings (count, total and maximum seconds) and counters in memory, to be
+        scraped in process. Thread-safe. '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counters = {}
+
+    def recordTiming(self, name, seconds):
+        with self.lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = {"count": 0, "totalSeconds": 0.0, "maxSeconds": 0.0}
+            timing["count"] += 1
+            timing["totalSeconds"] += seconds
+            timing["maxSeconds"] = max(timing["maxSeconds"], seconds)
+
+    def incrementCounter(self, name, count=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    # Snapshot of the timings and counters registered so far
+    def scrape(self):
+        with self.lock:
+            return {"timings": dict((name, dict(timing)) for name, timing in self.timings.items()), "counters": dict(self.counters)}
+
+    def reset(self):
+        with self.lock:
+            self.timings = {}
+            self.counters = {}
+
+
+sink = NullSink()
+
+
+def getSink():
+    return sink
+
+
+# Sets the sink all instrumentation reports to, and returns the previous one
+def setSink(newSink):
+    global sink
+    previousSink = sink
+    sink = newSink
+    return previousSink
+
+
+# Times the block, reporting its wall time in seconds, even if it raises
+@contextlib.contextmanager
+def timer(name):
+    start = timeit.default_timer()
+    try:
+        yield
+    finally:
+        sink.recordTiming(name, timeit.default_timer() - start)
+
+
+def incrementCounter(name, count=1):
+    sink.incrementCounter(name, count)
+
+
+# Decorator which times every call of a method as "<prefix>.<method name>", e.g. database.tournamentInfo
+def timed(prefix):
+    def decorate(function):
+        name = "{0}.{1}".format(prefix, function.__name__)
+
+        @functools.wraps(function)
+        def timedFunction(*args, **kwargs):
+            with timer(name):
+                return function(*args, **kwargs)
+        return timedFunction
+    return decorate
+
+
+# Simulates the tournament under cProfile and writes the profile to profilePath (see the pstats module)
+def profileSimulation(t, profilePath):
+    profile = cProfile.Profile()
+    profile.runcall(t.simulate)
+    profile.dump_stats(profilePath)
+    return profile
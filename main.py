@@ -1,10 +1,10 @@
 #!/usr/bin/env python
 
-import databaseoperations
+import storage
 import tournament
 
 if "__main__":
-    dbo = databaseoperations.DatabaseOperations()
+    dbo = storage.createStorageOperations()
 
     playerIds = []
     playerIds.append(dbo.registerPlayer("Ross S"))
@@ -19,7 +19,6 @@ if "__main__":
 
     tournament = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
 
-    for playerId in playerIds:
-        tournament.registerPlayerInDb(playerId)
+    tournament.registerPlayers(playerIds)
 
     tournament.simulate()
@@ -2,6 +2,8 @@
 
 import random
 
+import outcomes
+
 
 class Match:
     ''' Includes tournament match related data and operations '''
@@ -23,20 +25,26 @@ class Match:
         self.loserPlayerName = None
         self.tieFlag = None
 
-    # Chooses a random number between 0 and 1
-    def playMatch(self):
-        self.matchOutcome = random.random()
+    # Chooses a random number between 0 and 1, unless the match's outcome was drawn with the rest of its
+    # round's (see Round.playMatches)
+    def playMatch(self, matchOutcome=None):
+        if matchOutcome is None:
+            matchOutcome = random.random()
+        self.matchOutcome = matchOutcome
 
     # Based on matchOutcome instance variable, determines whether or not player1 or player2 won or lost or tied
-    # when they played the match and sets instance variable appropriately based on the matchOutcome
-    def registerMatchResult(self):
-        if self.matchOutcome < .45:
+    # when they played the match and sets instance variable appropriately based on the matchOutcome. The
+    # match result (see outcomes.py) can be given, if it was determined with the rest of its round's.
+    def registerMatchResult(self, matchResult=None):
+        if matchResult is None:
+            matchResult = outcomes.determineMatchResult(self.matchOutcome)
+        if matchResult == outcomes.PLAYER1_WIN:
             self.winnerPlayerId = self.player1Id
             self.winnerPlayerName = self.player1Name
             self.loserPlayerId = self.player2Id
             self.loserPlayerName = self.player2Name
             self.tieFlag = False
-        elif self.matchOutcome >= .45 and self.matchOutcome < .9:
+        elif matchResult == outcomes.PLAYER2_WIN:
             self.winnerPlayerId = self.player2Id
             self.winnerPlayerName = self.player2Name
             self.loserPlayerId = self.player1Id
@@ -50,16 +58,24 @@ class Match:
             self.tieFlag = True
 
     def registerMatchAsPlayed(self, tournamentPreviousRoundsPlayedMatches):
-        tournamentPreviousRoundsPlayedMatches.append((self.player1Id, self.player2Id))
+        tournamentPreviousRoundsPlayedMatches.registerPlayedMatch(self.player1Id, self.player2Id)
+
+    def registerMatchResultInStandings(self, standingsEngine):
+        standingsEngine.registerMatchResult(self.winnerPlayerId, self.loserPlayerId, self.tieFlag)
+
+    # The match's result in the form registered in the database, (matchNbr, winnerPlayerId, loserPlayerId, tieFlag)
+    def getMatchResult(self):
+        return (self.nbr, self.winnerPlayerId, self.loserPlayerId, self.tieFlag)
 
     def registerMatchResultInDb(self):
         self.dbo.registerTournamentMatchResult(self.tournamentId, self.roundNbr, self.nbr, self.winnerPlayerId, self.loserPlayerId, self.tieFlag)
 
-    def outputMatch(self):
-        print "Match {0}: {1} vs. {2}".format(self.nbr, self.player1Name, self.player2Name)
+    # Text output of the match and of its result (see outputsinks.TextSink)
+    def formatMatch(self):
+        return "Match {0}: {1} vs. {2}".format(self.nbr, self.player1Name, self.player2Name)
 
-    def outputMatchResult(self):
+    def formatMatchResult(self):
         if not self.tieFlag:
-            print "Match {0}: {1} wins".format(self.nbr, self.winnerPlayerName)
+            return "Match {0}: {1} wins".format(self.nbr, self.winnerPlayerName)
         else:
-            print "Match {0}: Tie".format(self.nbr)
+            return "Match {0}: Tie".format(self.nbr)
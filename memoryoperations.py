@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+
+import contextlib
+import math
+import threading
+
+import standings
+import storage
+
+
+class MemoryOperations(storage.StorageOperations):
+    ''' In-memory storage backend: tournaments are kept in dicts and lists, so simulations do no I/O and leave
+        nothing behind once the process ends. Each tournament's standings are kept up to date by a
+        StandingsEngine, as the player_standing table is by its triggers. Transactions keep an undo log of
+        their operations, which is replayed in reverse to roll them back. Operations are serialized by a lock,
+        which a transaction holds until it ends. '''
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.undoLog = None
+        self.lastPlayerId = 0
+        self.lastTournamentId = 0
+        self.players = {}
+        self.tournaments = {}
+        self.tournamentRegisters = {}
+        self.tournamentMatches = {}
+        self.tournamentRoundByePlayers = {}
+        self.tournamentHistoricalStandingRows = {}
+        self.standingsEngines = {}
+
+    @contextlib.contextmanager
+    def transaction(self, rollback=False):
+        with self.lock:
+            outermostTransaction = self.undoLog is None
+            if outermostTransaction:
+                self.undoLog = []
+            savepoint = len(self.undoLog)
+            try:
+                yield self
+                if rollback:
+                    self.rollbackTransaction(savepoint)
+            except:
+                self.rollbackTransaction(savepoint)
+                raise
+            finally:
+                if outermostTransaction:
+                    self.undoLog = None
+
+    # Undoes the transaction's operations after the savepoint (the undo log's length when it was taken)
+    def rollbackTransaction(self, savepoint):
+        while len(self.undoLog) > savepoint:
+            undo = self.undoLog.pop()
+            undo()
+
+    # Operations outside of a transaction cannot be rolled back, so they are not logged
+    def logUndo(self, undo):
+        if self.undoLog is not None:
+            self.undoLog.append(undo)
+
+    # Replaces a tournament's rows (registered players, matches, bye players or historical standings). The
+    # tournament's standings engine is discarded, and rebuilt from its rows when next needed.
+    def replaceTournamentRows(self, tournamentRows, tournamentId, rows):
+        previousRows = tournamentRows.get(tournamentId, [])
+        tournamentRows[tournamentId] = rows
+        self.standingsEngines.pop(tournamentId, None)
+
+        def undo():
+            tournamentRows[tournamentId] = previousRows
+            self.standingsEngines.pop(tournamentId, None)
+        self.logUndo(undo)
+
+    def appendTournamentRows(self, tournamentRows, tournamentId, rows):
+        tournamentRowList = tournamentRows.setdefault(tournamentId, [])
+        previousRowCount = len(tournamentRowList)
+        tournamentRowList.extend(rows)
+
+        def undo():
+            del tournamentRowList[previousRowCount:]
+            self.standingsEngines.pop(tournamentId, None)
+        self.logUndo(undo)
+
+    def deleteTournamentRows(self, tournamentRows, tournamentId, deleted):
+        self.replaceTournamentRows(tournamentRows, tournamentId, [row for row in tournamentRows.get(tournamentId, []) if not deleted(row)])
+
+    def getStandingsEngine(self, tournamentId):
+        standingsEngine = self.standingsEngines.get(tournamentId)
+        if standingsEngine is None:
+            standingsEngine = standings.StandingsEngine(self.tournamentPlayerInfo(tournamentId))
+            for roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag in self.tournamentMatches.get(tournamentId, []):
+                standingsEngine.registerMatchResult(winnerPlayerId, loserPlayerId, tieFlag)
+            for roundNbr, playerRank, playerId in self.tournamentRoundByePlayers.get(tournamentId, []):
+                standingsEngine.registerByePlayer(playerId)
+            self.standingsEngines[tournamentId] = standingsEngine
+        return standingsEngine
+
+    def deletePlayers(self):
+        with self.lock:
+            self.deleteSpecificPlayers(tuple(self.players))
+
+    def deleteSpecificPlayers(self, playerIds):
+        with self.lock:
+            deletedPlayers = dict((playerId, self.players.pop(playerId)) for playerId in playerIds if playerId in self.players)
+            self.logUndo(lambda: self.players.update(deletedPlayers))
+
+    def deleteTournament(self, tournamentId):
+        with self.lock:
+            if tournamentId not in self.tournaments:
+                return
+            tournamentName = self.tournaments.pop(tournamentId)
+            self.logUndo(lambda: self.tournaments.__setitem__(tournamentId, tournamentName))
+
+    def deleteAllTournamentMatches(self, tournamentId):
+        with self.lock:
+            self.replaceTournamentRows(self.tournamentMatches, tournamentId, [])
+
+    def deleteSpecificTournamentRoundsMatches(self, tournamentId, roundNbrs):
+        with self.lock:
+            self.deleteTournamentRows(self.tournamentMatches, tournamentId, lambda match: match[0] in roundNbrs)
+
+    def deleteTournamentSpecificRoundMatches(self, tournamentId, roundNbr, matchNbrs):
+        with self.lock:
+            self.deleteTournamentRows(self.tournamentMatches, tournamentId, lambda match: match[0] == roundNbr and match[1] in matchNbrs)
+
+    def deleteAllTournamentRoundsByePlayers(self, tournamentId):
+        with self.lock:
+            self.replaceTournamentRows(self.tournamentRoundByePlayers, tournamentId, [])
+
+    def deleteSpecificTournamentRoundsByePlayers(self, tournamentId, roundNbrs):
+        with self.lock:
+            self.deleteTournamentRows(self.tournamentRoundByePlayers, tournamentId, lambda roundByePlayer: roundByePlayer[0] in roundNbrs)
+
+    def deleteAllTournamentRoundsHistoricalStandings(self, tournamentId):
+        with self.lock:
+            self.replaceTournamentRows(self.tournamentHistoricalStandingRows, tournamentId, [])
+
+    def deleteSpecificTournamentRoundsHistoricalStandings(self, tournamentId, roundNbrs):
+        with self.lock:
+            self.deleteTournamentRows(self.tournamentHistoricalStandingRows, tournamentId, lambda historicalStanding: historicalStanding[0] in roundNbrs)
+
+    def deleteFullTournamentRegister(self, tournamentId):
+        with self.lock:
+            self.replaceTournamentRows(self.tournamentRegisters, tournamentId, [])
+
+    def deleteSpecificTournamentRegisteredPlayers(self, tournamentId, playerIds):
+        with self.lock:
+            self.deleteTournamentRows(self.tournamentRegisters, tournamentId, lambda playerId: playerId in playerIds)
+
+    # Ids are not reused once rolled back, like those of a PostgreSQL sequence
+    def registerTournament(self, tournamentName):
+        with self.lock:
+            self.lastTournamentId += 1
+            tournamentId = self.lastTournamentId
+            self.tournaments[tournamentId] = tournamentName
+            self.logUndo(lambda: self.tournaments.pop(tournamentId))
+            return tournamentId
+
+    def registerPlayer(self, playerName):
+        with self.lock:
+            self.lastPlayerId += 1
+            playerId = self.lastPlayerId
+            self.players[playerId] = playerName
+            self.logUndo(lambda: self.players.pop(playerId))
+            return playerId
+
+    # Players can register for multiple tournaments, but only once for each tournament
+    def registerTournamentPlayer(self, tournamentId, playerId):
+        with self.lock:
+            if playerId in self.tournamentRegisters.get(tournamentId, ()):
+                raise ValueError("Player {0} is already registered for tournament {1}".format(playerId, tournamentId))
+            standingsEngine = self.getStandingsEngine(tournamentId)
+            self.appendTournamentRows(self.tournamentRegisters, tournamentId, [playerId])
+            standingsEngine.addPlayer(playerId, self.players[playerId])
+
+    def registerTournamentPlayers(self, tournamentId, playerIds):
+        playerIds = list(playerIds)
+        with self.lock:
+            registeredPlayerIds = set(self.tournamentRegisters.get(tournamentId, ()))
+            for playerId in playerIds:
+                if playerId in registeredPlayerIds:
+                    raise ValueError("Player {0} is already registered for tournament {1}".format(playerId, tournamentId))
+                registeredPlayerIds.add(playerId)
+            standingsEngine = self.getStandingsEngine(tournamentId)
+            self.appendTournamentRows(self.tournamentRegisters, tournamentId, playerIds)
+            for playerId in playerIds:
+                standingsEngine.addPlayer(playerId, self.players[playerId])
+
+    def registerTournamentHistoricalStandings(self, tournamentId, roundNbr, historicalStandings=None, finalRound=False):
+        if not self.determineKeyframeRound(roundNbr, finalRound):
+            return
+        with self.lock:
+            if historicalStandings is None:
+                historicalStandings = self.tournamentCurrentStandings(tournamentId)
+            self.appendTournamentRows(self.tournamentHistoricalStandingRows, tournamentId, storage.determineHistoricalStandings(roundNbr, historicalStandings))
+
+    def tournamentInfo(self, tournamentId):
+        with self.lock:
+            if tournamentId not in self.tournaments:
+                return None
+            return (tournamentId, self.tournaments[tournamentId])
+
+    def tournamentPlayerInfo(self, tournamentId):
+        with self.lock:
+            return [(playerId, self.players[playerId]) for playerId in self.tournamentRegisters.get(tournamentId, [])]
+
+    def tournamentPreviousRoundPlayerMatches(self, tournamentId):
+        with self.lock:
+            return [(match[2], match[3]) for match in self.tournamentMatches.get(tournamentId, [])]
+
+    def tournamentHistoricalStandingsKeyframe(self, tournamentId, roundNbr):
+        with self.lock:
+            historicalStandings = [historicalStanding for historicalStanding in self.tournamentHistoricalStandingRows.get(tournamentId, []) if historicalStanding[0] <= roundNbr]
+            if not historicalStandings:
+                return []
+            keyframeRoundNbr = max(historicalStanding[0] for historicalStanding in historicalStandings)
+            return sorted((historicalStanding for historicalStanding in historicalStandings if historicalStanding[0] == keyframeRoundNbr), key=lambda historicalStanding: historicalStanding[1])
+
+    def tournamentMatchResultsThroughRound(self, tournamentId, roundNbr=None):
+        with self.lock:
+            return [tuple(match) for match in sorted(self.tournamentMatches.get(tournamentId, [])) if roundNbr is None or match[0] <= roundNbr]
+
+    def tournamentRoundByePlayersThroughRound(self, tournamentId, roundNbr=None):
+        with self.lock:
+            return [(roundByePlayer[0], roundByePlayer[2]) for roundByePlayer in sorted(self.tournamentRoundByePlayers.get(tournamentId, [])) if roundNbr is None or roundByePlayer[0] <= roundNbr]
+
+    def tournamentTotalPlayerCount(self, tournamentId):
+        with self.lock:
+            return len(self.tournamentRegisters.get(tournamentId, []))
+
+    def tournamentTotalRoundCount(self, tournamentId):
+        return math.ceil(self.tournamentTotalPlayerCount(tournamentId) * 0.5)
+
+    def tournamentCurrentStandings(self, tournamentId):
+        with self.lock:
+            return list(self.getStandingsEngine(tournamentId).determineStandings())
+
+    def registerTournamentMatchResult(self, tournamentId, roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag=False):
+        with self.lock:
+            standingsEngine = self.getStandingsEngine(tournamentId)
+            self.appendTournamentRows(self.tournamentMatches, tournamentId, [(roundNbr, matchNbr, winnerPlayerId, loserPlayerId, bool(tieFlag))])
+            standingsEngine.registerMatchResult(winnerPlayerId, loserPlayerId, tieFlag)
+
+    def tournamentRoundMatchResults(self, tournamentId, roundNbr):
+        with self.lock:
+            roundMatches = sorted(match for match in self.tournamentMatches.get(tournamentId, []) if match[0] == roundNbr)
+            return [(matchNbr, winnerPlayerId, self.players[winnerPlayerId], loserPlayerId, self.players[loserPlayerId], tieFlag) for roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag in roundMatches]
+
+    def registerTournamentRoundByePlayer(self, tournamentId, roundNbr, playerRank, playerId):
+        with self.lock:
+            standingsEngine = self.getStandingsEngine(tournamentId)
+            self.appendTournamentRows(self.tournamentRoundByePlayers, tournamentId, [(roundNbr, playerRank, playerId)])
+            standingsEngine.registerByePlayer(playerId)
+
+    def tournamentTopPlayerWithNoByeRound(self, tournamentId):
+        with self.lock:
+            roundByePlayerIds = set(roundByePlayer[2] for roundByePlayer in self.tournamentRoundByePlayers.get(tournamentId, []))
+            for standing in self.tournamentCurrentStandings(tournamentId):
+                if standing[2] not in roundByePlayerIds:
+                    return (standing[0], standing[2], standing[3])
+            return None
+
+    def closeDbConnection(self):
+        pass
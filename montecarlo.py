@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+#
+# Monte Carlo batches of tournament simulations, fanned out across a process pool
+
+import multiprocessing
+import sys
+
+import outputsinks
+import storage
+import tournament
+import pairing
+import tiebreaks
+
+
+class MonteCarloResults:
+    ''' Streaming aggregate of a batch of simulations of one tournament player list. Players are identified by
+        their index in the player list. Finishes and round ranks are player_rank (1 is first), so they are
+        unique in every round. Results of runs are added one at a time (registerRun), and partial results
+        are merged together (merge), so no run's standings are kept. '''
+
+    def __init__(self, playerNames, qualifiedPlaces=3):
+        self.playerNames = list(playerNames)
+        self.qualifiedPlaces = qualifiedPlaces
+        self.runCount = 0
+        playerCount = len(self.playerNames)
+        self.finishCounts = [[0] * playerCount for playerIndex in range(playerCount)]
+        self.qualifiedCounts = [0] * playerCount
+        self.roundRankCounts = [[] for playerIndex in range(playerCount)]
+
+    # roundRanks[roundIndex][playerIndex] is the player's rank after the round; the last round's ranks are
+    # the players' finishes
+    def registerRun(self, roundRanks):
+        self.runCount += 1
+        for roundIndex, ranks in enumerate(roundRanks):
+            for playerIndex, rank in enumerate(ranks):
+                self.determinePlayerRoundRankCounts(playerIndex, roundIndex)[rank - 1] += 1
+        for playerIndex, finish in enumerate(roundRanks[-1]):
+            self.finishCounts[playerIndex][finish - 1] += 1
+            if finish <= self.qualifiedPlaces:
+                self.qualifiedCounts[playerIndex] += 1
+
+    def determinePlayerRoundRankCounts(self, playerIndex, roundIndex):
+        playerRoundRankCounts = self.roundRankCounts[playerIndex]
+        while len(playerRoundRankCounts) <= roundIndex:
+            playerRoundRankCounts.append([0] * len(self.playerNames))
+        return playerRoundRankCounts[roundIndex]
+
+    def merge(self, results):
+        self.runCount += results.runCount
+        for playerIndex in range(len(self.playerNames)):
+            self.qualifiedCounts[playerIndex] += results.qualifiedCounts[playerIndex]
+            for finishIndex, finishCount in enumerate(results.finishCounts[playerIndex]):
+                self.finishCounts[playerIndex][finishIndex] += finishCount
+            for roundIndex, rankCounts in enumerate(results.roundRankCounts[playerIndex]):
+                playerRoundRankCounts = self.determinePlayerRoundRankCounts(playerIndex, roundIndex)
+                for rankIndex, rankCount in enumerate(rankCounts):
+                    playerRoundRankCounts[rankIndex] += rankCount
+
+    def determineQualificationProbability(self, playerIndex):
+        return float(self.qualifiedCounts[playerIndex]) / self.runCount
+
+    # Probability of each finish, first place first
+    def determineFinishDistribution(self, playerIndex):
+        return [float(finishCount) / self.runCount for finishCount in self.finishCounts[playerIndex]]
+
+    def determineMeanFinish(self, playerIndex):
+        return sum(finish * finishCount for finish, finishCount in enumerate(self.finishCounts[playerIndex], 1)) / float(self.runCount)
+
+    # Number of runs in which the player had each rank after the round, first place first
+    def determineRoundRankHistogram(self, playerIndex, roundNbr):
+        return list(self.determinePlayerRoundRankCounts(playerIndex, roundNbr - 1))
+
+    def output(self):
+        print "{0} runs, {1} qualified places".format(self.runCount, self.qualifiedPlaces)
+        print "\nName\tQualified\tMean Finish\tFinish Distribution"
+        for playerIndex, playerName in enumerate(self.playerNames):
+            finishDistribution = " ".join("{0:.3f}".format(probability) for probability in self.determineFinishDistribution(playerIndex))
+            print "{0}\t{1:.3f}\t{2:.2f}\t{3}".format(playerName, self.determineQualificationProbability(playerIndex), self.determineMeanFinish(playerIndex), finishDistribution)
+
+
+class RoundRanksSink(outputsinks.NullSink):
+    ''' Sink which keeps the players' ranks after each round (see MonteCarloResults.registerRun) from the
+        standings the tournament writes to it, and discards everything else. Players are identified by their
+        index in the player id list. '''
+
+    def __init__(self, playerIds):
+        self.playerIndices = dict((playerId, playerIndex) for playerIndex, playerId in enumerate(playerIds))
+        self.roundRanks = []
+
+    def writeStandings(self, roundNbr, standings):
+        ranks = [None] * len(self.playerIndices)
+        for standing in standings:
+            ranks[self.playerIndices[standing[2]]] = standing[0]
+        self.roundRanks.append(ranks)
+
+
+# Simulates one quiet tournament of the players with its own storage and its own random number generator,
+# seeded with the run's seed, and returns the players' ranks after each round (see
+# MonteCarloResults.registerRun). The ranks are the tournament's standings after each round, as ranked by its
+# tie-breaks, so no standings are read back from storage.
+def simulateTournament(playerNames, seed, qualifiedPlaces=3, pairingMethod=pairing.BLOSSOM, backend=storage.MEMORY, tiebreakOrder=tiebreaks.DEFAULT_TIEBREAK_ORDER):
+    dbo = storage.createStorageOperations(backend)
+    playerIds = [dbo.registerPlayer(playerName) for playerName in playerNames]
+    roundRanksSink = RoundRanksSink(playerIds)
+    t = tournament.Tournament("Monte Carlo Run {0}".format(seed), dbo, qualifiedPlaces=qualifiedPlaces, pairingMethod=pairingMethod, seed=seed, outputSink=roundRanksSink, tiebreakOrder=tiebreakOrder)
+    t.registerPlayers(playerIds)
+    t.simulate()
+    return roundRanksSink.roundRanks
+
+
+# Worker task: simulates a chunk of runs, aggregating them in the worker so only the chunk's results are sent
+# back to the parent process
+def simulateTournaments(task):
+    playerNames, seeds, qualifiedPlaces, pairingMethod, backend, tiebreakOrder = task
+    results = MonteCarloResults(playerNames, qualifiedPlaces)
+    for seed in seeds:
+        results.registerRun(simulateTournament(playerNames, seed, qualifiedPlaces, pairingMethod, backend, tiebreakOrder))
+    return results
+
+
+# Simulates runCount tournaments of the players across processCount worker processes (one per CPU by default)
+# and returns the aggregated MonteCarloResults. Run i is seeded with seed + i, so a batch's results are the
+# same whichever worker simulates each run and however many workers there are. Runs are sent to workers in
+# chunks of chunkSize, and each chunk's results are merged as soon as it is done.
+def simulateBatch(playerNames, runCount, qualifiedPlaces=3, pairingMethod=pairing.BLOSSOM, processCount=None, seed=0, chunkSize=50, backend=storage.MEMORY, tiebreakOrder=tiebreaks.DEFAULT_TIEBREAK_ORDER):
+    tasks = [(playerNames, range(seed + chunkStart, seed + min(chunkStart + chunkSize, runCount)), qualifiedPlaces, pairingMethod, backend, tiebreakOrder) for chunkStart in range(0, runCount, chunkSize)]
+    results = MonteCarloResults(playerNames, qualifiedPlaces)
+    if processCount == 1:
+        for task in tasks:
+            results.merge(simulateTournaments(task))
+        return results
+
+    pool = multiprocessing.Pool(processCount)
+    try:
+        for chunkResults in pool.imap_unordered(simulateTournaments, tasks):
+            results.merge(chunkResults)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+if __name__ == '__main__':
+    runCount = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    playerNames = ["Ross S", "Hill L", "Marc V", "Ross B", "Andy R", "Peter R", "Dave G"]
+    simulateBatch(playerNames, runCount).output()
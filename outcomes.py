@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Match results, by match outcome: player 1 wins below PLAYER1_WIN_THRESHOLD, player 2 wins below
+# PLAYER2_WIN_THRESHOLD, and the match is a tie otherwise
+PLAYER1_WIN = 0
+PLAYER2_WIN = 1
+TIE = 2
+
+PLAYER1_WIN_THRESHOLD = .45
+PLAYER2_WIN_THRESHOLD = .9
+
+
+def determineMatchResult(matchOutcome):
+    if matchOutcome < PLAYER1_WIN_THRESHOLD:
+        return PLAYER1_WIN
+    elif matchOutcome < PLAYER2_WIN_THRESHOLD:
+        return PLAYER2_WIN
+    else:
+        return TIE
+
+
+# Match results of a batch of match outcomes. With NumPy, the thresholds are applied to the whole batch at
+# once: the result is the number of thresholds each outcome is at or above.
+def determineMatchResults(matchOutcomes):
+    if numpy is None:
+        return [determineMatchResult(matchOutcome) for matchOutcome in matchOutcomes]
+    return numpy.searchsorted(numpy.array([PLAYER1_WIN_THRESHOLD, PLAYER2_WIN_THRESHOLD]), numpy.asarray(matchOutcomes, dtype=float), side='right').tolist()
+
+
+class OutcomeGenerator:
+    ''' Draws a tournament's match outcomes (random numbers between 0 and 1) and makes its other random choices
+        (the first round's bye player and match combination) from one random number generator, so tournaments
+        with the same seed are the same tournament. The generator is rng, a random.Random or a NumPy
+        RandomState (or Generator); else a random.Random seeded with seed; else, with neither, the random
+        module's global generator. '''
+
+    def __init__(self, seed=None, rng=None):
+        if rng is None:
+            rng = random if seed is None else random.Random(seed)
+        self.rng = rng
+        self.numpyRng = hasattr(rng, "random_sample") or hasattr(rng, "integers")
+
+    # NumPy generators draw the whole batch in one call
+    def drawMatchOutcomes(self, matchCount):
+        if not self.numpyRng:
+            return [self.rng.random() for matchIndex in xrange(matchCount)]
+        if hasattr(self.rng, "random_sample"):
+            return self.rng.random_sample(matchCount)
+        return self.rng.random(matchCount)
+
+    def choice(self, sequence):
+        if not self.numpyRng:
+            return self.rng.choice(sequence)
+        if hasattr(self.rng, "integers"):
+            return sequence[int(self.rng.integers(len(sequence)))]
+        return sequence[int(self.rng.randint(len(sequence)))]
+
+    def shuffle(self, items):
+        self.rng.shuffle(items)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+#
+# Output sinks which tournaments write their progress to: the tournament's name, each round's matches and
+# their results, and the standings after each round. Sinks buffer what is written to them, and the
+# tournament flushes them once per round.
+
+import cStringIO
+import csv
+import json
+import sys
+
+STANDINGS_CSV_HEADER = ("round_nbr", "player_rank", "actual_player_rank", "player_id", "player_name", "wins", "losses", "ties", "points", "opponent_points")
+
+
+class OutputSink:
+    ''' Interface of the output sinks. Standings are current_standings rows (player_rank, actual_player_rank,
+        player_id, player_name, wins, losses, ties, points, opponent_points). '''
+
+    def writeTournamentName(self, tournamentName):
+        raise NotImplementedError
+
+    # The round's bye player, matches and match results (see Round)
+    def writeRound(self, rnd, tournamentTotalRoundCount, tournamentTotalPlayerCountOdd):
+        raise NotImplementedError
+
+    def writeStandings(self, roundNbr, standings):
+        raise NotImplementedError
+
+    def flush(self):
+        raise NotImplementedError
+
+
+class NullSink(OutputSink):
+    ''' Sink which discards everything written to it, e.g. for batches of simulations '''
+
+    def writeTournamentName(self, tournamentName):
+        pass
+
+    def writeRound(self, rnd, tournamentTotalRoundCount, tournamentTotalPlayerCountOdd):
+        pass
+
+    def writeStandings(self, roundNbr, standings):
+        pass
+
+    def flush(self):
+        pass
+
+
+class BufferedSink(OutputSink):
+    ''' Sink which buffers formatted output until flushed, then writes it to its stream in one write. The
+        stream is standard output unless one is given. '''
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.buffer = []
+
+    # Standard output is looked up when flushing, so output follows it if it is redirected
+    def getStream(self):
+        if self.stream is None:
+            return sys.stdout
+        return self.stream
+
+    def flush(self):
+        if self.buffer:
+            stream = self.getStream()
+            stream.write("".join(self.buffer))
+            stream.flush()
+            self.buffer = []
+
+
+class TextSink(BufferedSink):
+    ''' Sink which writes the tournament in human readable text, one round and its standings at a time '''
+
+    def writeTournamentName(self, tournamentName):
+        self.buffer.append("{0}\n".format(tournamentName))
+
+    def writeRound(self, rnd, tournamentTotalRoundCount, tournamentTotalPlayerCountOdd):
+        lines = ["", "Round {0} of {1}:".format(rnd.nbr, tournamentTotalRoundCount), ""]
+        if tournamentTotalPlayerCountOdd:
+            lines.append("Bye Player: {0}".format(rnd.roundByePlayerName))
+            lines.append("")
+        lines.extend(match.formatMatch() for match in rnd.matches)
+        lines.append("")
+        lines.extend(match.formatMatchResult() for match in rnd.matches)
+        lines.append("")
+        self.buffer.append("\n".join(lines))
+
+    def writeStandings(self, roundNbr, standings):
+        lines = ["", "Rank\tPID\tName\tW\tL\tT\tPoints\tOMP"]
+        lines.extend("\t".join(str(standingField) for standingField in standing[1:]) + "\t" for standing in standings)
+        lines.append("")
+        self.buffer.append("\n".join(lines))
+
+
+class JsonLinesSink(BufferedSink):
+    ''' Sink which writes one JSON object per line: the tournament ({"type": "tournament"}), each round
+        ({"type": "round"}) and each round's standings ({"type": "standings"}) '''
+
+    def writeLine(self, line):
+        self.buffer.append(json.dumps(line, sort_keys=True))
+        self.buffer.append("\n")
+
+    def writeTournamentName(self, tournamentName):
+        self.writeLine({"type": "tournament", "name": tournamentName})
+
+    # The winner of a tie is None
+    def writeRound(self, rnd, tournamentTotalRoundCount, tournamentTotalPlayerCountOdd):
+        matches = [{"matchNbr": match.nbr, "player1Id": match.player1Id, "player1Name": match.player1Name, "player2Id": match.player2Id, "player2Name": match.player2Name, "winnerPlayerId": None if match.tieFlag else match.winnerPlayerId, "tie": match.tieFlag} for match in rnd.matches]
+        self.writeLine({"type": "round", "roundNbr": rnd.nbr, "roundCount": tournamentTotalRoundCount, "byePlayerId": rnd.roundByePlayerId, "byePlayerName": rnd.roundByePlayerName, "matches": matches})
+
+    # Points are converted to float, since PostgreSQL returns them as Decimals
+    def writeStandings(self, roundNbr, standings):
+        standingRows = [{"rank": standing[0], "actualRank": standing[1], "playerId": standing[2], "playerName": standing[3], "wins": standing[4], "losses": standing[5], "ties": standing[6], "points": float(standing[7]), "opponentPoints": float(standing[8])} for standing in standings]
+        self.writeLine({"type": "standings", "roundNbr": roundNbr, "standings": standingRows})
+
+
+class CsvSink(BufferedSink):
+    ''' Sink which writes the standings after each round as CSV, with a header row (STANDINGS_CSV_HEADER).
+        Tournament names and rounds are not written. '''
+
+    def __init__(self, stream=None):
+        BufferedSink.__init__(self, stream)
+        self.writeRows([STANDINGS_CSV_HEADER])
+
+    # The csv module does not write unicode, so player names are encoded as UTF-8
+    def writeRows(self, rows):
+        rowsBuffer = cStringIO.StringIO()
+        csv.writer(rowsBuffer, lineterminator="\n").writerows([field.encode("utf-8") if isinstance(field, unicode) else field for field in row] for row in rows)
+        self.buffer.append(rowsBuffer.getvalue())
+
+    def writeTournamentName(self, tournamentName):
+        pass
+
+    def writeRound(self, rnd, tournamentTotalRoundCount, tournamentTotalPlayerCountOdd):
+        pass
+
+    def writeStandings(self, roundNbr, standings):
+        self.writeRows((roundNbr,) + tuple(standing[:9]) for standing in standings)
@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+
+import itertools
+import time
+
+import instrumentation
+import weightedmatching
+
+# Tournament pairing methods
+EXHAUSTIVE = "exhaustive"
+BLOSSOM = "blossom"
+SCORE_GROUP = "scoregroup"
+BRANCH_AND_BOUND = "branchandbound"
+
+
+class NoPairingError(ValueError):
+    ''' Raised when a round's players cannot be paired without previously played matches '''
+
+
+class BlossomPairer:
+    ''' Pairs a tournament round as a minimum cost perfect matching, solved with the blossom algorithm '''
+
+    # rankWindow limits the initial matching graph to players at most rankWindow places apart. Pairs
+    # outside the window are only generated and added when the dual solution shows they could improve the
+    # pairing (see determineViolatedOutsideEdges), so the result is always the same as matching over the full
+    # graph.
+    def __init__(self, rankWindow=16):
+        self.rankWindow = rankWindow
+
+    # Returns the match combination which minimizes the sum of the difference in rankings of each match
+    # squared, does not include any previously played matches and excludes the round's bye player. The
+    # combination is sorted by rank with the top ranked player of each match first, and ends with its
+    # quality, as expected by Round.setPlayerMatchCombination.
+    def pairRound(self, tournamentPreviousRoundStandings, tournamentPreviousRoundsPlayedMatches, roundByePlayerId=None):
+        playerRanks = [standing[0] for standing in tournamentPreviousRoundStandings if standing[2] != roundByePlayerId]
+        playerIds = [standing[2] for standing in tournamentPreviousRoundStandings if standing[2] != roundByePlayerId]
+
+        if not playerIds:
+            return [0.0]
+
+        mate = self.determineMinimumCostPerfectMatching(playerIds, playerRanks, tournamentPreviousRoundsPlayedMatches)
+
+        bestRoundPlayerMatchCombination = []
+        bestRoundPlayerMatchCombinationQuality = 0.0
+        for playerIndex, mateIndex in enumerate(mate):
+            if mateIndex > playerIndex:
+                bestRoundPlayerMatchCombination.append((playerIds[playerIndex], playerIds[mateIndex]))
+                bestRoundPlayerMatchCombinationQuality += (playerRanks[playerIndex] - playerRanks[mateIndex]) ** 2
+
+        bestRoundPlayerMatchCombination.append(bestRoundPlayerMatchCombinationQuality)
+
+        return bestRoundPlayerMatchCombination
+
+    # Matches the rank window's edges, adding the outside edges the dual solution shows could improve the
+    # pairing until none can. If the window's edges have no perfect matching, every outside edge is added.
+    def determineMinimumCostPerfectMatching(self, playerIds, playerRanks, tournamentPreviousRoundsPlayedMatches):
+        edges = self.determineMatchingEdges(playerIds, playerRanks, tournamentPreviousRoundsPlayedMatches)
+        addedOutsideEdges = set()
+        allOutsideEdgesAdded = self.rankWindow is None
+
+        def findViolatedOutsideEdges(vertexDuals, outsideEdgeSlack):
+            if allOutsideEdgesAdded or len(vertexDuals) < len(playerIds):
+                return []
+            return self.determineViolatedOutsideEdges(playerIds, playerRanks, tournamentPreviousRoundsPlayedMatches, addedOutsideEdges, vertexDuals, outsideEdgeSlack)
+
+        while True:
+            mate, violatedOutsideEdges = weightedmatching.maxWeightMatching(edges, True, findViolatedOutsideEdges)
+            if len(mate) < len(playerIds) or -1 in mate:
+                if allOutsideEdgesAdded:
+                    raise NoPairingError("No player match combination without previously played matches exists")
+                edges = edges + [edge for edge in self.determineOutsideEdges(playerIds, playerRanks, tournamentPreviousRoundsPlayedMatches) if edge not in addedOutsideEdges]
+                allOutsideEdgesAdded = True
+            elif violatedOutsideEdges:
+                edges = edges + violatedOutsideEdges
+                addedOutsideEdges.update(violatedOutsideEdges)
+            else:
+                return mate
+
+    # Edge weights are inverted costs, so that the maximum weight perfect matching is the minimum cost one.
+    # Ranks increase with player index, so an edge's weight decreases as its players are further apart.
+    def determineEdgeWeight(self, playerRanks, i, j):
+        return (playerRanks[-1] - playerRanks[0]) ** 2 + 1 - (playerRanks[i] - playerRanks[j]) ** 2
+
+    # Edges (candidate matches) of players at most rankWindow places apart. Edges are counted as generated,
+    # and those of previously played matches as pruned.
+    def determineMatchingEdges(self, playerIds, playerRanks, tournamentPreviousRoundsPlayedMatches):
+        edges = []
+        prunedEdgeCount = 0
+        for i in range(len(playerIds)):
+            windowEnd = len(playerIds) if self.rankWindow is None else min(len(playerIds), i + self.rankWindow + 1)
+            for j in range(i + 1, windowEnd):
+                if tournamentPreviousRoundsPlayedMatches.played(playerIds[i], playerIds[j]):
+                    prunedEdgeCount += 1
+                    continue
+                edges.append((i, j, self.determineEdgeWeight(playerRanks, i, j)))
+
+        instrumentation.incrementCounter("pairing.blossom.edgesGenerated", len(edges))
+        instrumentation.incrementCounter("pairing.blossom.edgesPruned", prunedEdgeCount)
+        return edges
+
+    # Every edge of players more than rankWindow places apart
+    def determineOutsideEdges(self, playerIds, playerRanks, tournamentPreviousRoundsPlayedMatches):
+        outsideEdges = []
+        prunedEdgeCount = 0
+        for i in range(len(playerIds)):
+            for j in range(i + self.rankWindow + 1, len(playerIds)):
+                if tournamentPreviousRoundsPlayedMatches.played(playerIds[i], playerIds[j]):
+                    prunedEdgeCount += 1
+                    continue
+                outsideEdges.append((i, j, self.determineEdgeWeight(playerRanks, i, j)))
+
+        instrumentation.incrementCounter("pairing.blossom.edgesGenerated", len(outsideEdges))
+        instrumentation.incrementCounter("pairing.blossom.edgesPruned", prunedEdgeCount)
+        return outsideEdges
+
+    # Outside edges not yet added whose slack is negative under the dual solution. An edge's slack is at least
+    # its players' duals less twice its weight, and weights decrease further down the rankings, so each
+    # player's edges are only generated while twice their weight less the player's dual still exceeds the
+    # lowest dual; further edges cannot be violated. Slack is only calculated for edges whose players' duals
+    # are less than twice their weight.
+    def determineViolatedOutsideEdges(self, playerIds, playerRanks, tournamentPreviousRoundsPlayedMatches, addedOutsideEdges, vertexDuals, outsideEdgeSlack):
+        lowestDual = min(vertexDuals)
+        violatedOutsideEdges = []
+        generatedEdgeCount = 0
+        prunedEdgeCount = 0
+        for i in range(len(playerIds)):
+            for j in range(i + self.rankWindow + 1, len(playerIds)):
+                weight = self.determineEdgeWeight(playerRanks, i, j)
+                if 2 * weight - vertexDuals[i] <= lowestDual:
+                    break
+                if vertexDuals[i] + vertexDuals[j] >= 2 * weight:
+                    continue
+                edge = (i, j, weight)
+                if edge in addedOutsideEdges:
+                    continue
+                if tournamentPreviousRoundsPlayedMatches.played(playerIds[i], playerIds[j]):
+                    prunedEdgeCount += 1
+                    continue
+                generatedEdgeCount += 1
+                if outsideEdgeSlack(edge) < 0:
+                    violatedOutsideEdges.append(edge)
+
+        instrumentation.incrementCounter("pairing.blossom.edgesGenerated", generatedEdgeCount)
+        instrumentation.incrementCounter("pairing.blossom.edgesPruned", prunedEdgeCount)
+        return violatedOutsideEdges
+
+
+class ScoreGroupPairer:
+    ''' Pairs a tournament round Dutch-system style, inside groups of players with the same points '''
+
+    # bracketNodeBudget limits the backtracking search for each attempt at pairing a score group
+    def __init__(self, bracketNodeBudget=10000):
+        self.bracketNodeBudget = bracketNodeBudget
+
+    # Pairs each score group top half vs. bottom half, from the highest points down. Players who cannot be
+    # paired in their score group (odd group, or blocked by previously played matches) float down into the
+    # next score group. If the lowest score group cannot be paired, it is merged with the score group above
+    # it. Returns the same sorted combination format as BlossomPairer.pairRound.
+    def pairRound(self, tournamentPreviousRoundStandings, tournamentPreviousRoundsPlayedMatches, roundByePlayerId=None):
+        standings = [standing for standing in tournamentPreviousRoundStandings if standing[2] != roundByePlayerId]
+        scoreGroups = [list(scoreGroup) for points, scoreGroup in itertools.groupby(standings, key=lambda standing: standing[7])]
+
+        pairedScoreGroups = []
+        floaters = []
+        scoreGroupIndex = 0
+        while scoreGroupIndex < len(scoreGroups):
+            lastScoreGroup = scoreGroupIndex == len(scoreGroups) - 1
+            bracketMatches, bracketFloaters = self.pairBracket(floaters + scoreGroups[scoreGroupIndex], tournamentPreviousRoundsPlayedMatches, lastScoreGroup)
+            if bracketMatches is None:
+                if not pairedScoreGroups:
+                    raise NoPairingError("No player match combination without previously played matches exists")
+                floaters, previousScoreGroup, previousBracketMatches = pairedScoreGroups.pop()
+                scoreGroups[scoreGroupIndex] = previousScoreGroup + scoreGroups[scoreGroupIndex]
+                continue
+            pairedScoreGroups.append((floaters, scoreGroups[scoreGroupIndex], bracketMatches))
+            floaters = bracketFloaters
+            scoreGroupIndex += 1
+
+        playerRanks = dict((standing[2], standing[0]) for standing in standings)
+        bestRoundPlayerMatchCombination = sorted((match for floaters, scoreGroup, bracketMatches in pairedScoreGroups for match in bracketMatches), key=lambda match: playerRanks[match[0]])
+        bestRoundPlayerMatchCombinationQuality = float(sum((playerRanks[match[0]] - playerRanks[match[1]]) ** 2 for match in bestRoundPlayerMatchCombination))
+        bestRoundPlayerMatchCombination.append(bestRoundPlayerMatchCombinationQuality)
+
+        return bestRoundPlayerMatchCombination
+
+    # Pairs as many bracket players as possible, floating the fewest (and lowest ranked) players down. The
+    # lowest score group has nowhere to float players to, so it must be paired completely or not at all.
+    def pairBracket(self, bracket, tournamentPreviousRoundsPlayedMatches, lastScoreGroup):
+        if lastScoreGroup:
+            floatCounts = [len(bracket) % 2]
+        else:
+            floatCounts = range(len(bracket) % 2, len(bracket) + 1, 2)
+
+        for floatCount in floatCounts:
+            bracketPairing = self.searchBracket(bracket, tournamentPreviousRoundsPlayedMatches, floatCount)
+            if bracketPairing is not None:
+                bracketMatches = [(bracket[i][2], bracket[j][2]) for (i, j) in bracketPairing if j is not None]
+                floaters = [bracket[i] for (i, j) in bracketPairing if j is None]
+                return bracketMatches, floaters
+
+        return None, None
+
+    # Backtracking search which pairs bracket players in rank order, each preferring the opponent in the same
+    # position of the bottom half of the bracket. Returns a list of (playerIndex, opponentIndex) tuples, with
+    # opponentIndex None for floaters, or None when no pairing is found within the node budget. The search
+    # keeps an explicit stack so that large score groups do not hit the recursion limit. Search nodes are
+    # counted as generated.
+    def searchBracket(self, bracket, tournamentPreviousRoundsPlayedMatches, floatCount):
+        bracketSize = len(bracket)
+        halfSize = (bracketSize - floatCount) // 2
+        assigned = [False] * bracketSize
+
+        def bracketOptions(i, floatsRemaining):
+            target = i + halfSize
+            for j in range(max(target, i + 1), bracketSize) + range(min(target, bracketSize) - 1, i, -1):
+                if not assigned[j] and not tournamentPreviousRoundsPlayedMatches.played(bracket[i][2], bracket[j][2]):
+                    yield j
+            if floatsRemaining > 0:
+                yield None
+
+        # Each stack frame is [playerIndex, remaining options, chosen option, floats remaining before choosing]
+        stack = []
+        i = 0
+        floatsRemaining = floatCount
+        nodeCount = 0
+        try:
+            while True:
+                while i < bracketSize and assigned[i]:
+                    i += 1
+                if i < bracketSize:
+                    nodeCount += 1
+                    if nodeCount > self.bracketNodeBudget:
+                        return None
+                    assigned[i] = True
+                    stack.append([i, bracketOptions(i, floatsRemaining), None, floatsRemaining])
+                elif floatsRemaining == 0:
+                    return [(frame[0], frame[2]) for frame in stack]
+
+                while stack:
+                    frame = stack[-1]
+                    if frame[2] is not None:
+                        assigned[frame[2]] = False
+                    floatsRemaining = frame[3]
+                    option = next(frame[1], False)
+                    if option is False:
+                        assigned[frame[0]] = False
+                        stack.pop()
+                        continue
+                    frame[2] = option
+                    if option is None:
+                        floatsRemaining -= 1
+                    else:
+                        assigned[option] = True
+                    i = frame[0] + 1
+                    break
+                else:
+                    return None
+        finally:
+            instrumentation.incrementCounter("pairing.scoregroup.nodesGenerated", nodeCount)
+
+
+class BranchAndBoundPairer:
+    ''' Pairs a tournament round with a depth-first branch-and-bound search over player match combinations '''
+
+    # The search stops after nodeBudget search nodes or timeBudget seconds, and the best combination found so
+    # far is used. Set both to None for an exact search.
+    def __init__(self, nodeBudget=100000, timeBudget=None):
+        self.nodeBudget = nodeBudget
+        self.timeBudget = timeBudget
+
+    # Returns the best player match combination found, in the same sorted combination format as
+    # BlossomPairer.pairRound. Late rounds can leave so few valid opponents that no combination is found
+    # within the budget; the round is then paired with the blossom pairer instead.
+    def pairRound(self, tournamentPreviousRoundStandings, tournamentPreviousRoundsPlayedMatches, roundByePlayerId=None):
+        bestRoundPlayerMatchCombination = None
+        for bestRoundPlayerMatchCombination in self.generatePlayerMatchCombinations(tournamentPreviousRoundStandings, tournamentPreviousRoundsPlayedMatches, roundByePlayerId):
+            pass
+
+        if bestRoundPlayerMatchCombination is None:
+            bestRoundPlayerMatchCombination = BlossomPairer().pairRound(tournamentPreviousRoundStandings, tournamentPreviousRoundsPlayedMatches, roundByePlayerId)
+
+        return bestRoundPlayerMatchCombination
+
+    # Lazily yields player match combinations, each with a better quality than the one before it. The top
+    # ranked unpaired player is paired first, trying opponents in rank order, so the first combination is
+    # available right away. Previously played matches and the bye player are skipped while pairing, and a
+    # partial combination is pruned as soon as its quality plus the best possible quality of pairing the
+    # remaining players (neighbours in rank order) cannot beat the best combination found so far. Only the
+    # current partial combination is held in memory. Search nodes are counted as generated, and partial
+    # combinations cut off by the bound as pruned.
+    def generatePlayerMatchCombinations(self, tournamentPreviousRoundStandings, tournamentPreviousRoundsPlayedMatches, roundByePlayerId=None):
+        playerRanks = [standing[0] for standing in tournamentPreviousRoundStandings if standing[2] != roundByePlayerId]
+        playerIds = [standing[2] for standing in tournamentPreviousRoundStandings if standing[2] != roundByePlayerId]
+        playerCount = len(playerIds)
+        paired = [False] * playerCount
+
+        def remainingQualityBound():
+            bound = 0
+            unpairedIndex = None
+            for k in range(playerCount):
+                if not paired[k]:
+                    if unpairedIndex is None:
+                        unpairedIndex = k
+                    else:
+                        bound += (playerRanks[k] - playerRanks[unpairedIndex]) ** 2
+                        unpairedIndex = None
+            return bound
+
+        def opponents(i):
+            for j in range(i + 1, playerCount):
+                if not paired[j] and not tournamentPreviousRoundsPlayedMatches.played(playerIds[i], playerIds[j]):
+                    yield j
+
+        # Each stack frame is [playerIndex, remaining opponents, chosen opponent]
+        stack = []
+        quality = 0
+        bestQuality = None
+        nodeCount = 0
+        prunedNodeCount = 0
+        startTime = time.time()
+        i = 0
+        try:
+            while True:
+                while i < playerCount and paired[i]:
+                    i += 1
+                if i == playerCount:
+                    if bestQuality is None or quality < bestQuality:
+                        bestQuality = quality
+                        playerMatchCombination = [(playerIds[frame[0]], playerIds[frame[2]]) for frame in stack]
+                        playerMatchCombination.append(float(quality))
+                        yield playerMatchCombination
+                else:
+                    if self.budgetExhausted(nodeCount, startTime):
+                        return
+                    nodeCount += 1
+                    if bestQuality is None or quality + remainingQualityBound() < bestQuality:
+                        paired[i] = True
+                        stack.append([i, opponents(i), None])
+                    else:
+                        prunedNodeCount += 1
+
+                while stack:
+                    frame = stack[-1]
+                    if frame[2] is not None:
+                        paired[frame[2]] = False
+                        quality -= (playerRanks[frame[0]] - playerRanks[frame[2]]) ** 2
+                        frame[2] = None
+                    j = next(frame[1], None)
+                    # Later opponents are further away in rank, so none of them can beat the best quality either
+                    if j is None or (bestQuality is not None and quality + (playerRanks[frame[0]] - playerRanks[j]) ** 2 >= bestQuality):
+                        if j is not None:
+                            prunedNodeCount += 1
+                        paired[frame[0]] = False
+                        stack.pop()
+                        continue
+                    frame[2] = j
+                    paired[j] = True
+                    quality += (playerRanks[frame[0]] - playerRanks[j]) ** 2
+                    i = frame[0] + 1
+                    break
+                else:
+                    return
+        finally:
+            instrumentation.incrementCounter("pairing.branchandbound.nodesGenerated", nodeCount)
+            instrumentation.incrementCounter("pairing.branchandbound.nodesPruned", prunedNodeCount)
+
+    def budgetExhausted(self, nodeCount, startTime):
+        if self.nodeBudget is not None and nodeCount >= self.nodeBudget:
+            return True
+        if self.timeBudget is not None and time.time() - startTime >= self.timeBudget:
+            return True
+        return False
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+
+class PlayedPairs:
+    ''' Index of a tournament's previously played matches, keyed by unordered player pair '''
+
+    def __init__(self, playedMatches=()):
+        self.pairs = set()
+        for playedMatch in playedMatches:
+            self.registerPlayedMatch(playedMatch[0], playedMatch[1])
+
+    # Rebuilds the index of a resumed tournament from the matches registered in the database
+    @classmethod
+    def fromDb(cls, dbo, tournamentId):
+        return cls(dbo.tournamentPreviousRoundPlayerMatches(tournamentId))
+
+    def registerPlayedMatch(self, player1Id, player2Id):
+        self.pairs.add(frozenset((player1Id, player2Id)))
+
+    def played(self, player1Id, player2Id):
+        return frozenset((player1Id, player2Id)) in self.pairs
+
+    def __contains__(self, match):
+        return self.played(match[0], match[1])
+
+    def __iter__(self):
+        for pair in self.pairs:
+            yield tuple(pair)
+
+    def __len__(self):
+        return len(self.pairs)
+
+
+class PlayedPairsBitMatrix:
+    ''' Index of a tournament's previously played matches, stored as a packed bit adjacency matrix over dense
+        player indices. Each matrix row is a Python integer with bit j set if the row's player played the
+        player with index j. '''
+
+    def __init__(self, playedMatches=(), playerIds=()):
+        self.playerIndices = {}
+        self.playerIds = []
+        self.rows = []
+        for playerId in playerIds:
+            self.determinePlayerIndex(playerId)
+        for playedMatch in playedMatches:
+            self.registerPlayedMatch(playedMatch[0], playedMatch[1])
+
+    @classmethod
+    def fromDb(cls, dbo, tournamentId):
+        playerIds = [player[0] for player in dbo.tournamentPlayerInfo(tournamentId)]
+        return cls(dbo.tournamentPreviousRoundPlayerMatches(tournamentId), playerIds)
+
+    # Players are given the next dense index the first time they are seen
+    def determinePlayerIndex(self, playerId):
+        playerIndex = self.playerIndices.get(playerId)
+        if playerIndex is None:
+            playerIndex = len(self.playerIds)
+            self.playerIndices[playerId] = playerIndex
+            self.playerIds.append(playerId)
+            self.rows.append(0)
+        return playerIndex
+
+    def registerPlayedMatch(self, player1Id, player2Id):
+        player1Index = self.determinePlayerIndex(player1Id)
+        player2Index = self.determinePlayerIndex(player2Id)
+        self.rows[player1Index] |= 1 << player2Index
+        self.rows[player2Index] |= 1 << player1Index
+
+    def played(self, player1Id, player2Id):
+        player1Index = self.playerIndices.get(player1Id)
+        player2Index = self.playerIndices.get(player2Id)
+        if player1Index is None or player2Index is None:
+            return False
+        return (self.rows[player1Index] >> player2Index) & 1 == 1
+
+    def __contains__(self, match):
+        return self.played(match[0], match[1])
+
+    def __iter__(self):
+        for player1Index, row in enumerate(self.rows):
+            row >>= player1Index
+            player2Index = player1Index
+            while row:
+                if row & 1:
+                    yield (self.playerIds[player1Index], self.playerIds[player2Index])
+                row >>= 1
+                player2Index += 1
+
+    def __len__(self):
+        return sum(bin(row).count("1") for row in self.rows) // 2
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+import array
+
+
+class PlayerRegistry:
+    ''' Maps a tournament's player ids to dense indices, and keeps the players' names, current ranks and
+        current points in flat arrays indexed by them '''
+
+    def __init__(self, players):
+        self.playerIndices = {}
+        self.playerIds = []
+        self.names = []
+        self.ranks = array.array('l')
+        self.points = array.array('d')
+        for player in players:
+            self.addPlayer(player[0], player[1])
+
+    def addPlayer(self, playerId, playerName):
+        self.playerIndices[playerId] = len(self.playerIds)
+        self.playerIds.append(playerId)
+        self.names.append(playerName)
+        self.ranks.append(0)
+        self.points.append(0.0)
+
+    # Refreshes the players' ranks (player_rank) and points from the tournament's current standings
+    def updateStandings(self, standings):
+        for standing in standings:
+            playerIndex = self.playerIndices[standing[2]]
+            self.ranks[playerIndex] = standing[0]
+            if len(standing) > 7:
+                self.points[playerIndex] = standing[7]
+
+    def playerIndex(self, playerId):
+        return self.playerIndices[playerId]
+
+    def playerName(self, playerId):
+        return self.names[self.playerIndices[playerId]]
+
+    def playerRank(self, playerId):
+        return self.ranks[self.playerIndices[playerId]]
+
+    def playerPoints(self, playerId):
+        return self.points[self.playerIndices[playerId]]
+
+    def __len__(self):
+        return len(self.playerIds)
@@ -1,29 +1,58 @@
 #!/usr/bin/env python
 
-import math
-import random
-import copy
+import array
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import instrumentation
 import match
+import outcomes
+import pairing
+import playerregistry
+
+
+# Encodes player match combinations as an int array of shape (combinations, matches, 2) over the players'
+# dense registry indices, for NumPy vectorized quality scoring. Every combination must have the same number
+# of matches. The shape is given explicitly, as NumPy would make combinations without matches (the one
+# combination of a one player tournament) a two dimensional array.
+def encodePlayerMatchCombinations(playerMatchCombinations, playerRegistry):
+    playerIndices = playerRegistry.playerIndices
+    matchCount = len(playerMatchCombinations[0]) if playerMatchCombinations else 0
+    playerMatchCombinationArray = numpy.array([[(playerIndices[match[0]], playerIndices[match[1]]) for match in playerMatchCombination] for playerMatchCombination in playerMatchCombinations], dtype=numpy.int32)
+    return playerMatchCombinationArray.reshape(len(playerMatchCombinations), matchCount, 2)
 
 
 class Round:
     ''' Includes tournament round related data and operations '''
 
-    def __init__(self, dbo, tournamentId, roundNbr):
+    # Rounds simulated outside of a tournament draw from the random module's global generator
+    def __init__(self, dbo, tournamentId, roundNbr, outcomeGenerator=None):
         self.dbo = dbo
         self.tournamentId = tournamentId
         self.nbr = roundNbr
         self.matches = []
+        self.outcomeGenerator = outcomeGenerator
+        if self.outcomeGenerator is None:
+            self.outcomeGenerator = outcomes.OutcomeGenerator()
 
         self.roundByePlayerRank = None
         self.roundByePlayerId = None
         self.roundByePlayerName = None
 
         self.roundPossiblePlayerMatchCombinations = None
+        self.roundPossiblePlayerMatchCombinationIndices = None
+        self.roundPossiblePlayerMatchCombinationArray = None
+        self.roundPossiblePlayerMatchCombinationQualities = None
+        self.bestRoundPossiblePlayerMatchCombinationQuality = None
         self.tournamentPreviousRoundsPlayedMatches = None
         self.tournamentPreviousRoundStandings = None
+        self.playerRegistry = None
+        self.standingsEngine = None
         self.playerMatchCombination = None
+        self.finalRound = False
 
     def setRoundByePlayer(self, roundByePlayer):
         self.roundByePlayerRank = roundByePlayer[0]
@@ -33,87 +62,185 @@ class Round:
     def registerRoundByePlayerInDb(self):
         self.dbo.registerTournamentRoundByePlayer(self.tournamentId, self.nbr, self.roundByePlayerRank, self.roundByePlayerId)
 
-    # All possible match combinations, even with round's bye player (if there are an odd number of players)
+    def registerHistoricalStandingsInDb(self):
+        self.dbo.registerTournamentHistoricalStandings(self.tournamentId, self.nbr, self.getHistoricalStandings(), self.finalRound)
+
+    # With a standings engine, the round's historical standings are the engine's, written behind it to the
+    # database; without one, the database takes them from its current standings
+    def getHistoricalStandings(self):
+        if self.standingsEngine is None:
+            return None
+        return self.standingsEngine.determineStandings()
+
+    # All possible match combinations, even with round's bye player (if there are an odd number of players).
+    # The round only reads the tournament's combinations; the combinations still possible in the round are
+    # tracked as an array of indices into them.
     def setInitialRoundPossiblePlayerMatchCombinations(self, tournamentPossiblePlayerMatchCombinations):
-        self.roundPossiblePlayerMatchCombinations = copy.deepcopy(tournamentPossiblePlayerMatchCombinations)
+        self.roundPossiblePlayerMatchCombinations = tournamentPossiblePlayerMatchCombinations
+        self.roundPossiblePlayerMatchCombinationIndices = array.array('l', xrange(len(tournamentPossiblePlayerMatchCombinations)))
+
+    # Encoded tournament possible match combinations (see encodePlayerMatchCombinations), in the same order
+    def setInitialRoundPossiblePlayerMatchCombinationArray(self, tournamentPossiblePlayerMatchCombinationArray):
+        self.roundPossiblePlayerMatchCombinationArray = tournamentPossiblePlayerMatchCombinationArray
 
     def filterOutRoundPossiblePlayerMatchCombinationsWithRoundByePlayer(self):
-        self.roundPossiblePlayerMatchCombinations = [roundPossiblePlayerMatchCombination for roundPossiblePlayerMatchCombination in self.roundPossiblePlayerMatchCombinations if not any(matchPlayer == self.roundByePlayerId for match in roundPossiblePlayerMatchCombination for matchPlayer in match)]
+        roundPossiblePlayerMatchCombinationCount = len(self.roundPossiblePlayerMatchCombinationIndices)
+        self.roundPossiblePlayerMatchCombinationIndices = array.array('l', (roundPossiblePlayerMatchCombinationIndex for roundPossiblePlayerMatchCombinationIndex in self.roundPossiblePlayerMatchCombinationIndices if not any(matchPlayer == self.roundByePlayerId for match in self.roundPossiblePlayerMatchCombinations[roundPossiblePlayerMatchCombinationIndex] for matchPlayer in match)))
+        instrumentation.incrementCounter("pairing.exhaustive.combinationsPruned", roundPossiblePlayerMatchCombinationCount - len(self.roundPossiblePlayerMatchCombinationIndices))
 
     # Used in first round. Match combination is a simple, random choice.
     def chooseRandomRoundPossiblePlayerMatchCombination(self):
-        return random.choice(self.roundPossiblePlayerMatchCombinations)
+        return self.roundPossiblePlayerMatchCombinations[self.outcomeGenerator.choice(self.roundPossiblePlayerMatchCombinationIndices)]
+
+    # Used in first round when possible match combinations are not enumerated. Pairs the players, excluding
+    # the round's bye player, in a random order.
+    def chooseRandomRoundPlayerMatchCombination(self, playerIds):
+        playerIds = [playerId for playerId in playerIds if playerId != self.roundByePlayerId]
+        self.outcomeGenerator.shuffle(playerIds)
+        return [(playerIds[i], playerIds[i + 1]) for i in range(0, len(playerIds) - 1, 2)]
 
     def setTournamentPreviousRoundsPlayedMatches(self, tournamentPreviousRoundsPlayedMatches):
-        self.tournamentPreviousRoundsPlayedMatches = copy.deepcopy(tournamentPreviousRoundsPlayedMatches)
+        self.tournamentPreviousRoundsPlayedMatches = tournamentPreviousRoundsPlayedMatches
 
     def setTournamentPreviousRoundStandings(self, tournamentPreviousRoundStandings):
         self.tournamentPreviousRoundStandings = tournamentPreviousRoundStandings
 
+    # The tournament's player registry, with ranks refreshed from the tournament's previous round standings
+    def setPlayerRegistry(self, playerRegistry):
+        self.playerRegistry = playerRegistry
+
+    # Whether the round is its tournament's final round, whose historical standings are always stored
+    def setFinalRound(self, finalRound):
+        self.finalRound = finalRound
+
+    # The tournament's standings engine (see standings.py), which the round's results are applied to
+    def setStandingsEngine(self, standingsEngine):
+        self.standingsEngine = standingsEngine
+
     # Quality of a match combination is the sum of the difference in rankings of each match squared. The lower
-    # the total, the higher the quality.
+    # the total, the higher the quality. Qualities are kept in an array alongside the combination indices.
     def determineRoundPossiblePlayerMatchCombinationQuality(self):
-        for roundPossiblePlayerMatchCombination in self.roundPossiblePlayerMatchCombinations:
+        playerIndices = self.playerRegistry.playerIndices
+        playerRanks = self.playerRegistry.ranks
+        self.roundPossiblePlayerMatchCombinationQualities = array.array('d')
+        for roundPossiblePlayerMatchCombinationIndex in self.roundPossiblePlayerMatchCombinationIndices:
+            roundPossiblePlayerMatchCombination = self.roundPossiblePlayerMatchCombinations[roundPossiblePlayerMatchCombinationIndex]
             roundPossiblePlayerMatchCombinationQuality = 0
             for match in roundPossiblePlayerMatchCombination:
-                matchPlayer1Rank = 0
-                matchPlayer2Rank = 0
-                for tournamentPreviousRoundStanding in self.tournamentPreviousRoundStandings:
-                    if tournamentPreviousRoundStanding[2] == match[0]:
-                        matchPlayer1Rank = tournamentPreviousRoundStanding[0]
-                    elif tournamentPreviousRoundStanding[2] == match[1]:
-                        matchPlayer2Rank = tournamentPreviousRoundStanding[0]
-
-                    if matchPlayer1Rank != 0 and matchPlayer2Rank != 0:
-                        break
-                roundPossiblePlayerMatchCombinationQuality += math.pow(matchPlayer1Rank - matchPlayer2Rank, 2)
-
-            roundPossiblePlayerMatchCombination.append(roundPossiblePlayerMatchCombinationQuality)
+                roundPossiblePlayerMatchCombinationQuality += (playerRanks[playerIndices[match[0]]] - playerRanks[playerIndices[match[1]]]) ** 2
+
+            self.roundPossiblePlayerMatchCombinationQualities.append(roundPossiblePlayerMatchCombinationQuality)
+
+    # NumPy counterpart of determineRoundPossiblePlayerMatchCombinationQuality and
+    # determineBestRoundPossiblePlayerMatchCombination. Scores every encoded combination with one gather and
+    # reduce, masks out combinations with previously played matches or the round's bye player, and returns
+    # the first best combination, which is the same one the pure Python path chooses.
+    def determineBestRoundPossiblePlayerMatchCombinationVectorized(self):
+        player1Indices = self.roundPossiblePlayerMatchCombinationArray[:, :, 0]
+        player2Indices = self.roundPossiblePlayerMatchCombinationArray[:, :, 1]
+        playerRanks = numpy.array(self.playerRegistry.ranks, dtype=numpy.int64)
+
+        qualities = ((playerRanks[player1Indices] - playerRanks[player2Indices]) ** 2).sum(axis=1)
+
+        playedMatches = numpy.zeros((len(self.playerRegistry), len(self.playerRegistry)), dtype=bool)
+        for playedMatch in self.tournamentPreviousRoundsPlayedMatches:
+            player1Index = self.playerRegistry.playerIndex(playedMatch[0])
+            player2Index = self.playerRegistry.playerIndex(playedMatch[1])
+            playedMatches[player1Index, player2Index] = playedMatches[player2Index, player1Index] = True
+        possible = ~playedMatches[player1Indices, player2Indices].any(axis=1)
+        if self.roundByePlayerId is not None:
+            roundByePlayerIndex = self.playerRegistry.playerIndex(self.roundByePlayerId)
+            possible &= ~((player1Indices == roundByePlayerIndex) | (player2Indices == roundByePlayerIndex)).any(axis=1)
+
+        instrumentation.incrementCounter("pairing.exhaustive.combinationsPruned", len(possible) - int(possible.sum()))
+        if not possible.any():
+            raise pairing.NoPairingError("No player match combination without previously played matches exists")
+
+        bestIndex = int(numpy.argmin(numpy.where(possible, qualities, numpy.iinfo(numpy.int64).max)))
+        self.bestRoundPossiblePlayerMatchCombinationQuality = float(qualities[bestIndex])
+        return self.roundPossiblePlayerMatchCombinations[bestIndex]
+
+    # Pairs the round with a pairer (see pairing.py) instead of scoring every possible match combination
+    def determineBestRoundPlayerMatchCombination(self, pairer):
+        return pairer.pairRound(self.tournamentPreviousRoundStandings, self.tournamentPreviousRoundsPlayedMatches, self.roundByePlayerId)
 
     def determineBestRoundPossiblePlayerMatchCombination(self):
-        bestRoundPossiblePlayerMatchCombination = min(self.roundPossiblePlayerMatchCombinations, key=lambda roundPossiblePlayerMatchCombination: roundPossiblePlayerMatchCombination[-1])
-        return bestRoundPossiblePlayerMatchCombination
+        if not self.roundPossiblePlayerMatchCombinationQualities:
+            raise pairing.NoPairingError("No player match combination without previously played matches exists")
+        bestQualityIndex = min(xrange(len(self.roundPossiblePlayerMatchCombinationQualities)), key=self.roundPossiblePlayerMatchCombinationQualities.__getitem__)
+        self.bestRoundPossiblePlayerMatchCombinationQuality = self.roundPossiblePlayerMatchCombinationQualities[bestQualityIndex]
+        return self.roundPossiblePlayerMatchCombinations[self.roundPossiblePlayerMatchCombinationIndices[bestQualityIndex]]
 
     # Want to output the matches in rank order. The match with the top ranked player should output first, and
-    # so on.
+    # so on. Player ranks are unique, so each match is placed directly at its top ranked player's rank. The best
+    # combination is shared with the tournament, so a new sorted combination is built and the best
+    # combination's quality is appended to it.
     def sortBestRoundPlayerMatchCombinationByTournamentCurrentPlayerRanks(self, bestRoundPossiblePlayerMatchCombination):
-        bestRoundPossiblePlayerMatchCombination = copy.deepcopy(bestRoundPossiblePlayerMatchCombination)
-        bestRoundPossiblePlayerMatchCombinationSorted = []
-        for tournamentPreviousRoundStanding in self.tournamentPreviousRoundStandings:
-            matchIndex = 0
-            while bestRoundPossiblePlayerMatchCombination and matchIndex < len(bestRoundPossiblePlayerMatchCombination) - 1:
-                match = bestRoundPossiblePlayerMatchCombination[matchIndex]
-                if match[0] == tournamentPreviousRoundStanding[2] or match[1] == tournamentPreviousRoundStanding[2]:
-                    if match[0] == tournamentPreviousRoundStanding[2]:
-                        bestRoundPossiblePlayerMatchCombinationSorted.append(match)
-                    elif match[1] == tournamentPreviousRoundStanding[2]:
-                        bestRoundPossiblePlayerMatchCombinationSorted.append((match[1], match[0]))
-
-                    bestRoundPossiblePlayerMatchCombination.remove(match)
-                    break
-
-                matchIndex += 1
-
-        bestRoundPossiblePlayerMatchCombinationSorted.append(bestRoundPossiblePlayerMatchCombination[-1])
+        matchesByRank = [None] * (len(self.playerRegistry) + 1)
+        for match in bestRoundPossiblePlayerMatchCombination:
+            matchPlayer1Rank = self.playerRegistry.playerRank(match[0])
+            matchPlayer2Rank = self.playerRegistry.playerRank(match[1])
+            if matchPlayer1Rank <= matchPlayer2Rank:
+                matchesByRank[matchPlayer1Rank] = match
+            else:
+                matchesByRank[matchPlayer2Rank] = (match[1], match[0])
+
+        bestRoundPossiblePlayerMatchCombinationSorted = [match for match in matchesByRank if match is not None]
+        bestRoundPossiblePlayerMatchCombinationSorted.append(self.bestRoundPossiblePlayerMatchCombinationQuality)
 
         return bestRoundPossiblePlayerMatchCombinationSorted
 
     def setPlayerMatchCombination(self, roundPossiblePlayerMatchCombination):
         self.playerMatchCombination = roundPossiblePlayerMatchCombination
 
-    def simulateMatches(self, players, tournamentPreviousRoundsPlayedMatches):
-        self.createMatches(players)
-        self.playMatches()
-        self.registerMatchesResults()
-        self.registerPlayedMatches(tournamentPreviousRoundsPlayedMatches)
-        self.registerMatchesResultsInDb()
-
+    # The round's match results, bye player and historical standings are registered in the database in one
+    # transaction. By default the match results are sent in one batch; batchResults=False sends them one
+    # statement at a time. Each phase is timed (see instrumentation.py).
+    def simulateMatches(self, players, tournamentPreviousRoundsPlayedMatches, batchResults=True):
+        self.playRound(players, tournamentPreviousRoundsPlayedMatches)
+        with instrumentation.timer("round.registerResultsInDb"):
+            if batchResults:
+                self.registerRoundResultsInDb()
+            else:
+                with self.dbo.transaction():
+                    if self.roundByePlayerId is not None:
+                        self.registerRoundByePlayerInDb()
+                    self.registerMatchesResultsInDb()
+                    self.registerHistoricalStandingsInDb()
+
+    # Creates and plays the round's matches, and registers their results everywhere but in the database
+    def playRound(self, players, tournamentPreviousRoundsPlayedMatches):
+        with instrumentation.timer("round.createMatches"):
+            self.createMatches(players)
+        with instrumentation.timer("round.playMatches"):
+            self.playMatches()
+            self.registerMatchesResults()
+        with instrumentation.timer("round.registerResultsInStandings"):
+            self.registerPlayedMatches(tournamentPreviousRoundsPlayedMatches)
+            if self.standingsEngine is not None:
+                self.registerResultsInStandings()
+
+    # Rebuilds a round played before its tournament was resumed from its match results (match_nbr,
+    # winner_player_id, loser_player_id, tie_flag), and registers them in the standings. The round's player
+    # registry, standings engine and bye player must already be set. The tournament's previously played
+    # matches are rebuilt from the database on their own (see playedpairs.PlayedPairs.fromDb).
+    def restoreRound(self, matchResults):
+        for matchNbr, winnerPlayerId, loserPlayerId, tieFlag in matchResults:
+            winnerPlayerName, loserPlayerName = self.getMatchPlayerNames((winnerPlayerId, loserPlayerId))
+            match = self.createMatch((matchNbr, winnerPlayerId, winnerPlayerName, loserPlayerId, loserPlayerName))
+            match.registerMatchResult(outcomes.TIE if tieFlag else outcomes.PLAYER1_WIN)
+            self.addMatchToRound(match)
+        if self.standingsEngine is not None:
+            self.registerResultsInStandings()
+
+    # Rounds simulated outside of a tournament build their own player registry from the players
     def createMatches(self, players):
+        if self.playerRegistry is None:
+            self.setPlayerRegistry(playerregistry.PlayerRegistry(players))
         matchNbr = 1
-        extendedPlayerMatchCombination = []
         for match in self.playerMatchCombination:
             if isinstance(match, (list, tuple)):
-                player1Name, player2Name = self.getMatchPlayerNames(match, players)
+                player1Name, player2Name = self.getMatchPlayerNames(match)
                 matchDetail = (matchNbr, match[0], player1Name, match[1], player2Name)
                 match = self.createMatch(matchDetail)
                 self.addMatchToRound(match)
@@ -128,63 +255,59 @@ class Round:
         player2Name = mtch[4]
         return match.Match(self.dbo, self.tournamentId, self.nbr, matchNbr, player1Id, player1Name, player2Id, player2Name)
 
-    def getMatchPlayerNames(self, match, players):
-        player1Name = None
-        player2Name = None
-        for player in players:
-            if player[0] == match[0]:
-                player1Name = player[1]
-            elif player[0] == match[1]:
-                player2Name = player[1]
-
-            if player1Name is not None and player2Name is not None:
-                break
-
-        return player1Name, player2Name
+    def getMatchPlayerNames(self, match):
+        return self.playerRegistry.playerName(match[0]), self.playerRegistry.playerName(match[1])
 
     def addMatchToRound(self, match):
         self.matches.append(match)
 
+    # The round's match outcomes are drawn in one batch
     def playMatches(self):
-        for match in self.matches:
-            match.playMatch()
+        matchOutcomes = self.outcomeGenerator.drawMatchOutcomes(len(self.matches))
+        for match, matchOutcome in zip(self.matches, matchOutcomes):
+            match.playMatch(float(matchOutcome))
 
     def registerPlayedMatches(self, tournamentPreviousRoundsPlayedMatches):
         for match in self.matches:
             match.registerMatchAsPlayed(tournamentPreviousRoundsPlayedMatches)
 
     def registerMatchesResults(self):
-        for match in self.matches:
-            match.registerMatchResult()
+        matchResults = outcomes.determineMatchResults([match.matchOutcome for match in self.matches])
+        for match, matchResult in zip(self.matches, matchResults):
+            match.registerMatchResult(matchResult)
 
     def registerMatchesResultsInDb(self):
         for match in self.matches:
             match.registerMatchResultInDb()
 
-    def outputRound(self, tournamentTotalRoundCount, tournamentTotalPlayerCountOdd):
-        print
-        self.outputRoundHeader(tournamentTotalRoundCount)
-        print
-        if tournamentTotalPlayerCountOdd:
-            self.outputRoundByePlayer()
-            print
-        self.outputRoundMatches()
-        print
-        self.outputRoundMatchResults()
-
-    def outputRoundHeader(self, tournamentTotalRoundCount):
-        print "Round {0} of {1}:".format(self.nbr, tournamentTotalRoundCount)
-
-    def outputRoundByePlayer(self):
-        print "Bye Player: {0}".format(self.roundByePlayerName)
-
-    def outputRoundMatches(self):
-        for match in self.matches:
-            match.outputMatch()
-
-    def outputRoundMatchResults(self):
+    def registerResultsInStandings(self):
         for match in self.matches:
-            match.outputMatchResult()
+            match.registerMatchResultInStandings(self.standingsEngine)
+        if self.roundByePlayerId is not None:
+            self.standingsEngine.registerByePlayer(self.roundByePlayerId)
+
+    def registerRoundResultsInDb(self):
+        self.dbo.registerTournamentRoundResults(self.tournamentId, self.nbr, self.getMatchResults(), self.getRoundByePlayerResult(), self.getHistoricalStandings(), self.finalRound)
+
+    def getMatchResults(self):
+        return [match.getMatchResult() for match in self.matches]
+
+    # (playerRank, playerId) of the round's bye player, or None
+    def getRoundByePlayerResult(self):
+        if self.roundByePlayerId is None:
+            return None
+        return (self.roundByePlayerRank, self.roundByePlayerId)
+
+    # Like simulateMatches, but the round's results are registered asynchronously (see asyncoperations.py):
+    # returns the registration's StorageFuture without waiting for it. The round's standings must be kept by
+    # a standings engine, since they are not read back from the database.
+    def simulateMatchesAsync(self, players, tournamentPreviousRoundsPlayedMatches, asyncOperations):
+        self.playRound(players, tournamentPreviousRoundsPlayedMatches)
+        return asyncOperations.registerTournamentRoundResults(self.tournamentId, self.nbr, self.getMatchResults(), self.getRoundByePlayerResult(), self.getHistoricalStandings(), self.finalRound)
+
+    # Writes the round's bye player, matches and match results to the output sink (see outputsinks.py)
+    def outputRound(self, outputSink, tournamentTotalRoundCount, tournamentTotalPlayerCountOdd):
+        outputSink.writeRound(self, tournamentTotalRoundCount, tournamentTotalPlayerCountOdd)
 
     def deleteMatches(self, matchNbrs=None):
         for match in self.matches:
@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+
+import contextlib
+import os
+import sqlite3
+import threading
+
+import storage
+
+
+DEFAULT_DATABASE = ":memory:"
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tournament_sqlite.sql")
+
+
+# The database file given, else the TOURNAMENT_SQLITE_DATABASE environment variable, else a private in-memory
+# database
+def determineDatabase(database=None):
+    if database is not None:
+        return database
+    return os.environ.get("TOURNAMENT_SQLITE_DATABASE", DEFAULT_DATABASE)
+
+
+# "?, ?, ..." for each of the values of an IN list
+def determinePlaceholders(values):
+    return ", ".join("?" for value in values)
+
+
+class SqliteOperations(storage.StorageOperations):
+    ''' Includes tournament related SQLite database operations (the SQLite storage backend, see storage.py).
+        The schema (tournament_sqlite.sql) is created when the database is connected to, if it does not exist
+        yet. One connection is shared, serialized by a lock which a transaction holds until it ends. '''
+
+    def __init__(self, database=None):
+        self.database = determineDatabase(database)
+        self.lock = threading.RLock()
+        self.transactionDepth = 0
+        self.connection = None
+        self.connectToDb()
+
+    # The connection is in autocommit mode; transactions are savepoints (see transaction)
+    def connectToDb(self):
+        self.connection = sqlite3.connect(self.database, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        with open(SCHEMA_PATH) as schemaFile:
+            self.connection.executescript(schemaFile.read())
+
+    @contextlib.contextmanager
+    def cursor(self):
+        with self.lock:
+            cursor = self.connection.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    # Every transaction is a savepoint: the outermost one begins and, once released, commits the database
+    # transaction, and nested ones roll back only their own operations
+    @contextlib.contextmanager
+    def transaction(self, rollback=False):
+        with self.lock:
+            savepoint = "tournament_savepoint_{0}".format(self.transactionDepth)
+            self.connection.execute("SAVEPOINT " + savepoint)
+            self.transactionDepth += 1
+            try:
+                yield self
+            except:
+                self.transactionDepth -= 1
+                self.rollbackTransaction(savepoint)
+                raise
+            self.transactionDepth -= 1
+            if rollback:
+                self.rollbackTransaction(savepoint)
+            else:
+                self.connection.execute("RELEASE SAVEPOINT " + savepoint)
+
+    def rollbackTransaction(self, savepoint):
+        self.connection.execute("ROLLBACK TO SAVEPOINT " + savepoint)
+        self.connection.execute("RELEASE SAVEPOINT " + savepoint)
+
+    def deletePlayers(self):
+        query = "DELETE FROM player"
+        with self.cursor() as cursor:
+            cursor.execute(query)
+
+    def deleteSpecificPlayers(self, playerIds):
+        query = "DELETE FROM player WHERE id IN ({0})".format(determinePlaceholders(playerIds))
+        parameters = tuple(playerIds)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    def deleteTournament(self, tournamentId):
+        query = "DELETE FROM tournament WHERE id = ?"
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+
+    def deleteAllTournamentMatches(self, tournamentId):
+        query = "DELETE FROM match WHERE tournament_id = ?"
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+
+    def deleteSpecificTournamentRoundsMatches(self, tournamentId, roundNbrs):
+        query = "DELETE FROM match WHERE tournament_id = ? AND round_nbr IN ({0})".format(determinePlaceholders(roundNbrs))
+        parameters = (tournamentId,) + tuple(roundNbrs)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    def deleteTournamentSpecificRoundMatches(self, tournamentId, roundNbr, matchNbrs):
+        query = "DELETE FROM match WHERE tournament_id = ? AND round_nbr = ? AND match_nbr IN ({0})".format(determinePlaceholders(matchNbrs))
+        parameters = (tournamentId, roundNbr) + tuple(matchNbrs)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    def deleteAllTournamentRoundsByePlayers(self, tournamentId):
+        query = "DELETE FROM tournament_round_bye_player WHERE tournament_id = ?"
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+
+    def deleteSpecificTournamentRoundsByePlayers(self, tournamentId, roundNbrs):
+        query = "DELETE FROM tournament_round_bye_player WHERE tournament_id = ? AND round_nbr IN ({0})".format(determinePlaceholders(roundNbrs))
+        parameters = (tournamentId,) + tuple(roundNbrs)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    def deleteAllTournamentRoundsHistoricalStandings(self, tournamentId):
+        query = "DELETE FROM historical_standing WHERE tournament_id = ?"
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+
+    def deleteSpecificTournamentRoundsHistoricalStandings(self, tournamentId, roundNbrs):
+        query = "DELETE FROM historical_standing WHERE tournament_id = ? AND round_nbr IN ({0})".format(determinePlaceholders(roundNbrs))
+        parameters = (tournamentId,) + tuple(roundNbrs)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    def deleteFullTournamentRegister(self, tournamentId):
+        query = "DELETE FROM tournament_register WHERE tournament_id = ?"
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+
+    def deleteSpecificTournamentRegisteredPlayers(self, tournamentId, playerIds):
+        query = "DELETE FROM tournament_register WHERE tournament_id = ? AND player_id IN ({0})".format(determinePlaceholders(playerIds))
+        parameters = (tournamentId,) + tuple(playerIds)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    def registerTournament(self, tournamentName):
+        query = "INSERT INTO tournament (name) VALUES (?)"
+        parameter = (tournamentName,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.lastrowid
+
+    def registerPlayer(self, playerName):
+        query = "INSERT INTO player (name) VALUES (?)"
+        parameter = (playerName,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.lastrowid
+
+    def registerTournamentPlayer(self, tournamentId, playerId):
+        query = "INSERT INTO tournament_register (tournament_id, player_id) VALUES (?, ?)"
+        parameters = (tournamentId, playerId)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    # Registers the players with one executemany. The shared connection is locked for the transaction, so the
+    # players' ids follow on from player's last id, in the order of their names.
+    def registerPlayers(self, playerNames):
+        rows = [(playerName,) for playerName in playerNames]
+        with self.transaction():
+            with self.cursor() as cursor:
+                cursor.execute("SELECT coalesce(max(seq), 0) FROM sqlite_sequence WHERE name = 'player'")
+                lastPlayerId = cursor.fetchone()[0]
+                cursor.executemany("INSERT INTO player (name) VALUES (?)", rows)
+        return range(lastPlayerId + 1, lastPlayerId + len(rows) + 1)
+
+    def registerTournamentPlayers(self, tournamentId, playerIds):
+        query = "INSERT INTO tournament_register (tournament_id, player_id) VALUES (?, ?)"
+        rows = [(tournamentId, playerId) for playerId in playerIds]
+        with self.cursor() as cursor:
+            cursor.executemany(query, rows)
+
+    def registerTournamentHistoricalStandings(self, tournamentId, roundNbr, historicalStandings=None, finalRound=False):
+        if not self.determineKeyframeRound(roundNbr, finalRound):
+            return
+        if historicalStandings is not None:
+            self.registerTournamentCalculatedHistoricalStandings(tournamentId, roundNbr, historicalStandings)
+            return
+
+        query = '''
+            INSERT INTO historical_standing(tournament_id, round_nbr, player_rank, actual_player_rank, player_id,
+                wins, losses, ties, points, opponent_points)
+            SELECT
+                tournament_id,
+                ? as round_nbr,
+                player_rank,
+                actual_player_rank,
+                player_id,
+                wins,
+                losses,
+                ties,
+                points,
+                opponent_points
+            FROM
+                current_standings
+            WHERE
+                tournament_id = ?
+            '''
+        parameters = (roundNbr, tournamentId)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    def registerTournamentCalculatedHistoricalStandings(self, tournamentId, roundNbr, historicalStandings):
+        query = '''
+            INSERT INTO historical_standing(tournament_id, round_nbr, player_rank, actual_player_rank, player_id,
+                wins, losses, ties, points, opponent_points)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            '''
+        rows = [(tournamentId,) + historicalStanding for historicalStanding in storage.determineHistoricalStandings(roundNbr, historicalStandings)]
+        with self.cursor() as cursor:
+            cursor.executemany(query, rows)
+
+    def tournamentInfo(self, tournamentId):
+        query = '''
+            SELECT
+                id,
+                name
+            FROM
+                tournament
+            WHERE
+                id = ?
+            '''
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchone()
+
+    def tournamentPlayerInfo(self, tournamentId):
+        query = '''
+            SELECT
+                player_id,
+                player_name
+            FROM
+                tournament_player_info
+            WHERE
+                tournament_id = ?
+            '''
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchall()
+
+    def tournamentPreviousRoundPlayerMatches(self, tournamentId):
+        query = '''
+            SELECT
+                winner_player_id,
+                loser_player_id
+            FROM
+                match
+            WHERE
+                tournament_id = ?
+            '''
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchall()
+
+    # The keyframe round is found with the historical_standing_round_idx index
+    def tournamentHistoricalStandingsKeyframe(self, tournamentId, roundNbr):
+        query = '''
+            SELECT
+                round_nbr,
+                player_rank,
+                actual_player_rank,
+                player_id,
+                wins,
+                losses,
+                ties,
+                points,
+                opponent_points
+            FROM
+                historical_standing
+            WHERE
+                tournament_id = ? AND
+                round_nbr = (SELECT max(round_nbr) FROM historical_standing WHERE tournament_id = ? AND round_nbr <= ?)
+            ORDER BY
+                player_rank
+            '''
+        parameters = (tournamentId, tournamentId, roundNbr)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+            return cursor.fetchall()
+
+    # SQLite stores booleans as integers, so tie_flag is converted back
+    def tournamentMatchResultsThroughRound(self, tournamentId, roundNbr=None):
+        query = '''
+            SELECT
+                round_nbr,
+                match_nbr,
+                winner_player_id,
+                loser_player_id,
+                tie_flag
+            FROM
+                match
+            WHERE
+                tournament_id = ? AND
+                (? IS NULL OR round_nbr <= ?)
+            ORDER BY
+                round_nbr,
+                match_nbr
+            '''
+        parameters = (tournamentId, roundNbr, roundNbr)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+            return [matchResult[:4] + (bool(matchResult[4]),) for matchResult in cursor.fetchall()]
+
+    def tournamentRoundByePlayersThroughRound(self, tournamentId, roundNbr=None):
+        query = '''
+            SELECT
+                round_nbr,
+                player_id
+            FROM
+                tournament_round_bye_player
+            WHERE
+                tournament_id = ? AND
+                (? IS NULL OR round_nbr <= ?)
+            ORDER BY
+                round_nbr
+            '''
+        parameters = (tournamentId, roundNbr, roundNbr)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+            return cursor.fetchall()
+
+    def tournamentTotalPlayerCount(self, tournamentId):
+        query = '''
+            SELECT
+                count(*)
+            FROM
+                tournament_register
+            WHERE
+                tournament_id = ?
+            '''
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchone()[0]
+
+    # SQLite has no ceil function (before 3.35), so half the player count is rounded up with integer division
+    def tournamentTotalRoundCount(self, tournamentId):
+        query = '''
+            SELECT
+                (count(*) + 1) / 2
+            FROM
+                tournament_register
+            WHERE
+                tournament_id = ?
+            '''
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchone()[0]
+
+    def tournamentCurrentStandings(self, tournamentId):
+        query = '''
+            SELECT
+                player_rank,
+                actual_player_rank,
+                player_id,
+                player_name,
+                wins,
+                losses,
+                ties,
+                points,
+                opponent_points
+            FROM
+                current_standings
+            WHERE
+                tournament_id = ?
+            ORDER BY
+                player_rank
+            '''
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchall()
+
+    def registerTournamentMatchResult(self, tournamentId, roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag=False):
+        query = "INSERT INTO match (tournament_id, round_nbr, match_nbr, winner_player_id, loser_player_id, tie_flag) VALUES (?, ?, ?, ?, ?, ?)"
+        parameters = (tournamentId, roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    def registerTournamentMatchResults(self, tournamentId, matchResults):
+        query = "INSERT INTO match (tournament_id, round_nbr, match_nbr, winner_player_id, loser_player_id, tie_flag) VALUES (?, ?, ?, ?, ?, ?)"
+        with self.transaction():
+            with self.cursor() as cursor:
+                cursor.executemany(query, ((tournamentId,) + tuple(matchResult) for matchResult in matchResults))
+
+    # SQLite stores booleans as integers, so tie_flag is converted back
+    def tournamentRoundMatchResults(self, tournamentId, roundNbr):
+        query = '''
+            SELECT
+                match_nbr,
+                winner_player_id,
+                winner_player_name,
+                loser_player_id,
+                loser_player_name,
+                tie_flag
+            FROM
+                match_results
+            WHERE
+                tournament_id = ?
+                AND round_nbr = ?
+            '''
+        parameters = (tournamentId, roundNbr)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+            return [matchResult[:5] + (bool(matchResult[5]),) for matchResult in cursor.fetchall()]
+
+    # Registers the round's match results with one executemany
+    def registerTournamentRoundResults(self, tournamentId, roundNbr, matchResults, roundByePlayer=None, historicalStandings=None, finalRound=False):
+        query = "INSERT INTO match (tournament_id, round_nbr, match_nbr, winner_player_id, loser_player_id, tie_flag) VALUES (?, ?, ?, ?, ?, ?)"
+        rows = [(tournamentId, roundNbr) + tuple(matchResult) for matchResult in matchResults]
+        with self.transaction():
+            with self.cursor() as cursor:
+                cursor.executemany(query, rows)
+            if roundByePlayer is not None:
+                self.registerTournamentRoundByePlayer(tournamentId, roundNbr, roundByePlayer[0], roundByePlayer[1])
+            self.registerTournamentHistoricalStandings(tournamentId, roundNbr, historicalStandings, finalRound)
+
+    def registerTournamentRoundByePlayer(self, tournamentId, roundNbr, playerRank, playerId):
+        query = "INSERT INTO tournament_round_bye_player (tournament_id, round_nbr, player_rank, player_id) VALUES (?, ?, ?, ?)"
+        parameters = (tournamentId, roundNbr, playerRank, playerId)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameters)
+
+    def tournamentTopPlayerWithNoByeRound(self, tournamentId):
+        query = '''
+            SELECT
+                player_rank,
+                player_id,
+                player_name
+            FROM
+                tournament_top_player_with_no_bye_round
+            WHERE
+                tournament_id = ?
+            '''
+        parameter = (tournamentId,)
+        with self.cursor() as cursor:
+            cursor.execute(query, parameter)
+            return cursor.fetchone()
+
+    def closeDbConnection(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+import tiebreaks
+
+
+# Names of the standing fields compared by StandingsEngine.determineStandingsDifferences, by standing index
+STANDING_FIELDS = ((0, "player_rank"), (1, "actual_player_rank"), (3, "player_name"), (4, "wins"), (5, "losses"), (6, "ties"), (7, "points"), (8, "opponent_points"))
+
+
+class StandingsEngine:
+    ''' Keeps a tournament's standings in memory, updating players' records, points and opponent match points
+        (OMP) as match results and bye rounds are applied, instead of recalculating them in the database.
+        Standings are rows in the same form as the current_standings view's, (player_rank,
+        actual_player_rank, player_id, player_name, wins, losses, ties, points, opponent_points). Players
+        with the same points are ranked by the tie-breaks of tiebreakOrder (see tiebreaks.py), opponent points
+        only by default, as in the view. Tie-breaks other than opponent points are calculated from the
+        players' results, which are then kept for every match and bye round applied. '''
+
+    def __init__(self, players, tiebreakOrder=tiebreaks.DEFAULT_TIEBREAK_ORDER):
+        self.tiebreakOrder = tiebreaks.validateTiebreakOrder(tiebreakOrder)
+        self.results = None
+        if tiebreaks.determineResultsRequired(self.tiebreakOrder):
+            self.results = {}
+        self.playerIds = []
+        self.playerNames = {}
+        self.wins = {}
+        self.losses = {}
+        self.ties = {}
+        self.points = {}
+        self.opponentPoints = {}
+        self.opponents = {}
+        self.standings = None
+        for player in players:
+            self.addPlayer(player[0], player[1])
+
+    def addPlayer(self, playerId, playerName):
+        self.playerIds.append(playerId)
+        self.playerNames[playerId] = playerName
+        self.wins[playerId] = 0
+        self.losses[playerId] = 0
+        self.ties[playerId] = 0
+        self.points[playerId] = 0.0
+        self.opponentPoints[playerId] = 0.0
+        self.opponents[playerId] = set()
+        if self.results is not None:
+            self.results[playerId] = []
+        self.standings = None
+
+    # Restores a player's record, points and OMP, e.g. from a historical standings keyframe. The player's
+    # opponents are restored separately (see registerOpponents). Restored standings have no results, so
+    # engines with other tie-breaks than opponent points replay the results instead.
+    def restoreStanding(self, playerId, wins, losses, ties, points, opponentPoints):
+        self.wins[playerId] = wins
+        self.losses[playerId] = losses
+        self.ties[playerId] = ties
+        self.points[playerId] = float(points)
+        self.opponentPoints[playerId] = float(opponentPoints)
+        self.standings = None
+
+    # Registers that the players have met, for a match whose points are already in the players' restored
+    # standings
+    def registerOpponents(self, player1Id, player2Id):
+        self.opponents[player1Id].add(player2Id)
+        self.opponents[player2Id].add(player1Id)
+
+    # Players who meet for the first time add each other's current points to their OMP. The match's points are
+    # then added to the players' points, and to the OMP of each of their distinct opponents.
+    def registerMatchResult(self, winnerPlayerId, loserPlayerId, tieFlag=False):
+        if loserPlayerId not in self.opponents[winnerPlayerId]:
+            self.opponents[winnerPlayerId].add(loserPlayerId)
+            self.opponents[loserPlayerId].add(winnerPlayerId)
+            self.opponentPoints[winnerPlayerId] += self.points[loserPlayerId]
+            self.opponentPoints[loserPlayerId] += self.points[winnerPlayerId]
+
+        if tieFlag:
+            self.ties[winnerPlayerId] += 1
+            self.ties[loserPlayerId] += 1
+            self.addPoints(winnerPlayerId, 0.5)
+            self.addPoints(loserPlayerId, 0.5)
+            self.registerResult(winnerPlayerId, loserPlayerId, 0.5)
+            self.registerResult(loserPlayerId, winnerPlayerId, 0.5)
+        else:
+            self.wins[winnerPlayerId] += 1
+            self.losses[loserPlayerId] += 1
+            self.addPoints(winnerPlayerId, 1.0)
+            self.registerResult(winnerPlayerId, loserPlayerId, 1.0)
+            self.registerResult(loserPlayerId, winnerPlayerId, 0.0)
+
+    # A bye round is an automatic win
+    def registerByePlayer(self, playerId):
+        self.wins[playerId] += 1
+        self.addPoints(playerId, 1.0)
+        self.registerResult(playerId, None, 1.0)
+
+    # The player's results are only kept if the tie-breaks need them
+    def registerResult(self, playerId, opponentPlayerId, points):
+        if self.results is not None:
+            self.results[playerId].append((opponentPlayerId, points))
+
+    def addPoints(self, playerId, points):
+        self.points[playerId] += points
+        for opponentPlayerId in self.opponents[playerId]:
+            self.opponentPoints[opponentPlayerId] += points
+        self.standings = None
+
+    # Ranks players like the current_standings view: player_rank is ROW_NUMBER() and actual_player_rank is
+    # RANK() over points DESC and the tie-breaks DESC (opponent_points DESC by default), with player_id
+    # breaking player_rank ties. Tie-breaks are calculated once for all players, and standings are cached
+    # until the next result is applied.
+    def determineStandings(self):
+        if self.standings is not None:
+            return self.standings
+
+        rankKeys = self.determineRankKeys()
+        rankedPlayerIds = sorted(self.playerIds, key=lambda playerId: (rankKeys[playerId], playerId))
+        self.standings = []
+        actualPlayerRank = None
+        previousRankKey = None
+        for playerRank, playerId in enumerate(rankedPlayerIds, 1):
+            rankKey = rankKeys[playerId]
+            if rankKey != previousRankKey:
+                actualPlayerRank = playerRank
+                previousRankKey = rankKey
+            self.standings.append((playerRank, actualPlayerRank, playerId, self.playerNames[playerId], self.wins[playerId], self.losses[playerId], self.ties[playerId], self.points[playerId], self.opponentPoints[playerId]))
+
+        return self.standings
+
+    # Players' negated points and tie-breaks, by player id, so players are ranked in ascending order of them
+    def determineRankKeys(self):
+        if self.tiebreakOrder == tiebreaks.DEFAULT_TIEBREAK_ORDER:
+            return dict((playerId, (-self.points[playerId], -self.opponentPoints[playerId])) for playerId in self.playerIds)
+        if self.results is None:
+            return dict((playerId, (-self.points[playerId],)) for playerId in self.playerIds)
+        return dict((playerId, (-self.points[playerId],) + tuple(-tiebreak for tiebreak in tiebreaks.determinePlayerTiebreaks(self.results[playerId], self.points, self.opponentPoints[playerId], self.tiebreakOrder))) for playerId in self.playerIds)
+
+    # Whether players are ranked like the database ranks them, by opponent points only
+    def determineDatabaseRanking(self):
+        return self.tiebreakOrder == tiebreaks.DEFAULT_TIEBREAK_ORDER
+
+    # Consistency check against standings read from the database (e.g. the current_standings view). Returns
+    # (playerId, fieldName, engineValue, databaseValue) for every field which differs, and for players only
+    # one of them has. Ranks are only compared if players are ranked like the database ranks them.
+    def determineStandingsDifferences(self, databaseStandings):
+        engineStandings = dict((standing[2], standing) for standing in self.determineStandings())
+        databaseStandings = dict((standing[2], standing) for standing in databaseStandings)
+
+        standingsDifferences = []
+        for playerId in sorted(set(engineStandings) | set(databaseStandings)):
+            engineStanding = engineStandings.get(playerId)
+            databaseStanding = databaseStandings.get(playerId)
+            if engineStanding is None or databaseStanding is None:
+                standingsDifferences.append((playerId, "player_id", engineStanding and playerId, databaseStanding and playerId))
+                continue
+            for fieldIndex, fieldName in STANDING_FIELDS:
+                if fieldIndex < 2 and not self.determineDatabaseRanking():
+                    continue
+                engineValue = engineStanding[fieldIndex]
+                databaseValue = databaseStanding[fieldIndex]
+                if fieldIndex >= 7:
+                    databaseValue = float(databaseValue)
+                if engineValue != databaseValue:
+                    standingsDifferences.append((playerId, fieldName, engineValue, databaseValue))
+
+        return standingsDifferences
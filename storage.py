@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+
+import itertools
+import os
+
+import standings
+import tiebreaks
+
+# Tournament storage backends
+POSTGRES = "postgres"
+MEMORY = "memory"
+SQLITE = "sqlite"
+
+DEFAULT_BACKEND = POSTGRES
+
+# Historical standings are only stored in full (as keyframes) for every HISTORICAL_STANDINGS_KEYFRAME_INTERVAL-th
+# round, and for each tournament's final round, so its final standings are always stored. The other rounds' are rebuilt from the latest keyframe before them and the match results and bye
+# players of the rounds since, which are the rounds' changes to the standings.
+HISTORICAL_STANDINGS_KEYFRAME_INTERVAL = 10
+
+
+# The backend given, else the TOURNAMENT_DB_BACKEND environment variable, else PostgreSQL
+def determineBackend(backend=None):
+    if backend is not None:
+        return backend
+    return os.environ.get("TOURNAMENT_DB_BACKEND", DEFAULT_BACKEND)
+
+
+# Creates the storage operations of the backend (see determineBackend). Keyword arguments are passed to the
+# backend's constructor, e.g. dsn for PostgreSQL or database for SQLite. Backends are imported only when they
+# are chosen, so psycopg2 is needed for the PostgreSQL backend only.
+def createStorageOperations(backend=None, **kwargs):
+    backend = determineBackend(backend)
+    if backend == POSTGRES:
+        import databaseoperations
+        return databaseoperations.DatabaseOperations(**kwargs)
+    elif backend == MEMORY:
+        import memoryoperations
+        return memoryoperations.MemoryOperations(**kwargs)
+    elif backend == SQLITE:
+        import sqliteoperations
+        return sqliteoperations.SqliteOperations(**kwargs)
+    else:
+        raise ValueError("Unknown storage backend: {0}".format(backend))
+
+
+class StorageOperations:
+    ''' Tournament storage interface, implemented by the PostgreSQL (DatabaseOperations), in-memory
+        (MemoryOperations) and SQLite (SqliteOperations) backends. Rows are returned as tuples in the form of
+        the PostgreSQL views' rows, e.g. current_standings rows for tournamentCurrentStandings. Historical
+        standings are stored as keyframes every historicalStandingsKeyframeInterval rounds; set it to 1 to
+        store every round's. '''
+
+    historicalStandingsKeyframeInterval = HISTORICAL_STANDINGS_KEYFRAME_INTERVAL
+
+    # Unit of work: operations inside the with block are committed together when it ends, or rolled back
+    # together if it raises. Nested transactions roll back only their own operations. With rollback=True the
+    # transaction is always rolled back.
+    def transaction(self, rollback=False):
+        raise NotImplementedError
+
+    def deletePlayers(self):
+        raise NotImplementedError
+
+    def deleteSpecificPlayers(self, playerIds):
+        raise NotImplementedError
+
+    def deleteTournament(self, tournamentId):
+        raise NotImplementedError
+
+    def deleteAllTournamentMatches(self, tournamentId):
+        raise NotImplementedError
+
+    def deleteSpecificTournamentRoundsMatches(self, tournamentId, roundNbrs):
+        raise NotImplementedError
+
+    def deleteTournamentSpecificRoundMatches(self, tournamentId, roundNbr, matchNbrs):
+        raise NotImplementedError
+
+    def deleteAllTournamentRoundsByePlayers(self, tournamentId):
+        raise NotImplementedError
+
+    def deleteSpecificTournamentRoundsByePlayers(self, tournamentId, roundNbrs):
+        raise NotImplementedError
+
+    def deleteAllTournamentRoundsHistoricalStandings(self, tournamentId):
+        raise NotImplementedError
+
+    def deleteSpecificTournamentRoundsHistoricalStandings(self, tournamentId, roundNbrs):
+        raise NotImplementedError
+
+    def deleteFullTournamentRegister(self, tournamentId):
+        raise NotImplementedError
+
+    def deleteSpecificTournamentRegisteredPlayers(self, tournamentId, playerIds):
+        raise NotImplementedError
+
+    # Returns the new tournament's id
+    def registerTournament(self, tournamentName):
+        raise NotImplementedError
+
+    # Returns the new player's id
+    def registerPlayer(self, playerName):
+        raise NotImplementedError
+
+    def registerTournamentPlayer(self, tournamentId, playerId):
+        raise NotImplementedError
+
+    # Registers the players in one transaction, and returns their new ids in the order of their names.
+    # Backends with a faster bulk insert override it.
+    def registerPlayers(self, playerNames):
+        with self.transaction():
+            return [self.registerPlayer(playerName) for playerName in playerNames]
+
+    # Registers the players for the tournament in one transaction. Backends with a faster bulk insert override
+    # it.
+    def registerTournamentPlayers(self, tournamentId, playerIds):
+        with self.transaction():
+            for playerId in playerIds:
+                self.registerTournamentPlayer(tournamentId, playerId)
+
+    # Registers new players and registers them for the tournament, in one transaction, and returns their ids
+    # in the order of their names
+    def registerTournamentNewPlayers(self, tournamentId, playerNames):
+        with self.transaction():
+            playerIds = self.registerPlayers(playerNames)
+            self.registerTournamentPlayers(tournamentId, playerIds)
+        return playerIds
+
+    # Snapshots the round's historical standings, from the current_standings rows given, else from the
+    # tournament's current standings, if the round is a keyframe round (see determineKeyframeRound)
+    def registerTournamentHistoricalStandings(self, tournamentId, roundNbr, historicalStandings=None, finalRound=False):
+        raise NotImplementedError
+
+    # Every historicalStandingsKeyframeInterval-th round is a keyframe round, and so is the tournament's final
+    # round
+    def determineKeyframeRound(self, roundNbr, finalRound=False):
+        return finalRound or roundNbr % self.historicalStandingsKeyframeInterval == 0
+
+    # (id, name), or None for an unknown tournament
+    def tournamentInfo(self, tournamentId):
+        raise NotImplementedError
+
+    # (player_id, player_name) of each registered player
+    def tournamentPlayerInfo(self, tournamentId):
+        raise NotImplementedError
+
+    # (winner_player_id, loser_player_id) of each registered match
+    def tournamentPreviousRoundPlayerMatches(self, tournamentId):
+        raise NotImplementedError
+
+    # historical_standing rows (round_nbr, player_rank, actual_player_rank, player_id, wins, losses, ties, points,
+    # opponent_points) of the latest keyframe round at or before the round, in player_rank order, or no rows
+    def tournamentHistoricalStandingsKeyframe(self, tournamentId, roundNbr):
+        raise NotImplementedError
+
+    # (round_nbr, match_nbr, winner_player_id, loser_player_id, tie_flag) of each match of the rounds up to and
+    # including the round (every round, if None), in round_nbr and match_nbr order
+    def tournamentMatchResultsThroughRound(self, tournamentId, roundNbr=None):
+        raise NotImplementedError
+
+    # (round_nbr, player_id) of each bye player of the rounds up to and including the round (every round, if
+    # None), in round_nbr order
+    def tournamentRoundByePlayersThroughRound(self, tournamentId, roundNbr=None):
+        raise NotImplementedError
+
+    # historical_standing rows of every round, in round_nbr and player_rank order. Every round's standings are
+    # rebuilt by replaying the tournament's match results and bye players, round by round. Players are ranked
+    # by the tournament's tie-breaks (see tiebreaks.py), which are not stored, so they are given again.
+    def tournamentHistoricalStandings(self, tournamentId, tiebreakOrder=tiebreaks.DEFAULT_TIEBREAK_ORDER):
+        standingsEngine = standings.StandingsEngine(self.tournamentPlayerInfo(tournamentId), tiebreakOrder)
+        historicalStandings = []
+        for roundNbr, roundMatchResults, roundByePlayers in groupRoundResults(self.tournamentMatchResultsThroughRound(tournamentId), self.tournamentRoundByePlayersThroughRound(tournamentId)):
+            for matchRoundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag in roundMatchResults:
+                standingsEngine.registerMatchResult(winnerPlayerId, loserPlayerId, tieFlag)
+            for byeRoundNbr, playerId in roundByePlayers:
+                standingsEngine.registerByePlayer(playerId)
+            historicalStandings.extend(determineHistoricalStandings(roundNbr, standingsEngine.determineStandings()))
+        return historicalStandings
+
+    # historical_standing rows of the tournament's standings after the round (as of round roundNbr), in
+    # player_rank order. The standings are restored from the latest keyframe at or before the round, and the
+    # results of the rounds after the keyframe are applied to them. Meeting opponents are restored from the
+    # keyframe rounds' matches, without their points, since those are already in the keyframe's standings.
+    # Players are ranked by the tournament's tie-breaks, as in tournamentHistoricalStandings. Keyframes do not
+    # keep players' results, so with tie-breaks calculated from them the standings are replayed from round 1.
+    def tournamentStandingsAsOfRound(self, tournamentId, roundNbr, tiebreakOrder=tiebreaks.DEFAULT_TIEBREAK_ORDER):
+        standingsEngine = standings.StandingsEngine(self.tournamentPlayerInfo(tournamentId), tiebreakOrder)
+        keyframeRoundNbr = 0
+        if not tiebreaks.determineResultsRequired(tiebreakOrder):
+            for historicalStanding in self.tournamentHistoricalStandingsKeyframe(tournamentId, roundNbr):
+                keyframeRoundNbr = historicalStanding[0]
+                standingsEngine.restoreStanding(historicalStanding[3], historicalStanding[4], historicalStanding[5], historicalStanding[6], historicalStanding[7], historicalStanding[8])
+
+        # Rounds are replayed in order, since tie-breaks like the cumulative score depend on it
+        for resultsRoundNbr, roundMatchResults, roundByePlayers in groupRoundResults(self.tournamentMatchResultsThroughRound(tournamentId, roundNbr), self.tournamentRoundByePlayersThroughRound(tournamentId, roundNbr)):
+            if resultsRoundNbr <= keyframeRoundNbr:
+                for matchRoundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag in roundMatchResults:
+                    standingsEngine.registerOpponents(winnerPlayerId, loserPlayerId)
+                continue
+            for matchRoundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag in roundMatchResults:
+                standingsEngine.registerMatchResult(winnerPlayerId, loserPlayerId, tieFlag)
+            for byeRoundNbr, playerId in roundByePlayers:
+                standingsEngine.registerByePlayer(playerId)
+        return determineHistoricalStandings(roundNbr, standingsEngine.determineStandings())
+
+    def tournamentTotalPlayerCount(self, tournamentId):
+        raise NotImplementedError
+
+    def tournamentTotalRoundCount(self, tournamentId):
+        raise NotImplementedError
+
+    # current_standings rows, in player_rank order
+    def tournamentCurrentStandings(self, tournamentId):
+        raise NotImplementedError
+
+    def registerTournamentMatchResult(self, tournamentId, roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag=False):
+        raise NotImplementedError
+
+    # Registers many matches of the tournament at once, in one transaction: (roundNbr, matchNbr, winnerPlayerId,
+    # loserPlayerId, tieFlag) of each match, e.g. to load a tournament's matches in bulk. Neither bye players
+    # nor historical standings are registered. Backends with a faster bulk insert override it.
+    def registerTournamentMatchResults(self, tournamentId, matchResults):
+        with self.transaction():
+            for roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag in matchResults:
+                self.registerTournamentMatchResult(tournamentId, roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag)
+
+    # match_results rows (match_nbr, winner_player_id, winner_player_name, loser_player_id, loser_player_name,
+    # tie_flag) of the round
+    def tournamentRoundMatchResults(self, tournamentId, roundNbr):
+        raise NotImplementedError
+
+    # Registers all of a round's results in one transaction: the match results (matchNbr, winnerPlayerId,
+    # loserPlayerId, tieFlag), the round's bye player (playerRank, playerId), if any, and the round's historical
+    # standings snapshot, a keyframe if it is the tournament's final round. Backends with a faster bulk insert
+    # override it.
+    def registerTournamentRoundResults(self, tournamentId, roundNbr, matchResults, roundByePlayer=None, historicalStandings=None, finalRound=False):
+        with self.transaction():
+            for matchNbr, winnerPlayerId, loserPlayerId, tieFlag in matchResults:
+                self.registerTournamentMatchResult(tournamentId, roundNbr, matchNbr, winnerPlayerId, loserPlayerId, tieFlag)
+            if roundByePlayer is not None:
+                self.registerTournamentRoundByePlayer(tournamentId, roundNbr, roundByePlayer[0], roundByePlayer[1])
+            self.registerTournamentHistoricalStandings(tournamentId, roundNbr, historicalStandings, finalRound)
+
+    def registerTournamentRoundByePlayer(self, tournamentId, roundNbr, playerRank, playerId):
+        raise NotImplementedError
+
+    # (player_rank, player_id, player_name) of the top ranked player who has not had a bye round, or None
+    def tournamentTopPlayerWithNoByeRound(self, tournamentId):
+        raise NotImplementedError
+
+    def closeDbConnection(self):
+        raise NotImplementedError
+
+
+# historical_standing rows of a round's current_standings rows
+def determineHistoricalStandings(roundNbr, currentStandings):
+    return [(roundNbr,) + tuple(standing[:3]) + tuple(standing[4:9]) for standing in currentStandings]
+
+
+# (round_nbr, match results, bye players) of each round with match results or bye players, in round_nbr order,
+# from match results and bye players in round_nbr order (see tournamentMatchResultsThroughRound and
+# tournamentRoundByePlayersThroughRound)
+def groupRoundResults(matchResults, roundByePlayers):
+    roundMatchResults = dict((roundNbr, list(roundResults)) for roundNbr, roundResults in itertools.groupby(matchResults, key=lambda matchResult: matchResult[0]))
+    roundByePlayers = dict((roundNbr, list(byePlayers)) for roundNbr, byePlayers in itertools.groupby(roundByePlayers, key=lambda byePlayer: byePlayer[0]))
+    for roundNbr in sorted(set(roundMatchResults) | set(roundByePlayers)):
+        yield roundNbr, roundMatchResults.get(roundNbr, []), roundByePlayers.get(roundNbr, [])
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# Tie-breaks which order players with the same points. A player's tie-breaks are calculated in one pass over
+# their results, the (opponent player id, points) of each round they played in round order, with None as the
+# opponent of a bye round.
+
+OPPONENT_POINTS = "opponent_points"
+BUCHHOLZ = "buchholz"
+BUCHHOLZ_CUT_1 = "buchholz_cut_1"
+MEDIAN_BUCHHOLZ = "median_buchholz"
+SONNEBORN_BERGER = "sonneborn_berger"
+CUMULATIVE = "cumulative"
+
+TIEBREAKS = (OPPONENT_POINTS, BUCHHOLZ, BUCHHOLZ_CUT_1, MEDIAN_BUCHHOLZ, SONNEBORN_BERGER, CUMULATIVE)
+
+# The database's current_standings view breaks ties by opponent points only
+DEFAULT_TIEBREAK_ORDER = (OPPONENT_POINTS,)
+
+
+def validateTiebreakOrder(tiebreakOrder):
+    for tiebreak in tiebreakOrder:
+        if tiebreak not in TIEBREAKS:
+            raise ValueError("Unknown tie-break: {0}".format(tiebreak))
+    return tuple(tiebreakOrder)
+
+
+# Opponent points are kept up to date as results are applied (see standings.StandingsEngine); every other
+# tie-break is calculated from the players' results
+def determineResultsRequired(tiebreakOrder):
+    return any(tiebreak != OPPONENT_POINTS for tiebreak in tiebreakOrder)
+
+
+# The player's tie-breaks, in tiebreakOrder, from their results, every player's points (by player id) and their
+# opponent points (OMP, the points of each distinct opponent):
+#     Buchholz: the points of the opponent of each round played
+#     Buchholz cut 1: Buchholz less the lowest opponent's points
+#     Median-Buchholz: Buchholz less the lowest and the highest opponent's points
+#     Sonneborn-Berger: the points of each opponent beaten, and half the points of each opponent tied
+#     Cumulative: the sum of the player's running points after each round, bye rounds included
+def determinePlayerTiebreaks(playerResults, points, opponentPoints, tiebreakOrder):
+    opponentCount = 0
+    buchholz = 0.0
+    lowestOpponentPoints = None
+    highestOpponentPoints = None
+    sonnebornBerger = 0.0
+    runningPoints = 0.0
+    cumulative = 0.0
+    for opponentPlayerId, roundPoints in playerResults:
+        runningPoints += roundPoints
+        cumulative += runningPoints
+        if opponentPlayerId is None:
+            continue
+        roundOpponentPoints = points[opponentPlayerId]
+        opponentCount += 1
+        buchholz += roundOpponentPoints
+        sonnebornBerger += roundOpponentPoints * roundPoints
+        if lowestOpponentPoints is None or roundOpponentPoints < lowestOpponentPoints:
+            lowestOpponentPoints = roundOpponentPoints
+        if highestOpponentPoints is None or roundOpponentPoints > highestOpponentPoints:
+            highestOpponentPoints = roundOpponentPoints
+
+    playerTiebreaks = {OPPONENT_POINTS: opponentPoints, BUCHHOLZ: buchholz, BUCHHOLZ_CUT_1: buchholz, MEDIAN_BUCHHOLZ: buchholz, SONNEBORN_BERGER: sonnebornBerger, CUMULATIVE: cumulative}
+    if opponentCount > 0:
+        playerTiebreaks[BUCHHOLZ_CUT_1] -= lowestOpponentPoints
+        playerTiebreaks[MEDIAN_BUCHHOLZ] -= lowestOpponentPoints
+    if opponentCount > 1:
+        playerTiebreaks[MEDIAN_BUCHHOLZ] -= highestOpponentPoints
+    return tuple(playerTiebreaks[tiebreak] for tiebreak in tiebreakOrder)
@@ -1,56 +1,209 @@
 #!/usr/bin/env python
 
+import csv
 import math
-import random
 
+import instrumentation
 import round
+import outcomes
+import outputsinks
+import pairing
+import playedpairs
+import playerregistry
+import standings
+import tiebreaks
 
 
 class Tournament:
     ''' Includes tournament related data and operations '''
 
-    def __init__(self, name, dbo, qualifiedPlaces=3):
+    # With checkStandings=True, the standings calculated in memory are checked against the database's after
+    # every round. The tournament's progress is written to outputSink (see outputsinks.py), a TextSink on
+    # standard output by default; quiet=True is short for a NullSink, e.g. for batches of simulations. The
+    # tournament's random choices and match outcomes are drawn from rng, or from a generator seeded with seed
+    # (see outcomes.OutcomeGenerator), so the same seed simulates the same tournament. Players with the same
+    # points are ranked, and paired, by the tie-breaks of tiebreakOrder in order (see tiebreaks.py), opponent
+    # points only by default. A tournament already registered in the database is given its tournamentId
+    # instead of being registered again (see load).
+    def __init__(self, name, dbo, qualifiedPlaces=3, pairingMethod=pairing.BLOSSOM, checkStandings=False, quiet=False, seed=None, rng=None, outputSink=None, tiebreakOrder=tiebreaks.DEFAULT_TIEBREAK_ORDER, tournamentId=None):
         self.name = name
         self.dbo = dbo
-        self.id = self.registerInDb()
+        self.id = tournamentId
+        if self.id is None:
+            self.id = self.registerInDb()
         self.rounds = []
-        self.previousRoundsPlayedMatches = []
+        self.previousRoundsPlayedMatches = playedpairs.PlayedPairs()
+        self.roundByePlayerCounts = {}
         self.qualifiedPlaces = qualifiedPlaces
+        self.pairingMethod = pairingMethod
+        self.tiebreakOrder = tiebreaks.validateTiebreakOrder(tiebreakOrder)
+        self.pairer = self.createPairer()
+        self.checkStandings = checkStandings
+        self.outputSink = outputSink
+        if self.outputSink is None:
+            self.outputSink = outputsinks.NullSink() if quiet else outputsinks.TextSink()
+        self.outcomeGenerator = outcomes.OutcomeGenerator(seed, rng)
+        self.asyncOperations = None
+        self.roundResultsFutures = []
 
         self.started = False
+        self.nameOutput = False
         self.currentRoundNbr = None
         self.players = []
+        self.playerRegistry = None
+        self.standingsEngine = None
         self.totalPlayerCount = 0
         self.totalPlayerCountOdd = False
         self.possiblePlayerMatchCombinations = None
+        self.possiblePlayerMatchCombinationArray = None
         self.totalRoundCount = 0
 
+    # Reattaches to a tournament registered earlier, e.g. after a crash or a restart, with its completed rounds
+    # rebuilt from the database (see resumeSimulation), so simulate continues from the next round. The other
+    # options are not stored in the database, and should be given as they were when the tournament started.
+    @classmethod
+    def load(cls, tournamentId, dbo, qualifiedPlaces=3, pairingMethod=pairing.BLOSSOM, checkStandings=False, quiet=False, seed=None, rng=None, outputSink=None, tiebreakOrder=tiebreaks.DEFAULT_TIEBREAK_ORDER):
+        tournamentInfo = dbo.tournamentInfo(tournamentId)
+        if not tournamentInfo:
+            raise ValueError("Tournament {0} is not registered in the database".format(tournamentId))
+        t = cls(tournamentInfo[1], dbo, qualifiedPlaces, pairingMethod, checkStandings, quiet, seed, rng, outputSink, tiebreakOrder, tournamentId)
+        t.resumeSimulation()
+        return t
+
     def registerInDb(self):
         return self.dbo.registerTournament(self.name)
 
+    # The exhaustive pairing method has no pairer; it enumerates every possible player match combination
+    def createPairer(self):
+        if self.pairingMethod == pairing.BLOSSOM:
+            return pairing.BlossomPairer()
+        elif self.pairingMethod == pairing.SCORE_GROUP:
+            return pairing.ScoreGroupPairer()
+        elif self.pairingMethod == pairing.BRANCH_AND_BOUND:
+            return pairing.BranchAndBoundPairer()
+        elif self.pairingMethod == pairing.EXHAUSTIVE:
+            return None
+        else:
+            raise ValueError("Unknown pairing method: {0}".format(self.pairingMethod))
+
     def registerPlayer(self, playerId):
         self.registerPlayerInDb(playerId)
         self.players = self.getTournamentPlayerInfoFromDb()
+        self.playerRegistry = None
+        self.totalPlayerCount = self.calculateTotalPlayerCount()
+
+    # Registers a batch of players in one transaction
+    def registerPlayers(self, playerIds):
+        self.dbo.registerTournamentPlayers(self.id, playerIds)
+        self.players = self.getTournamentPlayerInfoFromDb()
+        self.playerRegistry = None
         self.totalPlayerCount = self.calculateTotalPlayerCount()
 
+    # Registers new players, and registers them for the tournament, in one transaction, and returns their ids
+    # in order. players is an iterable of player names, or a CSV file (a path or a file object) with a name
+    # column (see readPlayerNames).
+    def importPlayers(self, players):
+        if isinstance(players, basestring) or hasattr(players, "read"):
+            players = readPlayerNames(players)
+        playerIds = self.dbo.registerTournamentNewPlayers(self.id, players)
+        self.players = self.getTournamentPlayerInfoFromDb()
+        self.playerRegistry = None
+        self.totalPlayerCount = self.calculateTotalPlayerCount()
+        return playerIds
+
     def registerPlayerInDb(self, playerId):
         self.dbo.registerTournamentPlayer(self.id, playerId)
 
+    # A loaded tournament (see load) continues from its next round
     def simulate(self):
+        self.startOrContinueSimulation()
+        self.simulateRounds()
+        self.closeDbConnection()
+
+    # Like simulate, but each round's results are registered asynchronously, behind the simulation of the
+    # next round (see asyncoperations.py). Waits for all of them before returning, raising the first error of
+    # any. The storage backend is shared, so it is not closed.
+    def simulateAsync(self, asyncOperations):
+        self.asyncOperations = asyncOperations
+        try:
+            self.startOrContinueSimulation()
+            self.simulateRounds()
+        finally:
+            self.waitForRoundResults()
+            self.asyncOperations = None
+
+    # A tournament loaded (see load) before its first round was completed has not written its name yet, so
+    # it is written before the first round
+    def startOrContinueSimulation(self):
+        if not self.started:
+            self.startSimulation()
+        elif self.currentRoundNbr == 1 and not self.nameOutput:
+            self.outputName()
+            self.outputSink.flush()
+
+    def startSimulation(self):
+        self.prepareSimulation()
+        self.currentRoundNbr = 1
+        self.outputName()
+        self.outputSink.flush()
+
+    # Rebuilds the state of a tournament whose simulation started before it was loaded, with one bulk query
+    # each for its players, its matches, its bye players and its played pairs, however many rounds were
+    # completed: the completed rounds, previously played matches, bye player counts and standings. The
+    # standings engine replays every completed round's results.
+    def resumeSimulation(self):
+        self.prepareSimulation()
+        roundMatchResults = {}
+        for matchResult in self.dbo.tournamentMatchResultsThroughRound(self.id):
+            roundMatchResults.setdefault(matchResult[0], []).append(matchResult[1:])
+        roundByePlayerIds = dict(self.dbo.tournamentRoundByePlayersThroughRound(self.id))
+        self.previousRoundsPlayedMatches = playedpairs.PlayedPairs.fromDb(self.dbo, self.id)
+
+        for roundNbr in sorted(set(roundMatchResults) | set(roundByePlayerIds)):
+            rnd = round.Round(self.dbo, self.id, roundNbr, self.outcomeGenerator)
+            rnd.setPlayerRegistry(self.playerRegistry)
+            rnd.setStandingsEngine(self.standingsEngine)
+            if roundNbr in roundByePlayerIds:
+                rnd.setRoundByePlayer((None, roundByePlayerIds[roundNbr], self.playerRegistry.playerName(roundByePlayerIds[roundNbr])))
+            rnd.restoreRound(roundMatchResults.get(roundNbr, []))
+            self.registerRoundByePlayer(rnd)
+            self.addRoundToTournament(rnd)
+
+        self.currentRoundNbr = 1
+        if self.rounds:
+            self.currentRoundNbr = self.rounds[-1].nbr + 1
+            self.currentStandings = self.getCurrentStandings()
+
+    def prepareSimulation(self):
         self.started = True
         self.players = self.getTournamentPlayerInfoFromDb()
+        self.playerRegistry = self.createPlayerRegistry()
+        self.standingsEngine = self.createStandingsEngine()
         self.totalPlayerCount = self.calculateTotalPlayerCount()
         self.totalPlayerCountOdd = self.determineTotalPlayerCountOdd()
-        self.possiblePlayerMatchCombinations = self.determineInitialPossiblePlayerMatchCombinations()
+        if self.pairingMethod == pairing.EXHAUSTIVE:
+            with instrumentation.timer("tournament.generateCombinations"):
+                self.possiblePlayerMatchCombinations = self.determineInitialPossiblePlayerMatchCombinations()
+            instrumentation.incrementCounter("pairing.exhaustive.combinationsGenerated", len(self.possiblePlayerMatchCombinations))
+            if round.numpy is not None:
+                self.possiblePlayerMatchCombinationArray = round.encodePlayerMatchCombinations(self.possiblePlayerMatchCombinations, self.playerRegistry)
         self.totalRoundCount = self.calculateTotalRoundCount()
 
-        self.outputName()
-        self.simulateRounds()
-        self.closeDbConnection()
-
     def getTournamentPlayerInfoFromDb(self):
         return self.dbo.tournamentPlayerInfo(self.id)
 
+    def createPlayerRegistry(self):
+        return playerregistry.PlayerRegistry(self.players)
+
+    def createStandingsEngine(self):
+        return standings.StandingsEngine(self.players, self.tiebreakOrder)
+
+    # The player registry is built once from the tournament's players, and rebuilt only if they change
+    def getPlayerRegistry(self):
+        if self.playerRegistry is None:
+            self.playerRegistry = self.createPlayerRegistry()
+        return self.playerRegistry
+
     def calculateTotalPlayerCount(self):
         return len(self.players)
 
@@ -88,107 +241,179 @@ class Tournament:
     def calculateTotalRoundCount(self):
         return int(math.floor((self.totalPlayerCount + 7.0 * self.qualifiedPlaces)/5.0))
 
+    # Simulates the rounds from the current round on. Each phase of a round is timed (see instrumentation.py).
+    # Output is flushed once per round.
     def simulateRounds(self):
-        self.currentRoundNbr = 1
         while self.currentRoundNbr <= self.totalRoundCount:
-            self.simulateRound()
-            self.currentStandings = self.getCurrentStandingsFromDb()
-            self.registerHistoricalStandingsInDb()
-
-            self.outputCurrentStandings()
+            with instrumentation.timer("tournament.simulateRound"):
+                self.simulateRound()
+            with instrumentation.timer("tournament.currentStandings"):
+                self.currentStandings = self.getCurrentStandings()
+            if self.checkStandings:
+                with instrumentation.timer("tournament.checkStandings"):
+                    self.checkCurrentStandings()
+
+            with instrumentation.timer("tournament.output"):
+                self.outputCurrentStandings()
+                self.outputSink.flush()
             self.currentRoundNbr += 1
 
     def simulateRound(self):
-        rnd = round.Round(self.dbo, self.id, self.currentRoundNbr)
-        if self.currentRoundFirstRound():
-            self.simulateFirstRound(rnd)
+        rnd = round.Round(self.dbo, self.id, self.currentRoundNbr, self.outcomeGenerator)
+        with instrumentation.timer("tournament.pairRound"):
+            if self.currentRoundFirstRound():
+                self.simulateFirstRound(rnd)
+            else:
+                self.simulateSecondOrGreaterRound(rnd)
+        rnd.setStandingsEngine(self.standingsEngine)
+        rnd.setFinalRound(self.currentRoundNbr == self.totalRoundCount)
+        if self.asyncOperations is None:
+            rnd.simulateMatches(self.players, self.previousRoundsPlayedMatches)
         else:
-            self.simulateSecondOrGreaterRound(rnd)
-        rnd.simulateMatches(self.players, self.previousRoundsPlayedMatches)
+            self.roundResultsFutures.append(rnd.simulateMatchesAsync(self.players, self.previousRoundsPlayedMatches, self.asyncOperations))
+        self.registerRoundByePlayer(rnd)
         self.addRoundToTournament(rnd)
-        rnd.outputRound(self.totalRoundCount, self.totalPlayerCountOdd)
+        with instrumentation.timer("round.output"):
+            rnd.outputRound(self.outputSink, self.totalRoundCount, self.totalPlayerCountOdd)
 
     # chooses a random bye player (if there are an odd number of players) and random combination of player
-    # matches for the round
+    # matches for the round. Without enumerated possible player match combinations, the random combination
+    # is built by shuffling the players.
     def simulateFirstRound(self, rnd):
+        rnd.setPlayerRegistry(self.getPlayerRegistry())
         if self.totalPlayerCountOdd:
             randomPlayer = self.chooseRandomTournamentPlayer()
             randomPlayerDetail = (None, randomPlayer[0], randomPlayer[1])
             rnd.setRoundByePlayer(randomPlayerDetail)
-            rnd.registerRoundByePlayerInDb()
-        rnd.setInitialRoundPossiblePlayerMatchCombinations(self.possiblePlayerMatchCombinations)
-        if self.totalPlayerCountOdd:
-            rnd.filterOutRoundPossiblePlayerMatchCombinationsWithRoundByePlayer()
-        randomRoundPossiblePlayerMatchCombination = rnd.chooseRandomRoundPossiblePlayerMatchCombination()
+        if self.possiblePlayerMatchCombinations is not None:
+            rnd.setInitialRoundPossiblePlayerMatchCombinations(self.possiblePlayerMatchCombinations)
+            if self.totalPlayerCountOdd:
+                rnd.filterOutRoundPossiblePlayerMatchCombinationsWithRoundByePlayer()
+            randomRoundPossiblePlayerMatchCombination = rnd.chooseRandomRoundPossiblePlayerMatchCombination()
+        else:
+            randomRoundPossiblePlayerMatchCombination = rnd.chooseRandomRoundPlayerMatchCombination([player[0] for player in self.players])
         rnd.setPlayerMatchCombination(randomRoundPossiblePlayerMatchCombination)
 
     def currentRoundFirstRound(self):
         return self.currentRoundNbr == 1
 
     def chooseRandomTournamentPlayer(self):
-        return random.choice(self.players)
+        return self.outcomeGenerator.choice(self.players)
 
     def outputName(self):
-        print "{0}".format(self.name)
+        self.outputSink.writeTournamentName(self.name)
+        self.nameOutput = True
 
     def closeDbConnection(self):
         self.dbo.closeDbConnection()
 
     # chooses the tournament top ranked player with no bye round (if there are an odd number of players) as the
     # the round's bye player and the player match combination which minimizes the difference between rankings
-    # and does not include any previously played matches.
+    # and does not include any previously played matches. If the rest of the players cannot be paired without
+    # previously played matches, the next bye player candidate is tried.
     def simulateSecondOrGreaterRound(self, rnd):
-        if self.totalPlayerCountOdd:
-            topPlayerWithNoByeRound = self.getTopPlayerWithNoByeRoundFromDb()
-            rnd.setRoundByePlayer(topPlayerWithNoByeRound)
-            rnd.registerRoundByePlayerInDb()
+        self.getPlayerRegistry().updateStandings(self.currentStandings)
+        rnd.setPlayerRegistry(self.playerRegistry)
         rnd.setTournamentPreviousRoundsPlayedMatches(self.previousRoundsPlayedMatches)
-        self.filterOutPossiblePlayerMatchCombinationsWithPreviousRoundsPlayedMatches()
-        rnd.setInitialRoundPossiblePlayerMatchCombinations(self.possiblePlayerMatchCombinations)
-        if self.totalPlayerCountOdd:
-            rnd.filterOutRoundPossiblePlayerMatchCombinationsWithRoundByePlayer()
         rnd.setTournamentPreviousRoundStandings(self.currentStandings)
-        rnd.determineRoundPossiblePlayerMatchCombinationQuality()
+        if not self.totalPlayerCountOdd:
+            self.pairSecondOrGreaterRound(rnd)
+            return
+
+        for roundByePlayerCandidate in self.determineRoundByePlayerCandidates():
+            rnd.setRoundByePlayer(roundByePlayerCandidate)
+            try:
+                self.pairSecondOrGreaterRound(rnd)
+                return
+            except pairing.NoPairingError:
+                continue
+        raise pairing.NoPairingError("No round bye player leaves players who can be paired without previously played matches")
+
+    def pairSecondOrGreaterRound(self, rnd):
+        if self.pairer is not None:
+            with instrumentation.timer("pairing.{0}".format(self.pairingMethod)):
+                bestRoundPlayerMatchCombination = rnd.determineBestRoundPlayerMatchCombination(self.pairer)
+            rnd.setPlayerMatchCombination(bestRoundPlayerMatchCombination)
+        else:
+            self.simulateSecondOrGreaterRoundExhaustively(rnd)
+
+    # Round bye player candidates (player_rank, player_id, player_name), in the order they are tried: players who
+    # have not had a bye round in rank order, then, once every player has had one, the players who have had the
+    # fewest bye rounds in rank order
+    def determineRoundByePlayerCandidates(self):
+        rankedStandings = sorted(self.currentStandings, key=lambda standing: (self.roundByePlayerCounts.get(standing[2], 0), standing[0]))
+        return [(standing[0], standing[2], standing[3]) for standing in rankedStandings]
+
+    def registerRoundByePlayer(self, rnd):
+        if rnd.roundByePlayerId is not None:
+            self.roundByePlayerCounts[rnd.roundByePlayerId] = self.roundByePlayerCounts.get(rnd.roundByePlayerId, 0) + 1
+
+    # scores every remaining possible player match combination and chooses the best one. If NumPy is installed,
+    # the combinations are encoded once per tournament and scored vectorized; previously played matches are then
+    # masked out each round instead of filtered out.
+    def simulateSecondOrGreaterRoundExhaustively(self, rnd):
+        rnd.setTournamentPreviousRoundStandings(self.currentStandings)
+        if self.possiblePlayerMatchCombinationArray is not None:
+            rnd.setInitialRoundPossiblePlayerMatchCombinations(self.possiblePlayerMatchCombinations)
+            rnd.setInitialRoundPossiblePlayerMatchCombinationArray(self.possiblePlayerMatchCombinationArray)
+            with instrumentation.timer("pairing.exhaustive.scoreCombinationsVectorized"):
+                bestRoundPossiblePlayerMatchCombination = rnd.determineBestRoundPossiblePlayerMatchCombinationVectorized()
+        else:
+            with instrumentation.timer("pairing.exhaustive.filterCombinations"):
+                self.filterOutPossiblePlayerMatchCombinationsWithPreviousRoundsPlayedMatches()
+                rnd.setInitialRoundPossiblePlayerMatchCombinations(self.possiblePlayerMatchCombinations)
+                if self.totalPlayerCountOdd:
+                    rnd.filterOutRoundPossiblePlayerMatchCombinationsWithRoundByePlayer()
+            with instrumentation.timer("pairing.exhaustive.scoreCombinations"):
+                rnd.determineRoundPossiblePlayerMatchCombinationQuality()
+            with instrumentation.timer("pairing.exhaustive.chooseBestCombination"):
+                bestRoundPossiblePlayerMatchCombination = rnd.determineBestRoundPossiblePlayerMatchCombination()
 
-        bestRoundPossiblePlayerMatchCombination = rnd.determineBestRoundPossiblePlayerMatchCombination()
         sortedBestRoundPossiblePlayerMatchCombination = rnd.sortBestRoundPlayerMatchCombinationByTournamentCurrentPlayerRanks(bestRoundPossiblePlayerMatchCombination)
         rnd.setPlayerMatchCombination(sortedBestRoundPossiblePlayerMatchCombination)
 
-    def getTopPlayerWithNoByeRoundFromDb(self):
-        return self.dbo.tournamentTopPlayerWithNoByeRound(self.id)
-
     def filterOutPossiblePlayerMatchCombinationsWithPreviousRoundsPlayedMatches(self):
-        self.possiblePlayerMatchCombinations = [possiblePlayerMatchCombination for possiblePlayerMatchCombination in self.possiblePlayerMatchCombinations if not any((match[0] == previousRoundsPlayedMatch[0] or match[1] == previousRoundsPlayedMatch[0]) and (match[0] == previousRoundsPlayedMatch[1] or match[1] == previousRoundsPlayedMatch[1]) for previousRoundsPlayedMatch in self.previousRoundsPlayedMatches for match in possiblePlayerMatchCombination)]
+        possiblePlayerMatchCombinationCount = len(self.possiblePlayerMatchCombinations)
+        self.possiblePlayerMatchCombinations = [possiblePlayerMatchCombination for possiblePlayerMatchCombination in self.possiblePlayerMatchCombinations if not any(self.previousRoundsPlayedMatches.played(match[0], match[1]) for match in possiblePlayerMatchCombination)]
+        instrumentation.incrementCounter("pairing.exhaustive.combinationsPruned", possiblePlayerMatchCombinationCount - len(self.possiblePlayerMatchCombinations))
 
     def addRoundToTournament(self, rnd):
         self.rounds.append(rnd)
 
+    # Standings come from the standings engine once the tournament is simulated, and from the database otherwise
+    def getCurrentStandings(self):
+        if self.standingsEngine is not None:
+            return self.standingsEngine.determineStandings()
+        return self.getCurrentStandingsFromDb()
+
     def getCurrentStandingsFromDb(self):
         return self.dbo.tournamentCurrentStandings(self.id)
 
-    def registerHistoricalStandingsInDb(self):
-        self.dbo.registerTournamentHistoricalStandings(self.id, self.currentRoundNbr)
-
-    def outputCurrentStandings(self):
-        self.outputCurrentStandingsHeader()
-        self.outputCurrentStandingsDetail()
+    # Waits for the rounds' results registered asynchronously, raising the first error of any
+    def waitForRoundResults(self):
+        roundResultsFutures = self.roundResultsFutures
+        self.roundResultsFutures = []
+        for roundResultsFuture in roundResultsFutures:
+            roundResultsFuture.result()
 
-    def outputCurrentStandingsHeader(self):
-        print "\nRank\tPID\tName\tW\tL\tT\tPoints\tOMP"
+    # Rounds' results registered asynchronously are waited for, so they are in the database's standings
+    def checkCurrentStandings(self):
+        self.waitForRoundResults()
+        standingsDifferences = self.standingsEngine.determineStandingsDifferences(self.getCurrentStandingsFromDb())
+        if standingsDifferences:
+            raise ValueError("Round {0} standings differ from the database's (player id, field, calculated, database): {1}".format(self.currentRoundNbr, standingsDifferences))
 
-    def outputCurrentStandingsDetail(self):
-        for standing in self.currentStandings:
-            standingOutput = ""
-            for standingField in standing[1:]:
-                standingOutput += str(standingField) + "\t"
-            print standingOutput
+    def outputCurrentStandings(self):
+        self.outputSink.writeStandings(self.currentRoundNbr, self.currentStandings)
 
     def deleteRegisteredPlayers(self, playerIds=None):
-        if playerIds is None:
-            self.deleteFullTournamentRegisterFromDb()
-        else:
-            self.deleteSpecificRegisteredPlayerFromDb(playerIds)
+        with self.dbo.transaction():
+            if playerIds is None:
+                self.deleteFullTournamentRegisterFromDb()
+            else:
+                self.deleteSpecificRegisteredPlayersFromDb(playerIds)
         self.players = self.getTournamentPlayerInfoFromDb()
+        self.playerRegistry = None
         self.totalPlayerCount = self.calculateTotalPlayerCount()
 
     def deleteFullTournamentRegisterFromDb(self):
@@ -212,9 +437,10 @@ class Tournament:
             self.deleteSpecificRoundsFromDb(roundNbrs)
 
     def deleteSpecificRoundsFromDb(self, roundNbrs):
-        self.deleteSpecificRoundsMatchesFromDb(roundNbrs)
-        self.deleteSpecificRoundsByePlayersFromDb(roundNbrs)
-        self.deleteSpecificRoundsHistoricalStandingsFromDb(roundNbrs)
+        with self.dbo.transaction():
+            self.deleteSpecificRoundsMatchesFromDb(roundNbrs)
+            self.deleteSpecificRoundsByePlayersFromDb(roundNbrs)
+            self.deleteSpecificRoundsHistoricalStandingsFromDb(roundNbrs)
 
     def deleteSpecificRoundsMatchesFromDb(self, roundNbrs):
         self.dbo.deleteSpecificTournamentRoundsMatches(self.id, roundNbrs)
@@ -231,12 +457,14 @@ class Tournament:
                 rnd.deleteMatches(matchNbrs)
                 break
 
+    # The tournament is torn down in one transaction, so it is never left partly deleted
     def deleteFullTournamentFromDb(self):
-        self.deleteAllMatchesFromDb()
-        self.deleteAllRoundsByePlayersFromDb()
-        self.deleteAllRoundsHistoricalStandingsFromDb()
-        self.deleteFullRegisterFromDb()
-        self.deleteTournamentFromDb()
+        with self.dbo.transaction():
+            self.deleteAllMatchesFromDb()
+            self.deleteAllRoundsByePlayersFromDb()
+            self.deleteAllRoundsHistoricalStandingsFromDb()
+            self.deleteFullRegisterFromDb()
+            self.deleteTournamentFromDb()
 
     def deleteAllMatchesFromDb(self):
         self.dbo.deleteAllTournamentMatches(self.id)
@@ -254,4 +482,13 @@ class Tournament:
         self.dbo.deleteTournament(self.id)
 
     def deleteSpecificRegisteredPlayers(self, playerIds):
-        self.dbo.deleteSpecificTournamentRegisteredPlayers(playerIds)
+        self.dbo.deleteSpecificTournamentRegisteredPlayers(self.id, playerIds)
+
+
+# Reads player names from the name column of a CSV file with a header row, e.g. exported from a registration
+# form. playerFile is a path or a file object; names are decoded from UTF-8.
+def readPlayerNames(playerFile):
+    if isinstance(playerFile, basestring):
+        with open(playerFile, "rb") as playerFileObject:
+            return readPlayerNames(playerFileObject)
+    return [row["name"].decode("utf-8") for row in csv.DictReader(playerFile)]
@@ -24,26 +24,58 @@ CREATE TABLE tournament (
     name TEXT
 );
 
--- Ensures players can register for multiple tournaments
+/*
+    Creates range partitions of a table partitioned by tournament_id, each holding partition_size tournament
+    ids, until they cover tournament ids below range_end. Partitions should be created ahead of the tournament
+    ids in use: tournaments beyond the last partition are kept in the table's default partition, and once
+    they are, the partition covering them can no longer be created.
+*/
+CREATE FUNCTION create_tournament_partitions(partitioned_table_name TEXT, range_end INT, partition_size INT DEFAULT 10000) RETURNS VOID AS $$
+DECLARE
+    range_start INT := 0;
+BEGIN
+    WHILE range_start < range_end LOOP
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%s) TO (%s)',
+            partitioned_table_name || '_' || range_start, partitioned_table_name, range_start, range_start + partition_size);
+        range_start := range_start + partition_size;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Ensures players can register for multiple tournaments, but only once for each tournament
 CREATE TABLE tournament_register (
     id SERIAL PRIMARY KEY,
     tournament_id INT REFERENCES tournament(id),
-    player_id INT REFERENCES player(id)
+    player_id INT REFERENCES player(id),
+    CONSTRAINT tournament_register_tournament_player_key UNIQUE (tournament_id, player_id)
 );
 
 /*
     If tie_flag is true - the match ended in a tie - winner_player_id and loser_player_id do not hold 
-    the actual winning and losing player Ids
+    the actual winning and losing player Ids. Partitioned by tournament, so a tournament's matches are read
+    from one partition.
 */
 CREATE TABLE match (
-    id SERIAL PRIMARY KEY,
-    tournament_id INT REFERENCES tournament(id),
+    id SERIAL,
+    tournament_id INT NOT NULL REFERENCES tournament(id),
     round_nbr INT NOT NULL,
     match_nbr INT NOT NULL,
     winner_player_id INT REFERENCES player(id),
     loser_player_id INT REFERENCES player(id),
-    tie_flag BOOLEAN NOT NULL
-);
+    tie_flag BOOLEAN NOT NULL,
+    PRIMARY KEY (tournament_id, id),
+    CONSTRAINT match_tournament_round_match_key UNIQUE (tournament_id, round_nbr, match_nbr)
+) PARTITION BY RANGE (tournament_id);
+
+SELECT create_tournament_partitions('match', 100000);
+CREATE TABLE match_default PARTITION OF match DEFAULT;
+
+-- Players' won and lost matches, and their opponents (player_opponent), without reading the table
+CREATE INDEX match_winner_idx ON match (tournament_id, winner_player_id, loser_player_id);
+CREATE INDEX match_loser_idx ON match (tournament_id, loser_player_id, winner_player_id);
+
+-- Tied matches are few, so players' ties are read from a small index
+CREATE INDEX match_tie_idx ON match (tournament_id, winner_player_id, loser_player_id) WHERE tie_flag = true;
 
 /*
     Stores tournament rounds' bye players for historical review. Also used to determine the top ranked
@@ -54,13 +86,20 @@ CREATE TABLE tournament_round_bye_player (
     tournament_id INT REFERENCES tournament(id),
     round_nbr INT NOT NULL,
     player_rank INT NULL,
-    player_id INT REFERENCES player(id)
+    player_id INT REFERENCES player(id),
+    CONSTRAINT tournament_round_bye_player_tournament_round_key UNIQUE (tournament_id, round_nbr)
 );
 
--- Stores tournament rounds' historical standings for review. 
+CREATE INDEX tournament_round_bye_player_player_idx ON tournament_round_bye_player (tournament_id, player_id);
+
+/*
+    Stores tournament rounds' historical standings for review, as keyframes: every player's standing after
+    every tenth round (see storage.py). The standings after the other rounds are rebuilt from the latest
+    keyframe and the match results and bye players of the rounds since. Partitioned by tournament, like match.
+*/
 CREATE TABLE historical_standing (
-    id SERIAL PRIMARY KEY,
-    tournament_id INT REFERENCES tournament(id),
+    id SERIAL,
+    tournament_id INT NOT NULL REFERENCES tournament(id),
     round_nbr INT NOT NULL,
     player_rank INT NOT NULL,
     actual_player_rank INT NOT NULL,
@@ -69,9 +108,34 @@ CREATE TABLE historical_standing (
     losses INT NOT NULL,
     ties INT NOT NULL,
     points NUMERIC NOT NULL,
-    opponent_points NUMERIC NOT NULL
+    opponent_points NUMERIC NOT NULL,
+    PRIMARY KEY (tournament_id, id)
+) PARTITION BY RANGE (tournament_id);
+
+SELECT create_tournament_partitions('historical_standing', 100000);
+CREATE TABLE historical_standing_default PARTITION OF historical_standing DEFAULT;
+
+CREATE INDEX historical_standing_round_idx ON historical_standing (tournament_id, round_nbr, player_rank);
+
+/*
+    Tournament players' current records, points and opponent match points, maintained by the triggers below
+    as matches, bye players and registered players are inserted and deleted, so standings are read without
+    aggregating the tournament's matches
+*/
+CREATE TABLE player_standing (
+    tournament_id INT NOT NULL REFERENCES tournament(id),
+    player_id INT NOT NULL REFERENCES player(id),
+    wins INT NOT NULL DEFAULT 0,
+    losses INT NOT NULL DEFAULT 0,
+    ties INT NOT NULL DEFAULT 0,
+    points NUMERIC NOT NULL DEFAULT 0,
+    opponent_points NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (tournament_id, player_id)
 );
 
+-- Matches the current_standings ranking, so a tournament's standings are read in rank order from the index
+CREATE INDEX player_standing_rank_idx ON player_standing (tournament_id, points DESC, opponent_points DESC, player_id);
+
 -- Returns tournament players' information for use in match outputs
 CREATE VIEW tournament_player_info AS
 SELECT
@@ -82,111 +146,350 @@ FROM
     tournament_register tr
     INNER JOIN player p ON tr.player_id = p.id;
 
+-- Returns tournament players' distinct previously played opponents
+CREATE VIEW player_opponent AS
+SELECT
+    m.tournament_id,
+    m.winner_player_id AS player_id,
+    m.loser_player_id AS opponent_player_id
+FROM
+    match m
+UNION
+SELECT
+    m.tournament_id,
+    m.loser_player_id AS player_id,
+    m.winner_player_id AS opponent_player_id
+FROM
+    match m;
+
+/*
+    Recalculates the records (wins, losses, ties) and points of the given tournament players from their
+    matches and bye rounds. Used when players are registered and to backfill player_standing.
+*/
+CREATE FUNCTION rebuild_player_standing_records(changed_tournament_ids INT[], changed_player_ids INT[]) RETURNS VOID AS $$
+    UPDATE player_standing ps
+    SET
+        wins = r.wins,
+        losses = r.losses,
+        ties = r.ties,
+        points = r.wins + r.ties * .5
+    FROM
+        (SELECT
+            c.tournament_id,
+            c.player_id,
+            (SELECT
+                COUNT(1)
+            FROM
+                match m
+            WHERE
+                m.tournament_id = c.tournament_id
+                AND m.winner_player_id = c.player_id
+                AND m.tie_flag = false)
+            + (SELECT
+                COUNT(1)
+            FROM
+                tournament_round_bye_player tb
+            WHERE
+                tb.tournament_id = c.tournament_id
+                AND tb.player_id = c.player_id) AS wins,
+            (SELECT
+                COUNT(1)
+            FROM
+                match m
+            WHERE
+                m.tournament_id = c.tournament_id
+                AND m.loser_player_id = c.player_id
+                AND m.tie_flag = false) AS losses,
+            (SELECT
+                COUNT(1)
+            FROM
+                match m
+            WHERE
+                m.tournament_id = c.tournament_id
+                AND (m.winner_player_id = c.player_id
+                OR m.loser_player_id = c.player_id)
+                AND m.tie_flag = true) AS ties
+        FROM
+            unnest(changed_tournament_ids, changed_player_ids) AS c(tournament_id, player_id)) r
+    WHERE
+        ps.tournament_id = r.tournament_id
+        AND ps.player_id = r.player_id;
+$$ LANGUAGE SQL;
+
+/*
+    Recalculates opponent match points (the sum of the points of each distinct previously played player)
+    for the given tournament players, whose points or opponents changed, and for their opponents. Opponents
+    are read from the match table's winner and loser indexes, for the changed tournaments and players only,
+    rather than from the player_opponent view, whose UNION would read every tournament's matches.
+*/
+CREATE FUNCTION refresh_player_standing_opponent_points(changed_tournament_ids INT[], changed_player_ids INT[]) RETURNS VOID AS $$
+    WITH changed AS (
+        SELECT DISTINCT
+            c.tournament_id,
+            c.player_id
+        FROM
+            unnest(changed_tournament_ids, changed_player_ids) AS c(tournament_id, player_id)
+    ), affected AS (
+        SELECT
+            c.tournament_id,
+            c.player_id
+        FROM
+            changed c
+        UNION
+        SELECT
+            m.tournament_id,
+            m.loser_player_id AS player_id
+        FROM
+            changed c
+            INNER JOIN match m ON m.tournament_id = c.tournament_id AND m.winner_player_id = c.player_id
+        WHERE
+            m.tournament_id = ANY(changed_tournament_ids)
+        UNION
+        SELECT
+            m.tournament_id,
+            m.winner_player_id AS player_id
+        FROM
+            changed c
+            INNER JOIN match m ON m.tournament_id = c.tournament_id AND m.loser_player_id = c.player_id
+        WHERE
+            m.tournament_id = ANY(changed_tournament_ids)
+    )
+    UPDATE player_standing ps
+    SET
+        opponent_points = COALESCE(
+            (SELECT
+                SUM(ops.points)
+            FROM
+                player_standing ops
+            WHERE
+                ops.tournament_id = ps.tournament_id
+                AND ops.player_id IN
+                    (SELECT
+                        m.loser_player_id
+                    FROM
+                        match m
+                    WHERE
+                        m.tournament_id = ps.tournament_id
+                        AND m.winner_player_id = ps.player_id
+                    UNION
+                    SELECT
+                        m.winner_player_id
+                    FROM
+                        match m
+                    WHERE
+                        m.tournament_id = ps.tournament_id
+                        AND m.loser_player_id = ps.player_id)), 0.0)
+    FROM
+        affected a
+    WHERE
+        ps.tournament_id = a.tournament_id
+        AND ps.player_id = a.player_id;
+$$ LANGUAGE SQL;
+
+-- Applies inserted (or reverts deleted) match results to the players' records, points and opponent match points
+CREATE FUNCTION player_standing_match_change() RETURNS TRIGGER AS $$
+DECLARE
+    direction INT := CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END;
+    changed_tournament_ids INT[];
+    changed_player_ids INT[];
+BEGIN
+    UPDATE player_standing ps
+    SET
+        wins = ps.wins + direction * r.wins,
+        losses = ps.losses + direction * r.losses,
+        ties = ps.ties + direction * r.ties,
+        points = ps.points + direction * (r.wins + r.ties * .5)
+    FROM
+        (SELECT
+            mp.tournament_id,
+            mp.player_id,
+            SUM(mp.wins) AS wins,
+            SUM(mp.losses) AS losses,
+            SUM(mp.ties) AS ties
+        FROM
+            (SELECT
+                cm.tournament_id,
+                cm.winner_player_id AS player_id,
+                CASE WHEN cm.tie_flag THEN 0 ELSE 1 END AS wins,
+                0 AS losses,
+                CASE WHEN cm.tie_flag THEN 1 ELSE 0 END AS ties
+            FROM
+                changed_match cm
+            UNION ALL
+            SELECT
+                cm.tournament_id,
+                cm.loser_player_id AS player_id,
+                0 AS wins,
+                CASE WHEN cm.tie_flag THEN 0 ELSE 1 END AS losses,
+                CASE WHEN cm.tie_flag THEN 1 ELSE 0 END AS ties
+            FROM
+                changed_match cm) mp
+        GROUP BY
+            mp.tournament_id,
+            mp.player_id) r
+    WHERE
+        ps.tournament_id = r.tournament_id
+        AND ps.player_id = r.player_id;
+
+    SELECT
+        array_agg(cp.tournament_id),
+        array_agg(cp.player_id)
+    INTO
+        changed_tournament_ids,
+        changed_player_ids
+    FROM
+        (SELECT cm.tournament_id, cm.winner_player_id AS player_id FROM changed_match cm
+        UNION
+        SELECT cm.tournament_id, cm.loser_player_id AS player_id FROM changed_match cm) cp;
+
+    PERFORM refresh_player_standing_opponent_points(changed_tournament_ids, changed_player_ids);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER player_standing_match_insert AFTER INSERT ON match
+    REFERENCING NEW TABLE AS changed_match
+    FOR EACH STATEMENT EXECUTE PROCEDURE player_standing_match_change();
+
+CREATE TRIGGER player_standing_match_delete AFTER DELETE ON match
+    REFERENCING OLD TABLE AS changed_match
+    FOR EACH STATEMENT EXECUTE PROCEDURE player_standing_match_change();
+
+-- A bye round is an automatic win
+CREATE FUNCTION player_standing_bye_change() RETURNS TRIGGER AS $$
+DECLARE
+    direction INT := CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END;
+    changed_tournament_ids INT[];
+    changed_player_ids INT[];
+BEGIN
+    UPDATE player_standing ps
+    SET
+        wins = ps.wins + direction * r.byes,
+        points = ps.points + direction * r.byes
+    FROM
+        (SELECT
+            cb.tournament_id,
+            cb.player_id,
+            COUNT(1) AS byes
+        FROM
+            changed_bye cb
+        GROUP BY
+            cb.tournament_id,
+            cb.player_id) r
+    WHERE
+        ps.tournament_id = r.tournament_id
+        AND ps.player_id = r.player_id;
+
+    SELECT
+        array_agg(cb.tournament_id),
+        array_agg(cb.player_id)
+    INTO
+        changed_tournament_ids,
+        changed_player_ids
+    FROM
+        changed_bye cb;
+
+    PERFORM refresh_player_standing_opponent_points(changed_tournament_ids, changed_player_ids);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER player_standing_bye_insert AFTER INSERT ON tournament_round_bye_player
+    REFERENCING NEW TABLE AS changed_bye
+    FOR EACH STATEMENT EXECUTE PROCEDURE player_standing_bye_change();
+
+CREATE TRIGGER player_standing_bye_delete AFTER DELETE ON tournament_round_bye_player
+    REFERENCING OLD TABLE AS changed_bye
+    FOR EACH STATEMENT EXECUTE PROCEDURE player_standing_bye_change();
+
 /*
-    Returns tournament players' current records (wins, losses, ties) for use in the current_standings 
-    view
+    Registered players get a standing (with any results they already have). Players whose registration is
+    deleted lose it, and no longer count towards their opponents' opponent match points.
 */
+CREATE FUNCTION player_standing_register_change() RETURNS TRIGGER AS $$
+DECLARE
+    changed_tournament_ids INT[];
+    changed_player_ids INT[];
+BEGIN
+    SELECT
+        array_agg(cr.tournament_id),
+        array_agg(cr.player_id)
+    INTO
+        changed_tournament_ids,
+        changed_player_ids
+    FROM
+        (SELECT DISTINCT r.tournament_id, r.player_id FROM changed_register r) cr;
+
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO player_standing (tournament_id, player_id)
+        SELECT
+            c.tournament_id,
+            c.player_id
+        FROM
+            unnest(changed_tournament_ids, changed_player_ids) AS c(tournament_id, player_id)
+        ON CONFLICT DO NOTHING;
+
+        PERFORM rebuild_player_standing_records(changed_tournament_ids, changed_player_ids);
+    ELSE
+        DELETE FROM player_standing ps
+        USING
+            unnest(changed_tournament_ids, changed_player_ids) AS c(tournament_id, player_id)
+        WHERE
+            ps.tournament_id = c.tournament_id
+            AND ps.player_id = c.player_id
+            AND NOT EXISTS (SELECT 1 FROM tournament_register tr WHERE tr.tournament_id = c.tournament_id AND tr.player_id = c.player_id);
+    END IF;
+
+    PERFORM refresh_player_standing_opponent_points(changed_tournament_ids, changed_player_ids);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER player_standing_register_insert AFTER INSERT ON tournament_register
+    REFERENCING NEW TABLE AS changed_register
+    FOR EACH STATEMENT EXECUTE PROCEDURE player_standing_register_change();
+
+CREATE TRIGGER player_standing_register_delete AFTER DELETE ON tournament_register
+    REFERENCING OLD TABLE AS changed_register
+    FOR EACH STATEMENT EXECUTE PROCEDURE player_standing_register_change();
+
+-- Returns tournament players' current records (wins, losses, ties)
 CREATE VIEW current_records AS
 SELECT
-    tr.tournament_id,
-    tr.player_id,
-    COALESCE(
-        (SELECT 
-            COUNT(1) 
-        FROM 
-            match m 
-        WHERE 
-            m.tournament_id = tr.tournament_id
-            AND m.winner_player_id = tr.player_id
-            AND m.tie_flag = false)
-    , 0) + COALESCE(
-        (SELECT 1
-            FROM tournament_round_bye_player tb
-        WHERE 
-            tb.tournament_id = tr.tournament_id
-            AND tb.player_id = tr.player_id), 0) AS wins,
-    COALESCE(
-        (SELECT 
-            COUNT(1) 
-        FROM 
-            match m 
-        WHERE 
-            m.tournament_id = tr.tournament_id
-            AND m.loser_player_id = tr.player_id
-            AND m.tie_flag = false),0) AS losses,
-    COALESCE(
-        (SELECT 
-            COUNT(1) 
-        FROM 
-            match m 
-        WHERE 
-            m.tournament_id = tr.tournament_id
-            AND (m.winner_player_id = tr.player_id
-            OR m.loser_player_id = tr.player_id)
-            AND m.tie_flag = true),0) AS ties
+    ps.tournament_id,
+    ps.player_id,
+    ps.wins,
+    ps.losses,
+    ps.ties
 FROM
-    tournament_register tr
-ORDER BY
-    tr.tournament_id;
+    player_standing ps;
 
 /*
-    Returns tournament players' current standings. Caculates players' points (wins + ties * 0.5) and 
-    opponent match points (wins + ties * 0.5 for each previously played player). player_rank differs
+    Returns tournament players' current standings, ranked from their player_standing points (wins + ties * 0.5)
+    and opponent match points (wins + ties * 0.5 for each previously played player). player_rank differs
     from actual_player_rank in that player_rank ensures each player always has a predictable unique ranking
     in each tournament round whereas actual_player_rank respresents players' actual rank in each tournament 
     round. The former is used for match combinations. The latter is used for the actual players' standings
 */
 CREATE VIEW current_standings AS
 SELECT
-    a.tournament_id,
-    a.tournament_name,
-    ROW_NUMBER() OVER (PARTITION BY a.tournament_id ORDER BY a.points DESC, a.opponent_points DESC, a.player_id) AS player_rank,
-    RANK() OVER (PARTITION BY a.tournament_id ORDER BY a.points DESC, a.opponent_points DESC) AS actual_player_rank,
-    a.player_id,
-    a.player_name,
-    a.wins,
-    a.losses,
-    a.ties,
-    a.points,
-    a.opponent_points
+    ps.tournament_id,
+    t.name AS tournament_name,
+    ROW_NUMBER() OVER (PARTITION BY ps.tournament_id ORDER BY ps.points DESC, ps.opponent_points DESC, ps.player_id) AS player_rank,
+    RANK() OVER (PARTITION BY ps.tournament_id ORDER BY ps.points DESC, ps.opponent_points DESC) AS actual_player_rank,
+    ps.player_id,
+    p.name AS player_name,
+    ps.wins,
+    ps.losses,
+    ps.ties,
+    ps.points,
+    ps.opponent_points
 FROM
-    (SELECT
-        cr.tournament_id,
-        t.name AS tournament_name,
-        cr.player_id,
-        p.name AS player_name,
-        cr.wins,
-        cr.losses,
-        cr.ties,
-        (cr.wins + cr.ties * .5) AS points,
-        COALESCE(
-            (SELECT 
-                SUM(cr2.wins + cr2.ties * .5) 
-            FROM 
-                current_records cr2 
-            WHERE 
-                cr2.player_id IN
-                    (SELECT DISTINCT 
-                        m.winner_player_id 
-                    FROM 
-                        match m 
-                    WHERE 
-                        m.loser_player_id = cr.player_id
-                        AND m.tournament_id = cr.tournament_id
-                    UNION 
-                    SELECT DISTINCT 
-                        m.loser_player_id 
-                    FROM 
-                        match m 
-                    WHERE 
-                        m.winner_player_id = cr.player_id
-                        AND m.tournament_id = cr.tournament_id)),0.0) AS opponent_points
-    FROM
-        current_records cr
-        INNER JOIN tournament t ON t.id = cr.tournament_id
-        INNER JOIN player p ON p.id = cr.player_id) a
+    player_standing ps
+    INNER JOIN tournament t ON t.id = ps.tournament_id
+    INNER JOIN player p ON p.id = ps.player_id
 ORDER BY
-    a.tournament_id,
+    ps.tournament_id,
     player_rank;
 
 -- Returns tournaments' top ranked players who have not yet had a bye round during a tournament simulation
@@ -205,4 +508,22 @@ ORDER BY
     cs.tournament_id,
     cs.player_rank;
 
-
+-- Returns tournament rounds' match results for use in round outputs
+CREATE VIEW match_results AS
+SELECT
+    m.tournament_id,
+    m.round_nbr,
+    m.match_nbr,
+    m.winner_player_id,
+    wp.name AS winner_player_name,
+    m.loser_player_id,
+    lp.name AS loser_player_name,
+    m.tie_flag
+FROM
+    match m
+    INNER JOIN player wp ON wp.id = m.winner_player_id
+    INNER JOIN player lp ON lp.id = m.loser_player_id
+ORDER BY
+    m.tournament_id,
+    m.round_nbr,
+    m.match_nbr;
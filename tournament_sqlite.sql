@@ -0,0 +1,229 @@
+/*
+    Tournament schema of the SQLite storage backend, created by SqliteOperations when it connects. Ported from
+    tournament.sql: the views return the same rows, but standings are aggregated from the tournament's matches
+    when they are read, as SQLite has no statement triggers with transition tables to maintain player_standing.
+    Needs SQLite 3.25 or later for window functions.
+*/
+
+CREATE TABLE IF NOT EXISTS player (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS tournament (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT
+);
+
+-- Ensures players can register for multiple tournaments, but only once for each tournament
+CREATE TABLE IF NOT EXISTS tournament_register (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INT REFERENCES tournament(id),
+    player_id INT REFERENCES player(id),
+    CONSTRAINT tournament_register_tournament_player_key UNIQUE (tournament_id, player_id)
+);
+
+/*
+    If tie_flag is true - the match ended in a tie - winner_player_id and loser_player_id do not hold
+    the actual winning and losing player Ids
+*/
+CREATE TABLE IF NOT EXISTS match (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INT NOT NULL REFERENCES tournament(id),
+    round_nbr INT NOT NULL,
+    match_nbr INT NOT NULL,
+    winner_player_id INT REFERENCES player(id),
+    loser_player_id INT REFERENCES player(id),
+    tie_flag BOOLEAN NOT NULL,
+    CONSTRAINT match_tournament_round_match_key UNIQUE (tournament_id, round_nbr, match_nbr)
+);
+
+CREATE INDEX IF NOT EXISTS match_winner_idx ON match (tournament_id, winner_player_id, loser_player_id);
+CREATE INDEX IF NOT EXISTS match_loser_idx ON match (tournament_id, loser_player_id, winner_player_id);
+
+-- Stores tournament rounds' bye players for historical review
+CREATE TABLE IF NOT EXISTS tournament_round_bye_player (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INT REFERENCES tournament(id),
+    round_nbr INT NOT NULL,
+    player_rank INT NULL,
+    player_id INT REFERENCES player(id),
+    CONSTRAINT tournament_round_bye_player_tournament_round_key UNIQUE (tournament_id, round_nbr)
+);
+
+CREATE INDEX IF NOT EXISTS tournament_round_bye_player_player_idx ON tournament_round_bye_player (tournament_id, player_id);
+
+/*
+    Stores tournament rounds' historical standings for review, as keyframes: every player's standing after
+    every tenth round (see storage.py)
+*/
+CREATE TABLE IF NOT EXISTS historical_standing (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INT NOT NULL REFERENCES tournament(id),
+    round_nbr INT NOT NULL,
+    player_rank INT NOT NULL,
+    actual_player_rank INT NOT NULL,
+    player_id INT REFERENCES player(id),
+    wins INT NOT NULL,
+    losses INT NOT NULL,
+    ties INT NOT NULL,
+    points REAL NOT NULL,
+    opponent_points REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS historical_standing_round_idx ON historical_standing (tournament_id, round_nbr, player_rank);
+
+-- Returns tournament players' information for use in match outputs
+CREATE VIEW IF NOT EXISTS tournament_player_info AS
+SELECT
+    tr.tournament_id,
+    p.id AS player_id,
+    p.name AS player_name
+FROM
+    tournament_register tr
+    INNER JOIN player p ON tr.player_id = p.id;
+
+-- Returns tournament players' distinct previously played opponents
+CREATE VIEW IF NOT EXISTS player_opponent AS
+SELECT
+    m.tournament_id,
+    m.winner_player_id AS player_id,
+    m.loser_player_id AS opponent_player_id
+FROM
+    match m
+UNION
+SELECT
+    m.tournament_id,
+    m.loser_player_id AS player_id,
+    m.winner_player_id AS opponent_player_id
+FROM
+    match m;
+
+-- Returns tournament players' current records (wins, losses, ties). A bye round is an automatic win.
+CREATE VIEW IF NOT EXISTS current_records AS
+SELECT
+    tr.tournament_id,
+    tr.player_id,
+    (SELECT
+        COUNT(1)
+    FROM
+        match m
+    WHERE
+        m.tournament_id = tr.tournament_id
+        AND m.winner_player_id = tr.player_id
+        AND m.tie_flag = 0)
+    + (SELECT
+        COUNT(1)
+    FROM
+        tournament_round_bye_player tb
+    WHERE
+        tb.tournament_id = tr.tournament_id
+        AND tb.player_id = tr.player_id) AS wins,
+    (SELECT
+        COUNT(1)
+    FROM
+        match m
+    WHERE
+        m.tournament_id = tr.tournament_id
+        AND m.loser_player_id = tr.player_id
+        AND m.tie_flag = 0) AS losses,
+    (SELECT
+        COUNT(1)
+    FROM
+        match m
+    WHERE
+        m.tournament_id = tr.tournament_id
+        AND (m.winner_player_id = tr.player_id
+        OR m.loser_player_id = tr.player_id)
+        AND m.tie_flag = 1) AS ties
+FROM
+    tournament_register tr;
+
+-- Returns tournament players' current records and points (wins + ties * 0.5)
+CREATE VIEW IF NOT EXISTS current_points AS
+SELECT
+    cr.tournament_id,
+    cr.player_id,
+    cr.wins,
+    cr.losses,
+    cr.ties,
+    cr.wins + cr.ties * 0.5 AS points
+FROM
+    current_records cr;
+
+/*
+    Returns tournament players' current standings, ranked from their points and opponent match points (the
+    sum of the points of each distinct previously played player), like tournament.sql's current_standings
+*/
+CREATE VIEW IF NOT EXISTS current_standings AS
+SELECT
+    ps.tournament_id,
+    t.name AS tournament_name,
+    ROW_NUMBER() OVER (PARTITION BY ps.tournament_id ORDER BY ps.points DESC, ps.opponent_points DESC, ps.player_id) AS player_rank,
+    RANK() OVER (PARTITION BY ps.tournament_id ORDER BY ps.points DESC, ps.opponent_points DESC) AS actual_player_rank,
+    ps.player_id,
+    p.name AS player_name,
+    ps.wins,
+    ps.losses,
+    ps.ties,
+    ps.points,
+    ps.opponent_points
+FROM
+    (SELECT
+        cp.tournament_id,
+        cp.player_id,
+        cp.wins,
+        cp.losses,
+        cp.ties,
+        cp.points,
+        COALESCE(
+            (SELECT
+                SUM(ocp.points)
+            FROM
+                player_opponent po
+                INNER JOIN current_points ocp ON ocp.tournament_id = po.tournament_id AND ocp.player_id = po.opponent_player_id
+            WHERE
+                po.tournament_id = cp.tournament_id
+                AND po.player_id = cp.player_id), 0.0) AS opponent_points
+    FROM
+        current_points cp) ps
+    INNER JOIN tournament t ON t.id = ps.tournament_id
+    INNER JOIN player p ON p.id = ps.player_id
+ORDER BY
+    ps.tournament_id,
+    player_rank;
+
+-- Returns tournaments' top ranked players who have not yet had a bye round during a tournament simulation
+CREATE VIEW IF NOT EXISTS tournament_top_player_with_no_bye_round AS
+SELECT
+    cs.tournament_id,
+    cs.player_rank,
+    cs.player_id,
+    cs.player_name
+FROM
+    current_standings cs
+WHERE
+    NOT EXISTS (SELECT 1 FROM tournament_round_bye_player tb WHERE tb.tournament_id = cs.tournament_id AND tb.player_id = cs.player_id)
+ORDER BY
+    cs.tournament_id,
+    cs.player_rank;
+
+-- Returns tournament rounds' match results for use in round outputs
+CREATE VIEW IF NOT EXISTS match_results AS
+SELECT
+    m.tournament_id,
+    m.round_nbr,
+    m.match_nbr,
+    m.winner_player_id,
+    wp.name AS winner_player_name,
+    m.loser_player_id,
+    lp.name AS loser_player_name,
+    m.tie_flag
+FROM
+    match m
+    INNER JOIN player wp ON wp.id = m.winner_player_id
+    INNER JOIN player lp ON lp.id = m.loser_player_id
+ORDER BY
+    m.tournament_id,
+    m.round_nbr,
+    m.match_nbr;
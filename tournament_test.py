@@ -2,13 +2,39 @@
 #
 # Test cases for tournament.py
 
-import databaseoperations
+import StringIO
+import csv
+import itertools
+import json
+import os
+import pstats
+import random
+import shutil
+import tempfile
+import threading
+
+import asyncoperations
+import benchmark
+import instrumentation
+import storage
 import tournament
+import montecarlo
+import outcomes
+import outputsinks
 import round
+import pairing
+import playedpairs
+import playerregistry
+import standings
+import tiebreaks
+
+# The test cases run on the in-memory backend unless the TOURNAMENT_DB_BACKEND environment variable chooses
+# another (see storage.determineBackend), e.g. TOURNAMENT_DB_BACKEND=postgres
+os.environ.setdefault("TOURNAMENT_DB_BACKEND", storage.MEMORY)
 
 
 def testDeleteTournamentFromDb():
-    dbo = databaseoperations.DatabaseOperations()
+    dbo = storage.createStorageOperations()
     t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
     tournamentInfo = dbo.tournamentInfo(t.id)
     if not tournamentInfo:
@@ -22,200 +48,850 @@ def testDeleteTournamentFromDb():
 
 
 def testTournamentTotalPlayerCount():
-    dbo = databaseoperations.DatabaseOperations()
-    t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
-    t.calculateTotalPlayerCount()
-    if isinstance(t.totalPlayerCount, basestring):
-        raise TypeError("After registering a tournament, totalPlayerCount should be a numeric value, not a string")
-    if t.totalPlayerCount != 0:
-        raise ValueError("After registering a tournament, totalPlayerCount should be 0")
-    print "2. After registering a tournament, totalPlayerCount is 0"
-    t.deleteTournament()
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+        t.calculateTotalPlayerCount()
+        if isinstance(t.totalPlayerCount, basestring):
+            raise TypeError("After registering a tournament, totalPlayerCount should be a numeric value, not a string")
+        if t.totalPlayerCount != 0:
+            raise ValueError("After registering a tournament, totalPlayerCount should be 0")
+        print "2. After registering a tournament, totalPlayerCount is 0"
     dbo.closeDbConnection()
 
 
 def testTournamentRegisterPlayer():
-    dbo = databaseoperations.DatabaseOperations()
-    t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
-    playerId = dbo.registerPlayer("Markov Chaney")
-    t.registerPlayer(playerId)
-    if t.totalPlayerCount != 1:
-        raise ValueError("After registering a tournament and a player, totalPlayerCount should be 1")
-    print "3. After registering a tournament and a player, totalPlayerCount is 1"
-    t.deleteTournament()
-    dbo.deleteSpecificPlayers((playerId,))
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+        playerId = dbo.registerPlayer("Markov Chaney")
+        t.registerPlayer(playerId)
+        if t.totalPlayerCount != 1:
+            raise ValueError("After registering a tournament and a player, totalPlayerCount should be 1")
+        print "3. After registering a tournament and a player, totalPlayerCount is 1"
     dbo.closeDbConnection()
 
 
 def testTournamentRegisterAndDeletePlayers():
-    dbo = databaseoperations.DatabaseOperations()
-    t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
-    player1Id = dbo.registerPlayer("Markov Chaney")
-    t.registerPlayer(player1Id)
-    player2Id = dbo.registerPlayer("John Malik")
-    t.registerPlayer(player2Id)
-    player3Id = dbo.registerPlayer("Mao Tsu-hsi")
-    t.registerPlayer(player3Id)
-    player4Id = dbo.registerPlayer("Atlanta Hope")
-    t.registerPlayer(player4Id)
-    t.calculateTotalPlayerCount()
-    if t.totalPlayerCount != 4:
-        raise ValueError("After registering a tournament and four players, totalPlayerCount should be 4")
-    t.deleteRegisteredPlayers()
-    if t.totalPlayerCount != 0:
-            raise ValueError("After deleting all tournament players, totalPlayerCount should be 0")
-    print "4. Tournament players can be registered and deleted"
-    t.deleteTournament()
-    dbo.deleteSpecificPlayers((player1Id, player2Id, player3Id, player4Id))
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+        player1Id = dbo.registerPlayer("Markov Chaney")
+        t.registerPlayer(player1Id)
+        player2Id = dbo.registerPlayer("John Malik")
+        t.registerPlayer(player2Id)
+        player3Id = dbo.registerPlayer("Mao Tsu-hsi")
+        t.registerPlayer(player3Id)
+        player4Id = dbo.registerPlayer("Atlanta Hope")
+        t.registerPlayer(player4Id)
+        t.calculateTotalPlayerCount()
+        if t.totalPlayerCount != 4:
+            raise ValueError("After registering a tournament and four players, totalPlayerCount should be 4")
+        t.deleteRegisteredPlayers()
+        if t.totalPlayerCount != 0:
+                raise ValueError("After deleting all tournament players, totalPlayerCount should be 0")
+        print "4. Tournament players can be registered and deleted"
     dbo.closeDbConnection()
 
 
 def testTournamentStandingsBeforeFirstRound():
-    dbo = databaseoperations.DatabaseOperations()
-    t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
-    player1Id = dbo.registerPlayer("Melpomene Murray")
-    t.registerPlayer(player1Id)
-    player2Id = dbo.registerPlayer("Randy Schwartz")
-    t.registerPlayer(player2Id)
-    currentStandings = t.getCurrentStandingsFromDb()
-    if len(currentStandings) < 2:
-        raise ValueError("Players should appear in tournament standings even before they have played any matches")
-    elif len(currentStandings) > 2:
-        raise ValueError("Only players registered for tournament should appear in the standings")
-    if len(currentStandings[0]) != 9:
-        raise ValueError("Each currentStandings row should have nine columns")
-
-    [(rank1, arank1, id1, name1, wins1, losses1, ties1, points1, omp1), (rank2, arank2, id2, name2, wins2, losses2, ties2, points2, omp2)] = currentStandings
-    if wins1 != 0 or losses1 != 0 or ties1 != 0 or wins2 != 0 or losses2 != 0 or ties2 != 0:
-        raise ValueError("Newly registered players should have 0 wins, losses, or ties")
-    if set([name1, name2]) != set(["Randy Schwartz", "Melpomene Murray"]):
-        raise ValueError("Registered tournament players' names should appear in standings even if they have not played any matches")
-    print "5. Newly registered tournament players appear in standings even if they have not played any matches"
-    t.deleteTournament()
-    dbo.deleteSpecificPlayers((player1Id, player2Id))
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+        player1Id = dbo.registerPlayer("Melpomene Murray")
+        t.registerPlayer(player1Id)
+        player2Id = dbo.registerPlayer("Randy Schwartz")
+        t.registerPlayer(player2Id)
+        currentStandings = t.getCurrentStandingsFromDb()
+        if len(currentStandings) < 2:
+            raise ValueError("Players should appear in tournament standings even before they have played any matches")
+        elif len(currentStandings) > 2:
+            raise ValueError("Only players registered for tournament should appear in the standings")
+        if len(currentStandings[0]) != 9:
+            raise ValueError("Each currentStandings row should have nine columns")
+
+        [(rank1, arank1, id1, name1, wins1, losses1, ties1, points1, omp1), (rank2, arank2, id2, name2, wins2, losses2, ties2, points2, omp2)] = currentStandings
+        if wins1 != 0 or losses1 != 0 or ties1 != 0 or wins2 != 0 or losses2 != 0 or ties2 != 0:
+            raise ValueError("Newly registered players should have 0 wins, losses, or ties")
+        if set([name1, name2]) != set(["Randy Schwartz", "Melpomene Murray"]):
+            raise ValueError("Registered tournament players' names should appear in standings even if they have not played any matches")
+        print "5. Newly registered tournament players appear in standings even if they have not played any matches"
     dbo.closeDbConnection()
 
 
 def testTournamentStandingsAfterOneRound():
-    dbo = databaseoperations.DatabaseOperations()
-    t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
-    player1Id = dbo.registerPlayer("Bruno Walton")
-    t.registerPlayer(player1Id)
-    player2Id = dbo.registerPlayer("Boots O'Neal")
-    t.registerPlayer(player2Id)
-    player3Id = dbo.registerPlayer("Cathy Burton")
-    t.registerPlayer(player3Id)
-    player4Id = dbo.registerPlayer("Diane Grant")
-    t.registerPlayer(player4Id)
-
-    t.players = t.getTournamentPlayerInfoFromDb()
-    t.totalPlayerCount = t.calculateTotalPlayerCount()
-    t.totalPlayerCountOdd = t.determineTotalPlayerCountOdd()
-    t.possiblePlayerMatchCombinations = t.determineInitialPossiblePlayerMatchCombinations()
-    t.totalRoundCount = t.calculateTotalRoundCount()
-
-    t.currentRoundNbr = 1
-    rnd = round.Round(t.dbo, t.id, t.currentRoundNbr)
-
-    t.simulateFirstRound(rnd)
-
-    rnd.simulateMatches(t.players, t.previousRoundsPlayedMatches)
-    t.addRoundToTournament(rnd)
-
-    currentStandings = t.getCurrentStandingsFromDb()
-
-    total_wins = 0
-    total_ties = 0
-    total_losses = 0
-    for (player_rank, actual_player_rank, player_id, player_name, wins, losses, ties, points, omp) in currentStandings:
-        if (wins + losses + ties) != 1:
-            raise ValueError("Each player should have 1 win, loss, or tie recorded after one tournament round")
-        if wins == 1 and (losses >= 1 or ties >= 1):
-            raise ValueError("Each match winner should have 1 win and 0 losses and ties recorded after one tournament round")
-        elif losses == 1 and (wins >= 1 or ties >= 1):
-            raise ValueError("Each match loser should have 1 loss and 0 wins and ties recorded after one tournament round")
-        elif ties == 1 and (wins >= 1 or losses >= 1):
-            raise ValueError("Each player who tied in a match should have 1 tie and 0 wins and losses recorded after one tournament round")
-
-        total_wins += wins
-        total_losses += losses
-        total_ties += ties
-
-    if total_wins > 2:
-        raise ValueError("Total player wins should not exceed 2 after one tournament round")
-    if total_losses > 2:
-        raise ValueError("Total player losses should not exceed 2 after one tournament round")
-    if total_wins == 1 and total_losses == 1 and total_ties != 2:
-        raise ValueError("Total player ties should be 2 after one tournament round if only two players tied")
-    if total_wins == 0 and total_losses == 0 and total_ties != 4:
-        raise ValueError("Total player ties should be 4 after one tournament round if only all players tied")
-
-    print "6. After one tournament round, the tournament standings are correct"
-    t.deleteTournament()
-    dbo.deleteSpecificPlayers((player1Id, player2Id, player3Id, player4Id))
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+        player1Id = dbo.registerPlayer("Bruno Walton")
+        t.registerPlayer(player1Id)
+        player2Id = dbo.registerPlayer("Boots O'Neal")
+        t.registerPlayer(player2Id)
+        player3Id = dbo.registerPlayer("Cathy Burton")
+        t.registerPlayer(player3Id)
+        player4Id = dbo.registerPlayer("Diane Grant")
+        t.registerPlayer(player4Id)
+
+        t.players = t.getTournamentPlayerInfoFromDb()
+        t.totalPlayerCount = t.calculateTotalPlayerCount()
+        t.totalPlayerCountOdd = t.determineTotalPlayerCountOdd()
+        t.possiblePlayerMatchCombinations = t.determineInitialPossiblePlayerMatchCombinations()
+        t.totalRoundCount = t.calculateTotalRoundCount()
+
+        t.currentRoundNbr = 1
+        rnd = round.Round(t.dbo, t.id, t.currentRoundNbr)
+
+        t.simulateFirstRound(rnd)
+
+        rnd.simulateMatches(t.players, t.previousRoundsPlayedMatches)
+        t.addRoundToTournament(rnd)
+
+        currentStandings = t.getCurrentStandingsFromDb()
+
+        total_wins = 0
+        total_ties = 0
+        total_losses = 0
+        for (player_rank, actual_player_rank, player_id, player_name, wins, losses, ties, points, omp) in currentStandings:
+            if (wins + losses + ties) != 1:
+                raise ValueError("Each player should have 1 win, loss, or tie recorded after one tournament round")
+            if wins == 1 and (losses >= 1 or ties >= 1):
+                raise ValueError("Each match winner should have 1 win and 0 losses and ties recorded after one tournament round")
+            elif losses == 1 and (wins >= 1 or ties >= 1):
+                raise ValueError("Each match loser should have 1 loss and 0 wins and ties recorded after one tournament round")
+            elif ties == 1 and (wins >= 1 or losses >= 1):
+                raise ValueError("Each player who tied in a match should have 1 tie and 0 wins and losses recorded after one tournament round")
+
+            total_wins += wins
+            total_losses += losses
+            total_ties += ties
+
+        if total_wins > 2:
+            raise ValueError("Total player wins should not exceed 2 after one tournament round")
+        if total_losses > 2:
+            raise ValueError("Total player losses should not exceed 2 after one tournament round")
+        if total_wins == 1 and total_losses == 1 and total_ties != 2:
+            raise ValueError("Total player ties should be 2 after one tournament round if only two players tied")
+        if total_wins == 0 and total_losses == 0 and total_ties != 4:
+            raise ValueError("Total player ties should be 4 after one tournament round if only all players tied")
+
+        print "6. After one tournament round, the tournament standings are correct"
     dbo.closeDbConnection()
 
 
 def testBestPlayerMatchCombinationAfterOneRound():
-    dbo = databaseoperations.DatabaseOperations()
-    t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
-    player1Id = dbo.registerPlayer("John Conner")
-    t.registerPlayer(player1Id)
-    player2Id = dbo.registerPlayer("Patrick Bateman")
-    t.registerPlayer(player2Id)
-    player3Id = dbo.registerPlayer("Don Draper")
-    t.registerPlayer(player3Id)
-    player4Id = dbo.registerPlayer("Louis CK")
-    t.registerPlayer(player4Id)
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+        player1Id = dbo.registerPlayer("John Conner")
+        t.registerPlayer(player1Id)
+        player2Id = dbo.registerPlayer("Patrick Bateman")
+        t.registerPlayer(player2Id)
+        player3Id = dbo.registerPlayer("Don Draper")
+        t.registerPlayer(player3Id)
+        player4Id = dbo.registerPlayer("Louis CK")
+        t.registerPlayer(player4Id)
 
-    t.players = t.getTournamentPlayerInfoFromDb()
-    t.totalPlayerCount = t.calculateTotalPlayerCount()
-    t.totalPlayerCountOdd = t.determineTotalPlayerCountOdd()
-    t.possiblePlayerMatchCombinations = t.determineInitialPossiblePlayerMatchCombinations()
-    t.totalRoundCount = t.calculateTotalRoundCount()
+        t.players = t.getTournamentPlayerInfoFromDb()
+        t.totalPlayerCount = t.calculateTotalPlayerCount()
+        t.totalPlayerCountOdd = t.determineTotalPlayerCountOdd()
+        t.possiblePlayerMatchCombinations = t.determineInitialPossiblePlayerMatchCombinations()
+        t.totalRoundCount = t.calculateTotalRoundCount()
 
-    t.currentRoundNbr = 1
-    rndOne = round.Round(t.dbo, t.id, t.currentRoundNbr)
+        t.currentRoundNbr = 1
+        rndOne = round.Round(t.dbo, t.id, t.currentRoundNbr)
 
-    t.simulateFirstRound(rndOne)
+        t.simulateFirstRound(rndOne)
 
-    rndOne.simulateMatches(t.players, t.previousRoundsPlayedMatches)
-    t.addRoundToTournament(rndOne)
+        rndOne.simulateMatches(t.players, t.previousRoundsPlayedMatches)
+        t.addRoundToTournament(rndOne)
 
-    t.currentStandings = t.getCurrentStandingsFromDb()
+        t.currentStandings = t.getCurrentStandingsFromDb()
 
-    rndOneStandings = t.currentStandings
+        rndOneStandings = t.currentStandings
 
-    rndOneRank1PlayerId = rndOneStandings[0][2]
-    rndOneRank2PlayerId = rndOneStandings[1][2]
-    rndOneRank3PlayerId = rndOneStandings[2][2]
-    rndOneRank4PlayerId = rndOneStandings[3][2]
+        rndOneRank1PlayerId = rndOneStandings[0][2]
+        rndOneRank2PlayerId = rndOneStandings[1][2]
+        rndOneRank3PlayerId = rndOneStandings[2][2]
+        rndOneRank4PlayerId = rndOneStandings[3][2]
 
-    t.currentRoundNbr += 1
+        t.currentRoundNbr += 1
 
-    rndTwo = round.Round(t.dbo, t.id, t.currentRoundNbr)
-    t.simulateSecondOrGreaterRound(rndTwo)
+        rndTwo = round.Round(t.dbo, t.id, t.currentRoundNbr)
+        t.simulateSecondOrGreaterRound(rndTwo)
 
-    rndTwoTournamentPreviousRoundsPlayedMatches = rndTwo.tournamentPreviousRoundsPlayedMatches
+        rndTwoTournamentPreviousRoundsPlayedMatches = rndTwo.tournamentPreviousRoundsPlayedMatches
 
-    rndTwoPlayerMatchCombination = rndTwo.playerMatchCombination
+        rndTwoPlayerMatchCombination = rndTwo.playerMatchCombination
 
-    [(rndTwoMatch1player1Id, rndTwoMatch1player2Id), (rndTwoMatch2player1Id, rndTwoMatch2player2Id)] = rndTwoPlayerMatchCombination[:2]
+        [(rndTwoMatch1player1Id, rndTwoMatch1player2Id), (rndTwoMatch2player1Id, rndTwoMatch2player2Id)] = rndTwoPlayerMatchCombination[:2]
 
-    defaultRndTwoMatches = [set((rndOneRank1PlayerId, rndOneRank2PlayerId)), set((rndOneRank3PlayerId, rndOneRank4PlayerId))]
+        defaultRndTwoMatches = [set((rndOneRank1PlayerId, rndOneRank2PlayerId)), set((rndOneRank3PlayerId, rndOneRank4PlayerId))]
 
-    if any(set(rndTwoTournamentPreviousRoundsPlayedMatch) in defaultRndTwoMatches for rndTwoTournamentPreviousRoundsPlayedMatch in rndTwoTournamentPreviousRoundsPlayedMatches):
-        if rndTwoMatch1player1Id != rndOneRank1PlayerId or rndTwoMatch1player2Id != rndOneRank3PlayerId or rndTwoMatch2player1Id != rndOneRank2PlayerId or rndTwoMatch2player2Id != rndOneRank4PlayerId:
-            raise ValueError("If the first place player played the second place player in round one, in round two, the first place player should play the third place player, and the second place player should play the fourth place player")
-    else:
-        if rndTwoMatch1player1Id != rndOneRank1PlayerId or rndTwoMatch1player2Id != rndOneRank2PlayerId or rndTwoMatch2player1Id != rndOneRank3PlayerId or rndTwoMatch2player2Id != rndOneRank4PlayerId:
-            raise ValueError("If the first place player did not play the second place player in round one, in round two, the first place player should play the second place player, and the third place player should play the fourth place player")
+        if any(set(rndTwoTournamentPreviousRoundsPlayedMatch) in defaultRndTwoMatches for rndTwoTournamentPreviousRoundsPlayedMatch in rndTwoTournamentPreviousRoundsPlayedMatches):
+            if rndTwoMatch1player1Id != rndOneRank1PlayerId or rndTwoMatch1player2Id != rndOneRank3PlayerId or rndTwoMatch2player1Id != rndOneRank2PlayerId or rndTwoMatch2player2Id != rndOneRank4PlayerId:
+                raise ValueError("If the first place player played the second place player in round one, in round two, the first place player should play the third place player, and the second place player should play the fourth place player")
+        else:
+            if rndTwoMatch1player1Id != rndOneRank1PlayerId or rndTwoMatch1player2Id != rndOneRank2PlayerId or rndTwoMatch2player1Id != rndOneRank3PlayerId or rndTwoMatch2player2Id != rndOneRank4PlayerId:
+                raise ValueError("If the first place player did not play the second place player in round one, in round two, the first place player should play the second place player, and the third place player should play the fourth place player")
 
-    print "7. The match combinations for round two are correct"
-    t.deleteTournament()
-    dbo.deleteSpecificPlayers((player1Id, player2Id, player3Id, player4Id))
+        print "7. The match combinations for round two are correct"
+    dbo.closeDbConnection()
+
+
+def testBlossomPairerMatchesExhaustiveQuality():
+    standings = [(rank, rank, playerId, None) for rank, playerId in enumerate([14, 12, 11, 16, 13, 15], 1)]
+    playedMatches = playedpairs.PlayedPairs([(14, 12), (11, 16), (13, 15), (14, 11), (12, 13)])
+    ranks = dict((standing[2], standing[0]) for standing in standings)
+
+    exhaustiveQualities = []
+    for playerIds in itertools.permutations(ranks.keys()):
+        combination = [(playerIds[i], playerIds[i + 1]) for i in range(0, len(playerIds), 2)]
+        if any(playedMatches.played(match[0], match[1]) for match in combination):
+            continue
+        exhaustiveQualities.append(sum((ranks[match[0]] - ranks[match[1]]) ** 2 for match in combination))
+
+    for rankWindow in (None, 1):
+        blossomCombination = pairing.BlossomPairer(rankWindow).pairRound(standings, playedMatches)
+        if blossomCombination[-1] != min(exhaustiveQualities):
+            raise ValueError("The blossom pairer should choose a player match combination with the best possible quality")
+        if any(playedMatches.played(match[0], match[1]) for match in blossomCombination[:-1]):
+            raise ValueError("The blossom pairer should not choose previously played matches")
+
+    standings = [(rank, rank, playerId, None) for rank, playerId in enumerate(range(101, 141), 1)]
+    rng = random.Random(2)
+    playedMatches = playedpairs.PlayedPairs()
+    for roundNbr in range(6):
+        playerIds = range(101, 141)
+        rng.shuffle(playerIds)
+        for i in range(0, len(playerIds), 2):
+            playedMatches.registerPlayedMatch(playerIds[i], playerIds[i + 1])
+    if pairing.BlossomPairer(2).pairRound(standings, playedMatches)[-1] != pairing.BlossomPairer(None).pairRound(standings, playedMatches)[-1]:
+        raise ValueError("Pairs outside the blossom pairer's rank window should be added when they improve the pairing")
+
+    print "8. The blossom pairer chooses the best quality player match combination without rematches"
+
+def testScoreGroupPairerFloatsPlayersDown():
+    standings = [(rank, rank, playerId, None, None, None, None, points, None) for rank, (playerId, points) in enumerate([(21, 2), (22, 2), (23, 1), (24, 1), (25, 1), (26, 0)], 1)]
+
+    scoreGroupCombination = pairing.ScoreGroupPairer().pairRound(standings, playedpairs.PlayedPairs())
+    if scoreGroupCombination[:-1] != [(21, 22), (23, 24), (25, 26)]:
+        raise ValueError("The score group pairer should pair players inside their score group and float the lowest ranked player of an odd score group down")
+
+    scoreGroupCombination = pairing.ScoreGroupPairer().pairRound(standings, playedpairs.PlayedPairs([(22, 21)]))
+    if scoreGroupCombination[:-1] != [(21, 23), (22, 24), (25, 26)]:
+        raise ValueError("The score group pairer should float players down when their score group is blocked by a previously played match")
+
+    print "9. The score group pairer pairs players inside their score group and floats players down"
+
+
+def testBranchAndBoundPairerYieldsImprovingCombinations():
+    standings = [(rank, rank, playerId, None) for rank, playerId in enumerate([14, 12, 11, 16, 13, 15, 17, 18], 1)]
+    playedMatches = playedpairs.PlayedPairsBitMatrix([(14, 12), (11, 16), (13, 15), (17, 18), (14, 11)])
+
+    qualities = [combination[-1] for combination in pairing.BranchAndBoundPairer(None).generatePlayerMatchCombinations(standings, playedMatches)]
+    if not qualities or any(quality >= previousQuality for previousQuality, quality in zip(qualities, qualities[1:])):
+        raise ValueError("The branch-and-bound pairer should yield player match combinations with improving quality")
+    if qualities[-1] != pairing.BlossomPairer().pairRound(standings, playedMatches)[-1]:
+        raise ValueError("The branch-and-bound pairer should end with the best quality player match combination")
+
+    print "10. The branch-and-bound pairer yields improving player match combinations, ending with the best one"
+
+
+def testVectorizedQualityChoosesSamePlayerMatchCombination():
+    if round.numpy is None:
+        print "11. Skipped: NumPy is not installed"
+        return
+
+    players = [(playerId, "Player {0}".format(playerId)) for playerId in range(31, 38)]
+    standings = [(rank, rank, playerId, None) for rank, playerId in enumerate([33, 37, 31, 35, 32, 36, 34], 1)]
+    registry = playerregistry.PlayerRegistry(players)
+    registry.updateStandings(standings)
+
+    # Every combination pairs six of the seven players, like the combinations of a tournament with an odd
+    # number of players
+    combinations = sorted(set(tuple(sorted((min(playerIds[i], playerIds[i + 1]), max(playerIds[i], playerIds[i + 1])) for i in range(0, 6, 2))) for playerIds in itertools.permutations([player[0] for player in players], 6)))
+    combinations = [list(combination) for combination in combinations]
+
+    rnd = round.Round(None, None, 2)
+    rnd.setRoundByePlayer((1, 33, None))
+    rnd.setTournamentPreviousRoundsPlayedMatches(playedpairs.PlayedPairs([(37, 31), (35, 32), (36, 34), (31, 35)]))
+    rnd.setTournamentPreviousRoundStandings(standings)
+    rnd.setPlayerRegistry(registry)
+
+    rnd.setInitialRoundPossiblePlayerMatchCombinations(combinations)
+    rnd.filterOutRoundPossiblePlayerMatchCombinationsWithRoundByePlayer()
+    rnd.roundPossiblePlayerMatchCombinationIndices = [index for index in rnd.roundPossiblePlayerMatchCombinationIndices if not any(rnd.tournamentPreviousRoundsPlayedMatches.played(match[0], match[1]) for match in combinations[index])]
+    rnd.determineRoundPossiblePlayerMatchCombinationQuality()
+    pureCombination = rnd.determineBestRoundPossiblePlayerMatchCombination()
+    pureQuality = rnd.bestRoundPossiblePlayerMatchCombinationQuality
+
+    rnd.setInitialRoundPossiblePlayerMatchCombinationArray(round.encodePlayerMatchCombinations(combinations, registry))
+    vectorizedCombination = rnd.determineBestRoundPossiblePlayerMatchCombinationVectorized()
+    if vectorizedCombination is not pureCombination or rnd.bestRoundPossiblePlayerMatchCombinationQuality != pureQuality:
+        raise ValueError("The vectorized quality scoring should choose the same player match combination as the pure Python quality scoring")
+
+    # Small fields, down to the one player tournament whose only combination has no matches, are simulated
+    # with both quality scorings
+    for playerCount in (1, 5, 7):
+        rounds = []
+        for vectorized in (True, False):
+            dbo = storage.createStorageOperations(storage.MEMORY)
+            t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, pairingMethod=pairing.EXHAUSTIVE, quiet=True, seed=0)
+            t.registerPlayers([dbo.registerPlayer("Player {0}".format(playerNbr)) for playerNbr in range(1, playerCount + 1)])
+            numpyModule = round.numpy
+            if not vectorized:
+                round.numpy = None
+            try:
+                t.simulate()
+            finally:
+                round.numpy = numpyModule
+            rounds.append([(rnd.roundByePlayerId, [match.getMatchResult() for match in rnd.matches]) for rnd in t.rounds])
+        if len(rounds[0]) != t.totalRoundCount or rounds[0] != rounds[1]:
+            raise ValueError("The vectorized and pure Python quality scorings should simulate the same {0} player tournament".format(playerCount))
+
+    print "11. The vectorized quality scoring chooses the same player match combination as the pure Python quality scoring"
+
+
+def testRoundResultsRegisteredInOneBatch():
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+        t.registerPlayers(dbo.registerPlayers("Player {0}".format(playerNbr) for playerNbr in range(1, 514)))
+
+        t.players = t.getTournamentPlayerInfoFromDb()
+        t.totalPlayerCount = t.calculateTotalPlayerCount()
+        t.totalPlayerCountOdd = t.determineTotalPlayerCountOdd()
+        t.totalRoundCount = t.calculateTotalRoundCount()
+
+        # Each call of registerTournamentRoundResults is recorded with its number of match results
+        registeredMatchCounts = []
+        registerTournamentRoundResults = dbo.registerTournamentRoundResults
+        def recordTournamentRoundResults(tournamentId, roundNbr, matchResults, *arguments):
+            registeredMatchCounts.append(len(matchResults))
+            return registerTournamentRoundResults(tournamentId, roundNbr, matchResults, *arguments)
+        dbo.registerTournamentRoundResults = recordTournamentRoundResults
+
+        t.currentRoundNbr = 1
+        rnd = round.Round(t.dbo, t.id, t.currentRoundNbr)
+        t.simulateFirstRound(rnd)
+        registry = instrumentation.RegistrySink()
+        previousSink = instrumentation.setSink(registry)
+        try:
+            rnd.simulateMatches(t.players, t.previousRoundsPlayedMatches)
+        finally:
+            instrumentation.setSink(previousSink)
+
+        if registeredMatchCounts != [256]:
+            raise ValueError("A round's 256 match results should be registered in one batch")
+        # PostgreSQL's cursors time every statement: one insert for the matches and one for the bye player,
+        # inside the savepoint (and its release) of the round's transaction, nested in the test's transaction
+        queryTiming = registry.scrape()["timings"].get("database.query")
+        if storage.determineBackend() == storage.POSTGRES and (queryTiming is None or queryTiming["count"] != 4):
+            raise ValueError("A round's 256 match results should be registered with a single insert")
+        if len(dbo.tournamentRoundMatchResults(t.id, rnd.nbr)) != 256:
+            raise ValueError("After one tournament round with 513 players, 256 match results should be registered")
+        if dbo.tournamentRoundByePlayersThroughRound(t.id) != [(rnd.nbr, rnd.roundByePlayerId)]:
+            raise ValueError("The round's bye player should be registered with the round's match results")
+
+        print "12. A round's match results and bye player are registered in one batch"
+    dbo.closeDbConnection()
+
+
+def testRolledBackTransactionLeavesNoRows():
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+        try:
+            with dbo.transaction():
+                playerId = dbo.registerPlayer("Walter Sobchak")
+                t.registerPlayer(playerId)
+                raise RuntimeError("Roll back to the savepoint")
+        except RuntimeError:
+            pass
+        if not dbo.tournamentInfo(t.id):
+            raise ValueError("Rolling back a nested transaction should not roll back the enclosing transaction")
+        if dbo.tournamentTotalPlayerCount(t.id) != 0:
+            raise ValueError("Rolling back a nested transaction should roll back the player registered inside it")
+    if dbo.tournamentInfo(t.id):
+        raise ValueError("After rolling back the transaction, information about the tournament should not be in the database")
+    print "13. A rolled back transaction leaves no rows behind, and a nested transaction rolls back to its savepoint"
+    dbo.closeDbConnection()
+
+
+def testThreadsShareConnectionPool():
+    if storage.determineBackend() != storage.POSTGRES:
+        print "14. Skipped: connection pools are used by the PostgreSQL storage backend only"
+        return
+
+    import databaseoperations
+    connectionPool = databaseoperations.ConnectionPool(maxConnections=2)
+    dbo = databaseoperations.DatabaseOperations(connectionPool=connectionPool)
+    if not connectionPool.healthy():
+        raise ValueError("A newly created connection pool should be healthy")
+    errors = []
+
+    # Each thread's transaction is its own, and sees only its own tournament's players
+    def registerTournamentPlayers():
+        try:
+            with dbo.transaction(rollback=True):
+                t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+                t.registerPlayers([dbo.registerPlayer("Jeffrey Lebowski"), dbo.registerPlayer("Bunny Lebowski")])
+                if dbo.tournamentTotalPlayerCount(t.id) != 2:
+                    errors.append("Each thread's tournament should have the two players registered by the thread")
+        except Exception as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=registerTournamentPlayers) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise ValueError(errors[0])
+
+    dbo.closeDbConnection()
+    if not connectionPool.healthy():
+        raise ValueError("Closing a DatabaseOperations should not close the connection pool it was given")
+    print "14. Threads can share a bounded connection pool, each with its own transaction"
+    connectionPool.close()
+
+
+def testStandingsEngineRanksLikeCurrentStandings():
+    standingsEngine = standings.StandingsEngine([(41, "Ellen Ripley"), (42, "Dwayne Hicks"), (43, "Rebecca Jorden"), (44, "Carter Burke"), (45, "Bishop")])
+    standingsEngine.registerMatchResult(41, 42)
+    standingsEngine.registerMatchResult(43, 44, True)
+    standingsEngine.registerByePlayer(45)
+    standingsEngine.registerMatchResult(45, 41)
+    standingsEngine.registerMatchResult(42, 43)
+
+    # 45: 2 points, beat 41 (1 point). 41, 42: 1 point, with OMP 3 (42 + 45) and 1.5 (41 + 43). 43: 0.5 points,
+    # OMP 1.5 (44 + 42). 44: 0.5 points, OMP 0.5 (43).
+    expectedStandings = [
+        (1, 1, 45, "Bishop", 2, 0, 0, 2.0, 1.0),
+        (2, 2, 41, "Ellen Ripley", 1, 1, 0, 1.0, 3.0),
+        (3, 3, 42, "Dwayne Hicks", 1, 1, 0, 1.0, 1.5),
+        (4, 4, 43, "Rebecca Jorden", 0, 1, 1, 0.5, 1.5),
+        (5, 5, 44, "Carter Burke", 0, 0, 1, 0.5, 0.5)]
+    if standingsEngine.determineStandings() != expectedStandings:
+        raise ValueError("The standings engine should rank players by points, then OMP, then player id")
+
+    standingsEngine = standings.StandingsEngine([(52, "Dallas"), (51, "Kane")])
+    if [standing[:3] for standing in standingsEngine.determineStandings()] != [(1, 1, 51), (2, 1, 52)]:
+        raise ValueError("Tied players should share actual_player_rank, and be given player_rank by player id")
+
+    print "15. The standings engine ranks players like the current_standings view"
+
+
+def testStandingsEngineMatchesCurrentStandings():
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+        t.registerPlayers([dbo.registerPlayer(playerName) for playerName in ("Lester Freamon", "Kima Greggs", "Bunk Moreland", "Jimmy McNulty", "Cedric Daniels")])
+
+        t.players = t.getTournamentPlayerInfoFromDb()
+        t.standingsEngine = t.createStandingsEngine()
+        t.totalPlayerCount = t.calculateTotalPlayerCount()
+        t.totalPlayerCountOdd = t.determineTotalPlayerCountOdd()
+        t.totalRoundCount = t.calculateTotalRoundCount()
+
+        for roundNbr in (1, 2, 3):
+            t.currentRoundNbr = roundNbr
+            rnd = round.Round(t.dbo, t.id, t.currentRoundNbr)
+            if t.currentRoundFirstRound():
+                t.simulateFirstRound(rnd)
+            else:
+                t.simulateSecondOrGreaterRound(rnd)
+            rnd.setStandingsEngine(t.standingsEngine)
+            rnd.simulateMatches(t.players, t.previousRoundsPlayedMatches)
+            t.currentStandings = t.getCurrentStandings()
+
+            if t.standingsEngine.determineStandingsDifferences(t.getCurrentStandingsFromDb()):
+                raise ValueError("After each round, the standings engine's standings should match the database's current standings")
+
+    print "16. After each round, the standings engine's standings match the database's current standings"
+    dbo.closeDbConnection()
+
+
+def testRoundByePlayerSkipsPlayersWhoCannotBePaired():
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+        t.registerPlayers([dbo.registerPlayer(playerName) for playerName in ("Lester Freamon", "Kima Greggs", "Bunk Moreland", "Jimmy McNulty", "Cedric Daniels")])
+
+        t.players = t.getTournamentPlayerInfoFromDb()
+        t.totalPlayerCount = t.calculateTotalPlayerCount()
+        t.totalPlayerCountOdd = t.determineTotalPlayerCountOdd()
+        playerIds = [player[0] for player in t.players]
+        playerNames = dict(t.players)
+        t.currentStandings = [(playerRank, playerRank, playerId, playerNames[playerId], 0, 0, 0, 0.0, 0.0) for playerRank, playerId in enumerate(playerIds, 1)]
+
+        # The top ranked player has had a bye round and played everyone except the second ranked player, so the
+        # second ranked player cannot have the bye round
+        t.roundByePlayerCounts[playerIds[0]] = 1
+        for opponentPlayerId in playerIds[2:]:
+            t.previousRoundsPlayedMatches.registerPlayedMatch(playerIds[0], opponentPlayerId)
+
+        rnd = round.Round(t.dbo, t.id, 2)
+        t.simulateSecondOrGreaterRound(rnd)
+        if rnd.roundByePlayerId != playerIds[2]:
+            raise ValueError("The round bye player should be the top ranked player with no bye round who leaves players who can be paired")
+
+        for playerId in playerIds[1:]:
+            t.roundByePlayerCounts[playerId] = 1
+        t.roundByePlayerCounts[playerIds[2]] = 2
+        t.previousRoundsPlayedMatches = playedpairs.PlayedPairs()
+        rnd = round.Round(t.dbo, t.id, 3)
+        t.simulateSecondOrGreaterRound(rnd)
+        if rnd.roundByePlayerId != playerIds[0]:
+            raise ValueError("Once every player has had a bye round, the round bye player should be the top ranked player with the fewest bye rounds")
+
+        # Once everyone has played everyone, no round bye player leaves players who can be paired
+        t.previousRoundsPlayedMatches = playedpairs.PlayedPairs(itertools.combinations(playerIds, 2))
+        rnd = round.Round(t.dbo, t.id, 4)
+        try:
+            t.simulateSecondOrGreaterRound(rnd)
+            paired = True
+        except pairing.NoPairingError:
+            paired = False
+        if paired:
+            raise ValueError("A round whose players have all played each other should not be paired")
+
+    print "17. Round bye players who leave players who cannot be paired are skipped, and players with the fewest bye rounds are chosen once everyone has had one"
+    dbo.closeDbConnection()
+
+
+def testStorageBackendsSimulateSameStandings():
+    backendStandings = []
+    for backend in (storage.MEMORY, storage.SQLITE):
+        random.seed(15)
+        dbo = storage.createStorageOperations(backend)
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo)
+        t.registerPlayers([dbo.registerPlayer(playerName) for playerName in ("Omar Little", "Stringer Bell", "Avon Barksdale", "Proposition Joe", "Marlo Stanfield", "Chris Partlow", "Brother Mouzone")])
+
+        t.players = t.getTournamentPlayerInfoFromDb()
+        t.totalPlayerCount = t.calculateTotalPlayerCount()
+        t.totalPlayerCountOdd = t.determineTotalPlayerCountOdd()
+        for roundNbr in (1, 2, 3):
+            t.currentRoundNbr = roundNbr
+            rnd = round.Round(t.dbo, t.id, t.currentRoundNbr)
+            if t.currentRoundFirstRound():
+                t.simulateFirstRound(rnd)
+            else:
+                t.simulateSecondOrGreaterRound(rnd)
+            rnd.simulateMatches(t.players, t.previousRoundsPlayedMatches)
+            t.registerRoundByePlayer(rnd)
+            t.currentStandings = t.getCurrentStandingsFromDb()
+
+        backendStandings.append([standing[:7] + (float(standing[7]), float(standing[8])) for standing in t.currentStandings])
+        if len(dbo.tournamentRoundMatchResults(t.id, 3)) != 3:
+            raise ValueError("After three tournament rounds with seven players, three match results should be registered in round three")
+        dbo.closeDbConnection()
+
+    if backendStandings[0] != backendStandings[1]:
+        raise ValueError("The in-memory and SQLite storage backends should calculate the same standings for the same tournament")
+    print "18. The in-memory and SQLite storage backends calculate the same standings for the same tournament"
+
+
+def testMonteCarloBatchAggregatesRuns():
+    playerNames = ["Omar Little", "Stringer Bell", "Avon Barksdale", "Proposition Joe", "Marlo Stanfield"]
+    results = montecarlo.simulateBatch(playerNames, 12, qualifiedPlaces=2, processCount=2, chunkSize=5)
+    if results.runCount != 12:
+        raise ValueError("A batch of 12 runs should aggregate 12 runs")
+    if abs(sum(results.determineQualificationProbability(playerIndex) for playerIndex in range(len(playerNames))) - 2.0) > 1e-9:
+        raise ValueError("Two players should qualify in every run")
+    if any(abs(sum(results.determineFinishDistribution(playerIndex)) - 1.0) > 1e-9 for playerIndex in range(len(playerNames))):
+        raise ValueError("Every player's finish distribution should sum to 1")
+    if sum(results.determineRoundRankHistogram(0, 1)) != 12:
+        raise ValueError("Every run should count towards a player's round rank histogram")
+
+    serialResults = montecarlo.simulateBatch(playerNames, 12, qualifiedPlaces=2, processCount=1, chunkSize=4)
+    if serialResults.finishCounts != results.finishCounts or serialResults.roundRankCounts != results.roundRankCounts:
+        raise ValueError("A batch's results should not depend on the number of worker processes")
+
+    # A run's round ranks are its standings after each round, ranked by the run's tie-breaks
+    tiebreakOrder = (tiebreaks.SONNEBORN_BERGER, tiebreaks.CUMULATIVE)
+    roundRanks = montecarlo.simulateTournament(playerNames, 3, tiebreakOrder=tiebreakOrder)
+    dbo = storage.createStorageOperations(storage.MEMORY)
+    t = tournament.Tournament("Monte Carlo Run 3", dbo, quiet=True, seed=3, tiebreakOrder=tiebreakOrder)
+    playerIds = [dbo.registerPlayer(playerName) for playerName in playerNames]
+    t.registerPlayers(playerIds)
+    t.simulate()
+    playerRanks = dict((standing[2], standing[0]) for standing in t.currentStandings)
+    if len(roundRanks) != t.totalRoundCount or roundRanks[-1] != [playerRanks[playerId] for playerId in playerIds]:
+        raise ValueError("A run's round ranks should be its standings after each round, ranked by its tie-breaks")
+    print "19. A Monte Carlo batch aggregates its runs, with the same results however many worker processes simulate them"
+
+
+def testSameSeedSimulatesSameTournament():
+    if outcomes.determineMatchResults([0.0, 0.44, 0.45, 0.89, 0.9, 0.99]) != [outcomes.PLAYER1_WIN, outcomes.PLAYER1_WIN, outcomes.PLAYER2_WIN, outcomes.PLAYER2_WIN, outcomes.TIE, outcomes.TIE]:
+        raise ValueError("Match outcomes below .45 should be player 1 wins, below .9 player 2 wins and ties otherwise")
+
+    def simulateTournament(**kwargs):
+        dbo = storage.createStorageOperations(storage.MEMORY)
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, quiet=True, **kwargs)
+        t.registerPlayers([dbo.registerPlayer(playerName) for playerName in ("Omar Little", "Stringer Bell", "Avon Barksdale", "Proposition Joe", "Marlo Stanfield", "Chris Partlow", "Brother Mouzone")])
+        random.seed(len(kwargs))
+        t.simulate()
+        return dbo.tournamentHistoricalStandings(t.id)
+
+    if simulateTournament(seed=7) != simulateTournament(seed=7, qualifiedPlaces=3):
+        raise ValueError("Tournaments with the same seed should be the same tournament, whatever the global random state")
+    if simulateTournament(seed=7) == simulateTournament(seed=8):
+        raise ValueError("Tournaments with different seeds should not be the same tournament")
+    if outcomes.numpy is not None and simulateTournament(rng=outcomes.numpy.random.RandomState(7)) != simulateTournament(rng=outcomes.numpy.random.RandomState(7)):
+        raise ValueError("Tournaments with equally seeded NumPy generators should be the same tournament")
+    print "20. Tournaments with the same seed are the same tournament"
+
+
+def testAsyncTournamentsMatchSynchronousTournaments():
+    playerNames = ("Omar Little", "Stringer Bell", "Avon Barksdale", "Proposition Joe", "Marlo Stanfield", "Chris Partlow", "Brother Mouzone")
+
+    def createTournament(dbo, seed):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, quiet=True, seed=seed)
+        t.registerPlayers([dbo.registerPlayer(playerName) for playerName in playerNames])
+        return t
+
+    dbo = storage.createStorageOperations(storage.MEMORY)
+    synchronousStandings = []
+    for seed in range(4):
+        t = createTournament(dbo, seed)
+        t.simulate()
+        synchronousStandings.append([historicalStanding[:3] + historicalStanding[4:] for historicalStanding in dbo.tournamentHistoricalStandings(t.id)])
+
+    dbo = storage.createStorageOperations(storage.MEMORY)
+    asyncOperations = asyncoperations.AsyncOperations(dbo, workerCount=2, maxInFlight=2)
+    tournaments = [createTournament(dbo, seed) for seed in range(4)]
+    asyncoperations.simulateTournaments(tournaments, asyncOperations, maxConcurrentTournaments=3)
+    asyncStandings = [[historicalStanding[:3] + historicalStanding[4:] for historicalStanding in asyncOperations.tournamentHistoricalStandings(t.id).result()] for t in tournaments]
+    asyncOperations.close()
+
+    if asyncStandings != synchronousStandings:
+        raise ValueError("Tournaments simulated concurrently with asynchronous storage should register the same standings as when simulated one by one")
+    print "21. Tournaments simulated concurrently with asynchronous storage register the same standings as when simulated one by one"
+
+
+def testBenchmarkFlagsRegressions():
+    results = benchmark.runBenchmarks(storage.MEMORY, ("pairing", "persistence"), pairingFieldSizes=(8,), persistenceFieldSizes=(8,), roundCount=2)
+    if "pairing/blossom/8" not in results["benchmarks"] or "persistence/8" not in results["benchmarks"]:
+        raise ValueError("The benchmarks should have results for the benchmarked pairing methods and field sizes")
+    baselineResults = json.loads(json.dumps(results))
+    if benchmark.determineRegressions(results, baselineResults):
+        raise ValueError("Results should not regress against themselves")
+    baselineResults["benchmarks"]["pairing/blossom/8"]["seconds"] = results["benchmarks"]["pairing/blossom/8"]["seconds"] / 2
+    regressions = benchmark.determineRegressions(results, baselineResults, threshold=0.5)
+    if [regression[:2] for regression in regressions] != [("pairing/blossom/8", "seconds")]:
+        raise ValueError("Benchmarks slower than the baseline by more than the threshold should be flagged as regressions")
+    print "22. Benchmarks slower than the baseline by more than the threshold are flagged as regressions"
+
+
+def testInstrumentationRegistersPhasesAndCounters():
+    playerNames = ("Omar Little", "Stringer Bell", "Avon Barksdale", "Proposition Joe", "Marlo Stanfield", "Chris Partlow", "Brother Mouzone", "Bunk Moreland")
+    registry = instrumentation.RegistrySink()
+    previousSink = instrumentation.setSink(registry)
+    try:
+        for pairingMethod in (pairing.BLOSSOM, pairing.BRANCH_AND_BOUND, pairing.EXHAUSTIVE):
+            dbo = storage.createStorageOperations(storage.MEMORY)
+            t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, pairingMethod=pairingMethod, quiet=True, seed=0)
+            t.registerPlayers([dbo.registerPlayer(playerName) for playerName in playerNames])
+            t.simulate()
+    finally:
+        instrumentation.setSink(previousSink)
+
+    metrics = registry.scrape()
+    for phase in ("tournament.simulateRound", "tournament.pairRound", "round.createMatches", "round.playMatches", "round.registerResultsInDb"):
+        if metrics["timings"].get(phase, {}).get("count") != 3 * t.totalRoundCount:
+            raise ValueError("Every round's {0} phase should be timed".format(phase))
+    for counter in ("pairing.blossom.edgesGenerated", "pairing.blossom.edgesPruned", "pairing.branchandbound.nodesGenerated", "pairing.exhaustive.combinationsGenerated", "pairing.exhaustive.combinationsPruned"):
+        if not metrics["counters"].get(counter):
+            raise ValueError("Candidate combinations should be counted as {0}".format(counter))
+    if metrics["counters"]["pairing.exhaustive.combinationsGenerated"] != 105:
+        raise ValueError("Every possible player match combination of 8 players should be counted as generated")
+
+    profilePath = os.path.join(tempfile.mkdtemp(), "tournament.prof")
+    dbo = storage.createStorageOperations(storage.MEMORY)
+    t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, quiet=True, seed=0)
+    t.registerPlayers([dbo.registerPlayer(playerName) for playerName in playerNames])
+    instrumentation.profileSimulation(t, profilePath)
+    if not any("simulateRound" in function[2] for function in pstats.Stats(profilePath).stats):
+        raise ValueError("The tournament run's profile should be written to the profile file")
+    shutil.rmtree(os.path.dirname(profilePath))
+    print "23. Instrumentation times each round phase, counts candidate combinations and profiles tournament runs"
+
+
+def testOutputSinksWriteEachRound():
+    playerNames = ("Omar Little", "Stringer Bell", "Avon Barksdale", "Proposition Joe", "Marlo Stanfield", "Chris Partlow", "Brother Mouzone")
+    outputs = {}
+    for outputSinkClass in (outputsinks.TextSink, outputsinks.JsonLinesSink, outputsinks.CsvSink):
+        dbo = storage.createStorageOperations(storage.MEMORY)
+        stream = StringIO.StringIO()
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, seed=0, outputSink=outputSinkClass(stream))
+        t.registerPlayers([dbo.registerPlayer(playerName) for playerName in playerNames])
+        t.simulate()
+        outputs[outputSinkClass] = stream.getvalue()
+
+    textOutput = outputs[outputsinks.TextSink]
+    if not textOutput.startswith("The Greatest And Best Tournament In The World... Tribute\n") or textOutput.count("\nRank\tPID\tName\tW\tL\tT\tPoints\tOMP\n") != t.totalRoundCount:
+        raise ValueError("The text sink should write the tournament's name, and each round's standings")
+    lines = [json.loads(line) for line in outputs[outputsinks.JsonLinesSink].splitlines()]
+    if [line["type"] for line in lines] != ["tournament"] + ["round", "standings"] * t.totalRoundCount:
+        raise ValueError("The JSON lines sink should write the tournament, then each round and its standings")
+    if any(len(line["matches"]) != 3 or line["byePlayerId"] is None for line in lines if line["type"] == "round"):
+        raise ValueError("The JSON lines sink should write each round's matches and bye player")
+    rows = list(csv.reader(StringIO.StringIO(outputs[outputsinks.CsvSink])))
+    if tuple(rows[0]) != outputsinks.STANDINGS_CSV_HEADER or len(rows) != 1 + len(playerNames) * t.totalRoundCount:
+        raise ValueError("The CSV sink should write a header, then each player's standing after each round")
+    print "24. Output sinks write the tournament's rounds and standings as text, JSON lines and CSV"
+
+
+def testStandingsAsOfRoundRebuiltFromKeyframes():
+    playerNames = ["Player {0}".format(playerNbr) for playerNbr in range(1, 22)]
+    for backend in (storage.MEMORY, storage.SQLITE):
+        roundStandings = {}
+        for keyframeInterval in (1, 3):
+            dbo = storage.createStorageOperations(backend)
+            dbo.historicalStandingsKeyframeInterval = keyframeInterval
+            t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, quiet=True, seed=0)
+            t.registerPlayers([dbo.registerPlayer(playerName) for playerName in playerNames])
+            t.startSimulation()
+            t.simulateRounds()
+            roundStandings[keyframeInterval] = [dbo.tournamentStandingsAsOfRound(t.id, roundNbr) for roundNbr in range(1, t.totalRoundCount + 1)]
+            if [dbo.tournamentHistoricalStandingsKeyframe(t.id, roundNbr)[0][0] for roundNbr in range(3, t.totalRoundCount + 1)] != [roundNbr - roundNbr % keyframeInterval for roundNbr in range(3, t.totalRoundCount)] + [t.totalRoundCount]:
+                raise ValueError("Historical standings should only be stored for keyframe rounds")
+            if [historicalStanding for standings in roundStandings[keyframeInterval] for historicalStanding in standings] != dbo.tournamentHistoricalStandings(t.id):
+                raise ValueError("Standings as of each round should be the round's historical standings")
+        if roundStandings[3] != roundStandings[1]:
+            raise ValueError("Standings rebuilt from keyframes should be the same as stored standings")
+    print "25. Standings as of any round are rebuilt from the latest keyframe and the later rounds' results"
+
+
+def testImportPlayersRegistersThemInOrder():
+    playerNames = [u"Ross S", u"Hill, L", u"Zo\xeb \"Z\" V", u"", u"Peter R"]
+    playerFile = StringIO.StringIO()
+    csv.writer(playerFile).writerows([("name", "club")] + [(playerName.encode("utf-8"), "Chess Club") for playerName in playerNames])
+    playerFile.seek(0)
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, quiet=True)
+        playerIds = t.importPlayers(playerFile)
+        if playerIds != sorted(playerIds) or len(set(playerIds)) != len(playerNames):
+            raise ValueError("Imported players should be given new ids in the order of their names")
+        playerIds.extend(t.importPlayers(playerName + u" Jr" for playerName in playerNames))
+        if t.totalPlayerCount != 2 * len(playerNames):
+            raise ValueError("After importing players, totalPlayerCount should be the number of players imported")
+        if sorted(tuple(player[:2]) for player in t.players) != zip(playerIds, playerNames + [playerName + u" Jr" for playerName in playerNames]):
+            raise ValueError("Imported players should be registered for the tournament with their names")
+    print "26. Players imported from a CSV file or a list of names are registered in order"
     dbo.closeDbConnection()
 
+
+def testLoadedTournamentResumesFromNextRound():
+    playerNames = ["Player {0}".format(playerNbr) for playerNbr in range(1, 22)]
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, quiet=True, seed=0)
+        t.importPlayers(playerNames)
+        t.startSimulation()
+        totalRoundCount = t.totalRoundCount
+        t.totalRoundCount = 5
+        t.simulateRounds()
+
+        loadedTournament = tournament.Tournament.load(t.id, dbo, checkStandings=True, quiet=True, seed=1)
+        if loadedTournament.name != t.name or loadedTournament.currentRoundNbr != 6 or loadedTournament.totalRoundCount != totalRoundCount:
+            raise ValueError("A loaded tournament should continue from the round after its last completed round")
+        if [[match.getMatchResult() for match in rnd.matches] for rnd in loadedTournament.rounds] != [[match.getMatchResult() for match in rnd.matches] for rnd in t.rounds]:
+            raise ValueError("A loaded tournament's completed rounds should be rebuilt from the database")
+        if set(map(frozenset, loadedTournament.previousRoundsPlayedMatches)) != set(map(frozenset, t.previousRoundsPlayedMatches)) or loadedTournament.roundByePlayerCounts != t.roundByePlayerCounts:
+            raise ValueError("A loaded tournament's played matches and bye players should be rebuilt from the database")
+        if loadedTournament.currentStandings != t.currentStandings:
+            raise ValueError("A loaded tournament's standings should be the standings after its last completed round")
+        loadedTournament.startOrContinueSimulation()
+        loadedTournament.simulateRounds()
+        if [rnd.nbr for rnd in loadedTournament.rounds] != range(1, totalRoundCount + 1):
+            raise ValueError("A loaded tournament should simulate its remaining rounds")
+        if len(loadedTournament.previousRoundsPlayedMatches) != sum(len(rnd.matches) for rnd in loadedTournament.rounds):
+            raise ValueError("A loaded tournament should not pair previously played matches again")
+        if max(loadedTournament.roundByePlayerCounts.values()) != 1:
+            raise ValueError("A loaded tournament should not give a player a second bye round while others have had none")
+
+        # A tournament loaded before its first round was completed writes its name once it is resumed
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, quiet=True)
+        t.importPlayers(playerNames)
+        stream = StringIO.StringIO()
+        loadedTournament = tournament.Tournament.load(t.id, dbo, seed=1, outputSink=outputsinks.JsonLinesSink(stream))
+        loadedTournament.startOrContinueSimulation()
+        loadedTournament.simulateRounds()
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        if [line["type"] for line in lines] != ["tournament"] + ["round", "standings"] * loadedTournament.totalRoundCount:
+            raise ValueError("A tournament loaded before its first round should write its name once, then each round")
+        print "27. A tournament loaded from the database resumes from the round after its last completed round"
+    dbo.closeDbConnection()
+
+
+def testTiebreaksRankPlayersWithTheSamePoints():
+    players = [(1, "Ross S"), (2, "Hill L"), (3, "Marc V"), (4, "Ross B")]
+    standingsEngine = standings.StandingsEngine(players, tiebreaks.TIEBREAKS)
+    standingsEngine.registerMatchResult(1, 2)
+    standingsEngine.registerMatchResult(3, 4, True)
+    standingsEngine.registerMatchResult(1, 3)
+    standingsEngine.registerMatchResult(2, 4)
+    playerTiebreaks = dict((playerId, tiebreaks.determinePlayerTiebreaks(standingsEngine.results[playerId], standingsEngine.points, standingsEngine.opponentPoints[playerId], tiebreaks.TIEBREAKS)) for playerId, playerName in players)
+    if playerTiebreaks != {1: (1.5, 1.5, 1.0, 0.0, 1.5, 3.0), 2: (2.5, 2.5, 2.0, 0.0, 0.5, 1.0), 3: (2.5, 2.5, 2.0, 0.0, 0.25, 1.0), 4: (1.5, 1.5, 1.0, 0.0, 0.25, 1.0)}:
+        raise ValueError("Tie-breaks should be calculated from the players' results and their opponents' points")
+    standingsEngine = standings.StandingsEngine(players, (tiebreaks.SONNEBORN_BERGER, tiebreaks.BUCHHOLZ))
+    for winnerPlayerId, loserPlayerId, tieFlag in ((1, 2, False), (3, 4, True), (1, 3, False), (2, 4, False)):
+        standingsEngine.registerMatchResult(winnerPlayerId, loserPlayerId, tieFlag)
+    if [standing[:3] for standing in standingsEngine.determineStandings()] != [(1, 1, 1), (2, 2, 2), (3, 3, 3), (4, 4, 4)]:
+        raise ValueError("Players with the same points should be ranked by the tie-breaks in order")
+    unknownTiebreakRejected = False
+    try:
+        standings.StandingsEngine(players, ("coin_toss",))
+    except ValueError:
+        unknownTiebreakRejected = True
+    if not unknownTiebreakRejected:
+        raise ValueError("Unknown tie-breaks should be rejected")
+
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, checkStandings=True, quiet=True, seed=0, tiebreakOrder=(tiebreaks.MEDIAN_BUCHHOLZ, tiebreaks.CUMULATIVE))
+        t.importPlayers(["Player {0}".format(playerNbr) for playerNbr in range(1, 18)])
+        t.startSimulation()
+        t.simulateRounds()
+        rankKeys = [(-standing[7],) + tiebreaks.determinePlayerTiebreaks(t.standingsEngine.results[standing[2]], t.standingsEngine.points, standing[8], t.tiebreakOrder) for standing in t.currentStandings]
+        if rankKeys != sorted(rankKeys, key=lambda rankKey: (rankKey[0], -rankKey[1], -rankKey[2])):
+            raise ValueError("A tournament's standings should be ranked by its tie-breaks")
+        if dbo.tournamentStandingsAsOfRound(t.id, t.totalRoundCount, t.tiebreakOrder) != storage.determineHistoricalStandings(t.totalRoundCount, t.currentStandings):
+            raise ValueError("Standings rebuilt from the database should be ranked by the tournament's tie-breaks")
+        if dbo.tournamentHistoricalStandings(t.id, t.tiebreakOrder)[-len(t.players):] != storage.determineHistoricalStandings(t.totalRoundCount, t.currentStandings):
+            raise ValueError("Historical standings rebuilt from the database should be ranked by the tournament's tie-breaks")
+        print "28. Players with the same points are ranked by the configured tie-breaks in order"
+    dbo.closeDbConnection()
+
+
+def testPlayedPairsIndicesAgree():
+    playedMatches = [(14, 12), (11, 16), (13, 15), (17, 18), (14, 11)]
+    for playedPairsClass in (playedpairs.PlayedPairs, playedpairs.PlayedPairsBitMatrix):
+        playedPairs = playedPairsClass(playedMatches)
+        if not all(playedPairs.played(player1Id, player2Id) and playedPairs.played(player2Id, player1Id) and (player2Id, player1Id) in playedPairs for player1Id, player2Id in playedMatches):
+            raise ValueError("{0} should index played matches by unordered player pair".format(playedPairsClass.__name__))
+        if playedPairs.played(14, 13) or playedPairs.played(14, 19) or (19, 20) in playedPairs:
+            raise ValueError("{0} should not index matches which were not played".format(playedPairsClass.__name__))
+        if len(playedPairs) != len(playedMatches) or set(map(frozenset, playedPairs)) != set(map(frozenset, playedMatches)):
+            raise ValueError("{0} should iterate over each played match once".format(playedPairsClass.__name__))
+
+    dbo = storage.createStorageOperations()
+    with dbo.transaction(rollback=True):
+        t = tournament.Tournament("The Greatest And Best Tournament In The World... Tribute", dbo, quiet=True, seed=0)
+        t.importPlayers(["Player {0}".format(playerNbr) for playerNbr in range(1, 12)])
+        t.startSimulation()
+        t.simulateRounds()
+        for playedPairsClass in (playedpairs.PlayedPairs, playedpairs.PlayedPairsBitMatrix):
+            playedPairs = playedPairsClass.fromDb(dbo, t.id)
+            if set(map(frozenset, playedPairs)) != set(map(frozenset, t.previousRoundsPlayedMatches)) or len(playedPairs) != len(t.previousRoundsPlayedMatches):
+                raise ValueError("{0} rebuilt from the database should index the tournament's played matches".format(playedPairsClass.__name__))
+        print "29. Both played match indices index played matches by unordered player pair, and can be rebuilt from the database"
+    dbo.closeDbConnection()
+
+
 if __name__ == '__main__':
     testDeleteTournamentFromDb()
     testTournamentTotalPlayerCount()
@@ -224,5 +900,27 @@ if __name__ == '__main__':
     testTournamentStandingsBeforeFirstRound()
     testTournamentStandingsAfterOneRound()
     testBestPlayerMatchCombinationAfterOneRound()
+    testBlossomPairerMatchesExhaustiveQuality()
+    testScoreGroupPairerFloatsPlayersDown()
+    testBranchAndBoundPairerYieldsImprovingCombinations()
+    testVectorizedQualityChoosesSamePlayerMatchCombination()
+    testRoundResultsRegisteredInOneBatch()
+    testRolledBackTransactionLeavesNoRows()
+    testThreadsShareConnectionPool()
+    testStandingsEngineRanksLikeCurrentStandings()
+    testStandingsEngineMatchesCurrentStandings()
+    testRoundByePlayerSkipsPlayersWhoCannotBePaired()
+    testStorageBackendsSimulateSameStandings()
+    testMonteCarloBatchAggregatesRuns()
+    testSameSeedSimulatesSameTournament()
+    testAsyncTournamentsMatchSynchronousTournaments()
+    testBenchmarkFlagsRegressions()
+    testInstrumentationRegistersPhasesAndCounters()
+    testOutputSinksWriteEachRound()
+    testStandingsAsOfRoundRebuiltFromKeyframes()
+    testImportPlayersRegistersThemInOrder()
+    testLoadedTournamentResumesFromNextRound()
+    testTiebreaksRankPlayersWithTheSamePoints()
+    testPlayedPairsIndicesAgree()
 
     print "Success! All tests pass!"
@@ -0,0 +1,467 @@
+#!/usr/bin/env python
+#
+# Maximum weight matching in general (non-bipartite) graphs using Edmonds' blossom algorithm with the
+# primal-dual method described by Galil ("Efficient algorithms for finding maximum matching in graphs",
+# ACM Computing Surveys, 1986). Runs in O(n^3) time, where n is the number of vertices.
+
+
+def maxWeightMatching(edges, maxCardinality=False, outsideEdges=None):
+    ''' Computes a maximum weight matching for a list of (i, j, weight) edges over vertices 0..n-1.
+
+        If maxCardinality is True, only maximum cardinality matchings are considered. Returns a list
+        mate such that mate[i] == j if vertex i is matched to vertex j, and mate[i] == -1 if vertex i
+        is not matched. Integer weights keep all arithmetic exact.
+
+        If outsideEdges is given, returns (mate, violatedOutsideEdges) instead, where violatedOutsideEdges
+        are the outside edges with negative slack under the final dual solution. When the matching is
+        perfect and no outside edge is violated, the matching is also optimal for the graph including
+        the outside edges. outsideEdges is a list of edges, or a function which finds the violated outside
+        edges itself, so they need not all be generated: it is called with the vertices' dual variables and
+        a function returning the slack of an outside edge (i, j, weight). An outside edge's slack is never
+        less than the sum of its vertices' dual variables less twice its weight. '''
+
+    if not edges:
+        if callable(outsideEdges):
+            return [], []
+        if outsideEdges is not None:
+            return [], list(outsideEdges)
+        return []
+
+    edgeCount = len(edges)
+    vertexCount = 0
+    for (i, j, w) in edges:
+        if i >= vertexCount:
+            vertexCount = i + 1
+        if j >= vertexCount:
+            vertexCount = j + 1
+
+    maxWeight = max(0, max(w for (i, j, w) in edges))
+
+    # endpoint[p] is the vertex to which endpoint p is attached. Edge k has endpoints 2k and 2k+1.
+    endpoint = [edges[p // 2][p % 2] for p in range(2 * edgeCount)]
+
+    # neighbourEndpoints[v] is the list of remote endpoints of the edges attached to vertex v
+    neighbourEndpoints = [[] for i in range(vertexCount)]
+    for k in range(edgeCount):
+        (i, j, w) = edges[k]
+        neighbourEndpoints[i].append(2 * k + 1)
+        neighbourEndpoints[j].append(2 * k)
+
+    # mate[v] is the remote endpoint of v's matched edge, or -1 if v is single
+    mate = vertexCount * [-1]
+
+    # label[b] is 0 (unlabeled), 1 (S-vertex/blossom) or 2 (T-vertex/blossom) for top-level blossoms
+    # and vertices. labelEnd[b] is the remote endpoint of the edge through which b obtained its label.
+    label = (2 * vertexCount) * [0]
+    labelEnd = (2 * vertexCount) * [-1]
+
+    # inBlossom[v] is the top-level blossom to which vertex v belongs
+    inBlossom = list(range(vertexCount))
+
+    # Blossoms are numbered vertexCount..2*vertexCount-1. blossomParent[b] is the immediate parent
+    # (sub-)blossom, blossomChilds[b] the ordered list of sub-blossoms starting with the base, and
+    # blossomEndps[b] the list of endpoints connecting the sub-blossoms.
+    blossomParent = (2 * vertexCount) * [-1]
+    blossomChilds = (2 * vertexCount) * [None]
+    blossomBase = list(range(vertexCount)) + vertexCount * [-1]
+    blossomEndps = (2 * vertexCount) * [None]
+
+    # bestEdge[b] is the least-slack edge to a different S-blossom (for S-blossoms and free vertices).
+    # blossomBestEdges[b] is the list of least-slack edges to neighbouring S-blossoms.
+    bestEdge = (2 * vertexCount) * [-1]
+    blossomBestEdges = (2 * vertexCount) * [None]
+
+    unusedBlossoms = list(range(vertexCount, 2 * vertexCount))
+
+    # Dual variables: vertices start at maxWeight, blossoms at 0
+    dualVar = vertexCount * [maxWeight] + vertexCount * [0]
+
+    # allowEdge[k] is True if edge k has zero slack in the optimization problem
+    allowEdge = edgeCount * [False]
+
+    queue = []
+
+    # Warm start: edges of maximum weight are tight under the initial duals, so a greedy matching of them keeps
+    # every invariant (matched edges tight, single vertices' duals equal and minimal), and each edge matched
+    # saves a stage
+    for k in range(edgeCount):
+        (i, j, w) = edges[k]
+        if w == maxWeight and i != j and mate[i] == -1 and mate[j] == -1:
+            mate[i] = 2 * k + 1
+            mate[j] = 2 * k
+
+    def slack(k):
+        (i, j, w) = edges[k]
+        return dualVar[i] + dualVar[j] - 2 * w
+
+    def blossomLeaves(b):
+        if b < vertexCount:
+            yield b
+        else:
+            for t in blossomChilds[b]:
+                if t < vertexCount:
+                    yield t
+                else:
+                    for v in blossomLeaves(t):
+                        yield v
+
+    # Assigns label t to the top-level blossom containing vertex w, coming through endpoint p
+    def assignLabel(w, t, p):
+        b = inBlossom[w]
+        label[w] = label[b] = t
+        labelEnd[w] = labelEnd[b] = p
+        bestEdge[w] = bestEdge[b] = -1
+        if t == 1:
+            queue.extend(blossomLeaves(b))
+        elif t == 2:
+            base = blossomBase[b]
+            assignLabel(endpoint[mate[base]], 1, mate[base] ^ 1)
+
+    # Traces back from vertices v and w to discover either a new blossom or an augmenting path. Returns
+    # the base vertex of the new blossom or -1.
+    def scanBlossom(v, w):
+        path = []
+        base = -1
+        while v != -1 or w != -1:
+            b = inBlossom[v]
+            if label[b] & 4:
+                base = blossomBase[b]
+                break
+            path.append(b)
+            label[b] = 5
+            if labelEnd[b] == -1:
+                v = -1
+            else:
+                v = endpoint[labelEnd[b]]
+                b = inBlossom[v]
+                v = endpoint[labelEnd[b]]
+            if w != -1:
+                v, w = w, v
+        for b in path:
+            label[b] = 1
+        return base
+
+    # Constructs a new blossom with the given base, containing edge k which connects a pair of S-vertices
+    def addBlossom(base, k):
+        (v, w, wt) = edges[k]
+        bb = inBlossom[base]
+        bv = inBlossom[v]
+        bw = inBlossom[w]
+        b = unusedBlossoms.pop()
+        blossomBase[b] = base
+        blossomParent[b] = -1
+        blossomParent[bb] = b
+        blossomChilds[b] = path = []
+        blossomEndps[b] = endps = []
+        while bv != bb:
+            blossomParent[bv] = b
+            path.append(bv)
+            endps.append(labelEnd[bv])
+            v = endpoint[labelEnd[bv]]
+            bv = inBlossom[v]
+        path.append(bb)
+        path.reverse()
+        endps.reverse()
+        endps.append(2 * k)
+        while bw != bb:
+            blossomParent[bw] = b
+            path.append(bw)
+            endps.append(labelEnd[bw] ^ 1)
+            w = endpoint[labelEnd[bw]]
+            bw = inBlossom[w]
+        label[b] = 1
+        labelEnd[b] = labelEnd[bb]
+        dualVar[b] = 0
+        for v in blossomLeaves(b):
+            if label[inBlossom[v]] == 2:
+                queue.append(v)
+            inBlossom[v] = b
+
+        bestEdgeTo = (2 * vertexCount) * [-1]
+        for bv in path:
+            if blossomBestEdges[bv] is None:
+                neighbourLists = [[p // 2 for p in neighbourEndpoints[v]] for v in blossomLeaves(bv)]
+            else:
+                neighbourLists = [blossomBestEdges[bv]]
+            for neighbourList in neighbourLists:
+                for k in neighbourList:
+                    (i, j, wt) = edges[k]
+                    if inBlossom[j] == b:
+                        i, j = j, i
+                    bj = inBlossom[j]
+                    if bj != b and label[bj] == 1 and (bestEdgeTo[bj] == -1 or slack(k) < slack(bestEdgeTo[bj])):
+                        bestEdgeTo[bj] = k
+            blossomBestEdges[bv] = None
+            bestEdge[bv] = -1
+        blossomBestEdges[b] = [k for k in bestEdgeTo if k != -1]
+        bestEdge[b] = -1
+        for k in blossomBestEdges[b]:
+            if bestEdge[b] == -1 or slack(k) < slack(bestEdge[b]):
+                bestEdge[b] = k
+
+    # Expands the given top-level blossom
+    def expandBlossom(b, endStage):
+        for s in blossomChilds[b]:
+            blossomParent[s] = -1
+            if s < vertexCount:
+                inBlossom[s] = s
+            elif endStage and dualVar[s] == 0:
+                expandBlossom(s, endStage)
+            else:
+                for v in blossomLeaves(s):
+                    inBlossom[v] = s
+
+        # If we expand a T-blossom during a stage, its sub-blossoms must be relabeled
+        if not endStage and label[b] == 2:
+            entryChild = inBlossom[endpoint[labelEnd[b] ^ 1]]
+            j = blossomChilds[b].index(entryChild)
+            if j & 1:
+                j -= len(blossomChilds[b])
+                jStep = 1
+                endpointTrick = 0
+            else:
+                jStep = -1
+                endpointTrick = 1
+            p = labelEnd[b]
+            while j != 0:
+                label[endpoint[p ^ 1]] = 0
+                label[endpoint[blossomEndps[b][j - endpointTrick] ^ endpointTrick ^ 1]] = 0
+                assignLabel(endpoint[p ^ 1], 2, p)
+                allowEdge[blossomEndps[b][j - endpointTrick] // 2] = True
+                j += jStep
+                p = blossomEndps[b][j - endpointTrick] ^ endpointTrick
+                allowEdge[p // 2] = True
+                j += jStep
+            bv = blossomChilds[b][j]
+            label[endpoint[p ^ 1]] = label[bv] = 2
+            labelEnd[endpoint[p ^ 1]] = labelEnd[bv] = p
+            bestEdge[bv] = -1
+            j += jStep
+            while blossomChilds[b][j] != entryChild:
+                bv = blossomChilds[b][j]
+                if label[bv] == 1:
+                    j += jStep
+                    continue
+                for v in blossomLeaves(bv):
+                    if label[v] != 0:
+                        break
+                if label[v] != 0:
+                    label[v] = 0
+                    label[endpoint[mate[blossomBase[bv]]]] = 0
+                    assignLabel(v, 2, labelEnd[v])
+                j += jStep
+
+        label[b] = labelEnd[b] = -1
+        blossomChilds[b] = blossomEndps[b] = None
+        blossomBase[b] = -1
+        blossomBestEdges[b] = None
+        bestEdge[b] = -1
+        unusedBlossoms.append(b)
+
+    # Swaps matched/unmatched edges over an alternating path through blossom b between vertex v and the
+    # base vertex
+    def augmentBlossom(b, v):
+        t = v
+        while blossomParent[t] != b:
+            t = blossomParent[t]
+        if t >= vertexCount:
+            augmentBlossom(t, v)
+        i = j = blossomChilds[b].index(t)
+        if i & 1:
+            j -= len(blossomChilds[b])
+            jStep = 1
+            endpointTrick = 0
+        else:
+            jStep = -1
+            endpointTrick = 1
+        while j != 0:
+            j += jStep
+            t = blossomChilds[b][j]
+            p = blossomEndps[b][j - endpointTrick] ^ endpointTrick
+            if t >= vertexCount:
+                augmentBlossom(t, endpoint[p])
+            j += jStep
+            t = blossomChilds[b][j]
+            if t >= vertexCount:
+                augmentBlossom(t, endpoint[p ^ 1])
+            mate[endpoint[p]] = p ^ 1
+            mate[endpoint[p ^ 1]] = p
+        blossomChilds[b] = blossomChilds[b][i:] + blossomChilds[b][:i]
+        blossomEndps[b] = blossomEndps[b][i:] + blossomEndps[b][:i]
+        blossomBase[b] = blossomBase[blossomChilds[b][0]]
+
+    # Swaps matched/unmatched edges over an alternating path between two single vertices through edge k
+    def augmentMatching(k):
+        (v, w, wt) = edges[k]
+        for (s, p) in ((v, 2 * k + 1), (w, 2 * k)):
+            while True:
+                bs = inBlossom[s]
+                if bs >= vertexCount:
+                    augmentBlossom(bs, s)
+                mate[s] = p
+                if labelEnd[bs] == -1:
+                    break
+                t = endpoint[labelEnd[bs]]
+                bt = inBlossom[t]
+                s = endpoint[labelEnd[bt]]
+                j = endpoint[labelEnd[bt] ^ 1]
+                if bt >= vertexCount:
+                    augmentBlossom(bt, j)
+                mate[j] = labelEnd[bt]
+                p = labelEnd[bt] ^ 1
+
+    # Each stage either augments the matching by one edge or ends the algorithm
+    for stage in range(vertexCount):
+        label[:] = (2 * vertexCount) * [0]
+        bestEdge[:] = (2 * vertexCount) * [-1]
+        blossomBestEdges[vertexCount:] = vertexCount * [None]
+        allowEdge[:] = edgeCount * [False]
+        queue[:] = []
+
+        for v in range(vertexCount):
+            if mate[v] == -1 and label[inBlossom[v]] == 0:
+                assignLabel(v, 1, -1)
+
+        augmented = False
+        while True:
+            while queue and not augmented:
+                v = queue.pop()
+                for p in neighbourEndpoints[v]:
+                    k = p // 2
+                    w = endpoint[p]
+                    if inBlossom[v] == inBlossom[w]:
+                        continue
+                    if not allowEdge[k]:
+                        kSlack = slack(k)
+                        if kSlack <= 0:
+                            allowEdge[k] = True
+                    if allowEdge[k]:
+                        if label[inBlossom[w]] == 0:
+                            assignLabel(w, 2, p ^ 1)
+                        elif label[inBlossom[w]] == 1:
+                            base = scanBlossom(v, w)
+                            if base >= 0:
+                                addBlossom(base, k)
+                            else:
+                                augmentMatching(k)
+                                augmented = True
+                                break
+                        elif label[w] == 0:
+                            label[w] = 2
+                            labelEnd[w] = p ^ 1
+                    elif label[inBlossom[w]] == 1:
+                        b = inBlossom[v]
+                        if bestEdge[b] == -1 or kSlack < slack(bestEdge[b]):
+                            bestEdge[b] = k
+                    elif label[w] == 0:
+                        if bestEdge[w] == -1 or kSlack < slack(bestEdge[w]):
+                            bestEdge[w] = k
+
+            if augmented:
+                break
+
+            # No augmenting path found under the current duals; compute the dual adjustment delta
+            deltaType = -1
+            delta = deltaEdge = deltaBlossom = None
+
+            if not maxCardinality:
+                deltaType = 1
+                delta = min(dualVar[:vertexCount])
+
+            for v in range(vertexCount):
+                if label[inBlossom[v]] == 0 and bestEdge[v] != -1:
+                    d = slack(bestEdge[v])
+                    if deltaType == -1 or d < delta:
+                        delta = d
+                        deltaType = 2
+                        deltaEdge = bestEdge[v]
+
+            for b in range(2 * vertexCount):
+                if blossomParent[b] == -1 and label[b] == 1 and bestEdge[b] != -1:
+                    kSlack = slack(bestEdge[b])
+                    if isinstance(kSlack, float):
+                        d = kSlack / 2.0
+                    else:
+                        d = kSlack // 2
+                    if deltaType == -1 or d < delta:
+                        delta = d
+                        deltaType = 3
+                        deltaEdge = bestEdge[b]
+
+            for b in range(vertexCount, 2 * vertexCount):
+                if blossomBase[b] >= 0 and blossomParent[b] == -1 and label[b] == 2 and (deltaType == -1 or dualVar[b] < delta):
+                    delta = dualVar[b]
+                    deltaType = 4
+                    deltaBlossom = b
+
+            if deltaType == -1:
+                # No further improvement possible; the maximum cardinality optimum has been reached
+                deltaType = 1
+                delta = max(0, min(dualVar[:vertexCount]))
+
+            for v in range(vertexCount):
+                if label[inBlossom[v]] == 1:
+                    dualVar[v] -= delta
+                elif label[inBlossom[v]] == 2:
+                    dualVar[v] += delta
+            for b in range(vertexCount, 2 * vertexCount):
+                if blossomBase[b] >= 0 and blossomParent[b] == -1:
+                    if label[b] == 1:
+                        dualVar[b] += delta
+                    elif label[b] == 2:
+                        dualVar[b] -= delta
+
+            if deltaType == 1:
+                break
+            elif deltaType == 2:
+                allowEdge[deltaEdge] = True
+                (i, j, wt) = edges[deltaEdge]
+                if label[inBlossom[i]] == 0:
+                    i, j = j, i
+                queue.append(i)
+            elif deltaType == 3:
+                allowEdge[deltaEdge] = True
+                (i, j, wt) = edges[deltaEdge]
+                queue.append(i)
+            elif deltaType == 4:
+                expandBlossom(deltaBlossom, False)
+
+        if not augmented:
+            break
+
+        # End of stage; expand all S-blossoms which have zero dual
+        for b in range(vertexCount, 2 * vertexCount):
+            if blossomParent[b] == -1 and blossomBase[b] >= 0 and label[b] == 1 and dualVar[b] == 0:
+                expandBlossom(b, True)
+
+    for v in range(vertexCount):
+        if mate[v] >= 0:
+            mate[v] = endpoint[mate[v]]
+
+    if outsideEdges is None:
+        return mate
+
+    # Outside edge slack includes the duals of every blossom containing both endpoints
+    def blossomChain(v):
+        chain = [v]
+        while blossomParent[chain[-1]] != -1:
+            chain.append(blossomParent[chain[-1]])
+        chain.reverse()
+        return chain
+
+    # Vertices without edges have no dual variable, so their outside edges are always violated
+    def outsideEdgeSlack(edge):
+        (i, j, w) = edge
+        if i >= vertexCount or j >= vertexCount:
+            return -1
+        edgeSlack = dualVar[i] + dualVar[j] - 2 * w
+        if blossomParent[i] != -1 and blossomParent[j] != -1:
+            for (bi, bj) in zip(blossomChain(i), blossomChain(j)):
+                if bi != bj:
+                    break
+                edgeSlack += 2 * dualVar[bi]
+        return edgeSlack
+
+    if callable(outsideEdges):
+        return mate, outsideEdges(dualVar[:vertexCount], outsideEdgeSlack)
+    return mate, [edge for edge in outsideEdges if outsideEdgeSlack(edge) < 0]